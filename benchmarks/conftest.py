@@ -0,0 +1,134 @@
+"""
+Benchmark suite for the orchestration around sleap-track / sleap-render.
+
+Runs on a headless CPU-only machine: the SLEAP tools are replaced by the stubs
+in stubs.py, inputs come from fixtures.py, and the GUI benchmarks use Qt's
+offscreen platform (they're skipped when qtpy isn't installed).
+
+    python -m pytest benchmarks -q
+    python -m pytest benchmarks -q --sizes 1,10,100,1000 --results bench.json
+
+Every benchmark adds records to one JSON file (default
+benchmarks/results/<timestamp>.json) together with the machine and commit, so
+runs can be compared over time. --sizes sets the batch sizes (number of
+videos) of the scaling benchmarks, default 1,10,100; the 1000-video batch
+takes a while, it only runs when asked for with --sizes.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import subprocess
+import tempfile
+
+import pytest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_DIR)
+
+# Caches, throughput history, journals, ... go to ~/.sleapgui, keep the benchmarks
+# from reading or polluting the real one. Has to happen before sleapgui is imported.
+_HOME = tempfile.mkdtemp(prefix="sleapgui_bench_home_")
+os.environ["HOME"] = _HOME
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from stubs import install_stub_tools, stub_environment  # noqa: E402
+
+DEFAULT_SIZES = "1,10,100"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("sleapgui benchmarks")
+    group.addoption("--sizes", default=DEFAULT_SIZES,
+                    help=f"Comma separated batch sizes (videos) for the scaling benchmarks, default {DEFAULT_SIZES}")
+    group.addoption("--results", default=None,
+                    help="JSON file for the results, default benchmarks/results/<timestamp>.json")
+
+
+def pytest_generate_tests(metafunc):
+    if "batch_size" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("sizes").split(",") if size.strip()]
+        metafunc.parametrize("batch_size", sizes)
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BenchmarkResults:
+    """Records of one benchmark session, written as JSON at the end"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+
+    def add(self, benchmark, **values):
+        record = {"benchmark": benchmark}
+        record.update(values)
+        self.records.append(record)
+        return record
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        document = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "machine": {
+                "host": socket.gethostname(),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": self.records,
+        }
+        with open(self.path, 'w') as f:
+            json.dump(document, f, indent=1)
+
+
+@pytest.fixture(scope="session")
+def results(request):
+    path = request.config.getoption("results") or os.path.join(
+        BENCHMARK_DIR, "results", time.strftime("%Y%m%d_%H%M%S") + ".json")
+    benchmark_results = BenchmarkResults(path)
+    yield benchmark_results
+    if benchmark_results.records:
+        benchmark_results.save()
+        print(f"\nBenchmark results written to {path}")
+
+
+@pytest.fixture(scope="session")
+def stub_tools(tmp_path_factory):
+    """Directory with the stub sleap-track / sleap-render, first on PATH for the whole session"""
+    directory = install_stub_tools(str(tmp_path_factory.mktemp("stub_bin")))
+    old_path = os.environ.get("PATH", "")
+    os.environ["PATH"] = directory + os.pathsep + old_path
+    yield directory
+    os.environ["PATH"] = old_path
+
+
+@pytest.fixture(scope="session")
+def template_slp(tmp_path_factory):
+    """Small .slp that the stub sleap-track writes as its result"""
+    pytest.importorskip("h5py")
+    from fixtures import make_slp
+
+    return make_slp(str(tmp_path_factory.mktemp("template") / "template.slp"), n_frames=100)
+
+
+@pytest.fixture
+def configure_stubs(stub_tools, template_slp, monkeypatch):
+    """configure_stubs(runtime=..., frames=..., lines=..., output_kb=..., fail_rate=...)"""
+    def configure(**options):
+        for name, value in stub_environment(slp_path=template_slp, **options).items():
+            monkeypatch.setenv(name, value)
+    configure()
+    return configure
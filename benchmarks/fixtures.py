@@ -0,0 +1,107 @@
+"""
+Synthetic inputs for the benchmarks: .slp files in SLEAP's HDF5 layout and videos.
+
+make_slp() writes predicted instances for every frame (one per track, points
+moving on smooth paths), vectorized so even files with hundreds of thousands
+of frames are made in a second or two. make_video() writes a real video when
+OpenCV is installed and a placeholder file otherwise; the stub tools never
+read it.
+"""
+import os
+import json
+
+import numpy as np
+
+FRAME_DTYPE = [("frame_id", "i8"), ("video", "i4"), ("frame_idx", "i8"),
+               ("instance_id_start", "u8"), ("instance_id_end", "u8")]
+INSTANCE_DTYPE = [("instance_id", "i8"), ("instance_type", "u1"), ("frame_id", "u8"), ("track", "i4"),
+                  ("from_predicted", "i8"), ("skeleton", "u4"), ("score", "f4"), ("point_id_start", "u8"),
+                  ("point_id_end", "u8"), ("tracking_score", "f4")]
+POINT_DTYPE = [("x", "f8"), ("y", "f8"), ("visible", "?"), ("complete", "?"), ("score", "f8")]
+
+
+def make_slp(path, video_path="video.mp4", n_frames=1000, n_nodes=12, n_tracks=2):
+    """Write a predictions-only .slp with n_tracks instances of n_nodes points in every frame"""
+    import h5py
+
+    metadata = {
+        "skeletons": [{
+            "nodes": [{"id": node} for node in range(n_nodes)],
+            "links": [{"source": node, "target": node + 1,
+                       "type": {"py/reduce": [{"py/type": "sleap.skeleton.EdgeType"}, {"py/tuple": [1]}]}}
+                      for node in range(n_nodes - 1)],
+        }],
+        "nodes": [{"name": f"node{node}"} for node in range(n_nodes)],
+    }
+
+    n_instances = n_frames * n_tracks
+    frames = np.zeros(n_frames, dtype=FRAME_DTYPE)
+    frames["frame_id"] = np.arange(n_frames)
+    frames["frame_idx"] = np.arange(n_frames)
+    frames["instance_id_start"] = np.arange(n_frames) * n_tracks
+    frames["instance_id_end"] = frames["instance_id_start"] + n_tracks
+
+    instances = np.zeros(n_instances, dtype=INSTANCE_DTYPE)
+    instances["instance_id"] = np.arange(n_instances)
+    instances["instance_type"] = 1
+    instances["frame_id"] = np.repeat(np.arange(n_frames), n_tracks)
+    instances["track"] = np.tile(np.arange(n_tracks), n_frames)
+    instances["score"] = 0.9
+    instances["point_id_start"] = np.arange(n_instances) * n_nodes
+    instances["point_id_end"] = instances["point_id_start"] + n_nodes
+    instances["tracking_score"] = 0.8
+
+    frame = np.repeat(np.arange(n_frames), n_tracks * n_nodes)
+    track = np.tile(np.repeat(np.arange(n_tracks), n_nodes), n_frames)
+    node = np.tile(np.arange(n_nodes), n_instances)
+    points = np.zeros(n_instances * n_nodes, dtype=POINT_DTYPE)
+    points["x"] = 100 + 200 * track + 50 * np.sin(frame / 50) + 10 * node
+    points["y"] = 200 + 50 * np.cos(frame / 40) + 5 * node
+    points["visible"] = True
+    points["complete"] = True
+    points["score"] = 0.9
+
+    with h5py.File(path, "w") as f:
+        dataset = f.create_dataset("metadata", data=[0])
+        dataset.attrs["format_id"] = 1.2
+        dataset.attrs["json"] = json.dumps(metadata)
+        f.create_dataset("tracks_json", data=[json.dumps([0, f"track_{index}"]).encode()
+                                              for index in range(n_tracks)])
+        f.create_dataset("videos_json", data=[json.dumps({"backend": {"filename": video_path}}).encode()])
+        f.create_dataset("frames", data=frames)
+        f.create_dataset("instances", data=instances)
+        f.create_dataset("pred_points", data=points)
+    return path
+
+
+def make_video(path, n_frames=100, width=64, height=48, fps=30.0):
+    """Write a small video, or a placeholder file if OpenCV isn't installed"""
+    try:
+        import cv2
+    except ImportError:
+        cv2 = None
+    if cv2 is not None and hasattr(cv2, "VideoWriter"):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        image = np.zeros((height, width, 3), np.uint8)
+        for index in range(n_frames):
+            image[:] = index % 255
+            writer.write(image)
+        writer.release()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return path
+    with open(path, "wb") as f:
+        f.write(b"\0" * 1024)
+    return path
+
+
+def make_videos(directory, count, n_frames=100):
+    """count videos named video0000.mp4, ... in directory; the first is copied to save time"""
+    import shutil
+
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f"video{index:04d}.mp4") for index in range(count)]
+    if paths:
+        make_video(paths[0], n_frames)
+        for path in paths[1:]:
+            shutil.copyfile(paths[0], path)
+    return paths
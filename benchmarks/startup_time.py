@@ -0,0 +1,138 @@
+"""
+Startup time benchmark.
+
+Imports sleapgui.main in a fresh interpreter with `python -X importtime` and
+reports the total import time, the slowest modules and whether any heavy module
+(sleap, TensorFlow, cv2, ...) was pulled in. With --window it also measures the
+time until the main window has been shown (offscreen Qt platform).
+
+Exits with 1 if the budget is exceeded or a heavy module is imported, so it can
+run in CI:
+
+    python benchmarks/startup_time.py --budget 1.0 --window
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported before the window is shown
+HEAVY_MODULES = ("sleap", "tensorflow", "cv2", "h5py", "numpy", "pandas", "pyarrow")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+from qtpy.QtWidgets import QApplication
+from sleapgui.main import ModelGUI
+app = QApplication([])
+window = ModelGUI()
+window.show()
+app.processEvents()
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(args, env=None):
+    full_env = dict(os.environ)
+    full_env["PYTHONPATH"] = REPO_ROOT + os.pathsep + full_env.get("PYTHONPATH", "")
+    full_env.update(env or {})
+    return subprocess.run([sys.executable] + args, capture_output=True, text=True, env=full_env)
+
+
+def import_times(module):
+    """
+    Returns:
+        tuple: (total seconds, list of (cumulative seconds, module name)) for `import module`
+    """
+    result = run_python(["-X", "importtime", "-c", f"import {module}"])
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    modules = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1e6
+        name = match.group(4)
+        modules.append((cumulative, name))
+        # Top level imports aren't indented, their cumulative times add up to the total
+        if len(match.group(3)) <= 1:
+            total += cumulative
+    return total, modules
+
+
+def heavy_imports(module):
+    result = run_python(["-c", f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"])
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return sorted({name.split(".")[0] for name in loaded} & set(HEAVY_MODULES))
+
+
+def window_time():
+    """Seconds from interpreter start until the window has been shown"""
+    start = time.perf_counter()
+    result = run_python(["-c", WINDOW_SCRIPT], env={"QT_QPA_PLATFORM": "offscreen"})
+    total = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Showing the window failed:\n{result.stderr}")
+    return total, float(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure sleapGUI startup time")
+    parser.add_argument("--module", default="sleapgui.main", help="Module to import")
+    parser.add_argument("--budget", type=float, default=1.0, help="Allowed seconds (import, or window with --window)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--window", action="store_true", help="Also measure the time until the window is shown")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    total, modules = import_times(args.module)
+    heavy = heavy_imports(args.module)
+    results = {
+        "module": args.module,
+        "import_seconds": round(total, 3),
+        "slowest": [{"module": name, "seconds": round(seconds, 3)}
+                    for seconds, name in sorted(modules, reverse=True)[:args.top]],
+        "heavy_modules": heavy,
+        "budget_seconds": args.budget,
+    }
+    measured = total
+    if args.window:
+        process_seconds, window_seconds = window_time()
+        results["window_seconds"] = round(window_seconds, 3)
+        results["process_seconds"] = round(process_seconds, 3)
+        measured = process_seconds
+
+    ok = measured <= args.budget and not heavy
+    results["ok"] = ok
+
+    if args.json:
+        print(json.dumps(results, indent=1))
+    else:
+        print(f"import {args.module}: {total:.3f} s")
+        if args.window:
+            print(f"window shown after {results['window_seconds']:.3f} s "
+                  f"({results['process_seconds']:.3f} s including interpreter start)")
+        print("slowest modules (cumulative):")
+        for entry in results["slowest"]:
+            print(f"  {entry['seconds']:7.3f} s  {entry['module']}")
+        if heavy:
+            print(f"heavy modules imported at startup: {', '.join(heavy)}")
+        print(f"{'OK' if ok else 'FAIL'} (budget {args.budget:.1f} s)")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Fake sleap-track / sleap-render executables for the benchmarks.
+
+install_stub_tools() writes both scripts into a directory that the benchmarks
+put first on PATH. They behave like the real tools as far as sleapGUI can tell
+(command line, JSON progress lines, output files, exit codes) and are
+configured through the environment, so one install serves every benchmark:
+
+    SLEAPGUI_STUB_RUNTIME    seconds each run takes (default 0)
+    SLEAPGUI_STUB_FRAMES     frames reported as processed (default 100)
+    SLEAPGUI_STUB_LINES      extra log lines written to stdout (default 0)
+    SLEAPGUI_STUB_OUTPUT_KB  size of a rendered video in KB (default 16)
+    SLEAPGUI_STUB_FAIL_RATE  probability (0-1) that a run fails (default 0)
+    SLEAPGUI_STUB_SLP        .slp file sleap-track copies to its -o path
+"""
+import os
+import sys
+import stat
+
+STUB_SCRIPT = r'''#!{python}
+import os, sys, time, json, random, shutil
+
+tool = {tool!r}
+runtime = float(os.environ.get("SLEAPGUI_STUB_RUNTIME", "0"))
+frames = int(os.environ.get("SLEAPGUI_STUB_FRAMES", "100"))
+lines = int(os.environ.get("SLEAPGUI_STUB_LINES", "0"))
+output_kb = int(os.environ.get("SLEAPGUI_STUB_OUTPUT_KB", "16"))
+fail_rate = float(os.environ.get("SLEAPGUI_STUB_FAIL_RATE", "0"))
+
+args = sys.argv[1:]
+output = args[args.index("-o") + 1] if "-o" in args else None
+
+if random.random() < fail_rate:
+    print(f"{{tool}}: simulated failure", file=sys.stderr)
+    sys.exit(1)
+
+updates = 10
+for update in range(1, updates + 1):
+    if runtime:
+        time.sleep(runtime / updates)
+    done = frames * update // updates
+    if tool == "sleap-track":
+        print(json.dumps({{"n_processed": done, "n_total": frames, "rate": frames / runtime if runtime else 1000.0}}), flush=True)
+for line in range(lines):
+    print(f"INFO stub log line {{line}} " + "x" * 60)
+
+if output:
+    if tool == "sleap-track":
+        shutil.copyfile(os.environ["SLEAPGUI_STUB_SLP"], output)
+    else:
+        with open(output, "wb") as f:
+            f.write(b"\0" * (output_kb * 1024))
+        print(f"Finished {{frames}} frames in {{runtime:.1f}} seconds", flush=True)
+'''
+
+TOOLS = ("sleap-track", "sleap-render")
+
+
+def install_stub_tools(directory):
+    """Write the stub executables into directory, returns the directory"""
+    os.makedirs(directory, exist_ok=True)
+    for tool in TOOLS:
+        path = os.path.join(directory, tool)
+        with open(path, 'w') as f:
+            f.write(STUB_SCRIPT.format(python=sys.executable, tool=tool))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return directory
+
+
+def stub_environment(runtime=0.0, frames=100, lines=0, output_kb=16, fail_rate=0.0, slp_path=None):
+    """Environment variables that configure the stubs"""
+    env = {
+        "SLEAPGUI_STUB_RUNTIME": str(runtime),
+        "SLEAPGUI_STUB_FRAMES": str(frames),
+        "SLEAPGUI_STUB_LINES": str(lines),
+        "SLEAPGUI_STUB_OUTPUT_KB": str(output_kb),
+        "SLEAPGUI_STUB_FAIL_RATE": str(fail_rate),
+    }
+    if slp_path:
+        env["SLEAPGUI_STUB_SLP"] = slp_path
+    return env
@@ -0,0 +1,62 @@
+"""
+Export throughput: rows per second written by the native .slp exporters, and a
+check that the native CSV is the one sleap's CSVAdaptor would write.
+"""
+import os
+import time
+
+import pytest
+
+pytest.importorskip("h5py")
+pytest.importorskip("numpy")
+
+from fixtures import make_slp
+
+from sleapgui.export import export_slp, write_csv_sleap, write_csv_streaming, EXPORT_FORMATS
+
+N_TRACKS = 2
+
+
+@pytest.fixture(scope="module")
+def large_slp(tmp_path_factory):
+    # About an hour of 30 fps video
+    return make_slp(str(tmp_path_factory.mktemp("export") / "labels.slp"), n_frames=100000, n_tracks=N_TRACKS)
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet", "npz"])
+def test_export_rows_per_second(export_format, large_slp, results, tmp_path):
+    if export_format == "parquet":
+        pytest.importorskip("pyarrow")
+    output_path = str(tmp_path / f"labels{EXPORT_FORMATS[export_format]}")
+
+    start = time.perf_counter()
+    _, note = export_slp(large_slp, output_path, export_format, "native")
+    seconds = time.perf_counter() - start
+    assert not note, f"fell back to sleap's exporter: {note}"
+
+    rows = 100000 * N_TRACKS
+    if export_format == "csv":
+        with open(output_path, 'rb') as f:
+            assert sum(1 for _ in f) - 1 == rows
+    record = results.add("export_rows_per_second", format=export_format, rows=rows,
+                         seconds=round(seconds, 3), rows_per_second=round(rows / seconds),
+                         output_bytes=os.path.getsize(output_path))
+    print(record)
+
+
+def test_streaming_csv_matches_csv_adaptor(tmp_path):
+    """The streamed CSV has the columns, row order and values of CSVAdaptor's"""
+    pytest.importorskip("sleap")
+    pd = pytest.importorskip("pandas")
+    slp_path = make_slp(str(tmp_path / "labels.slp"), n_frames=200, n_tracks=N_TRACKS)
+    native_path = str(tmp_path / "native.csv")
+    sleap_path = str(tmp_path / "sleap.csv")
+
+    # Chunks smaller than the file, so the chunk boundaries are covered too
+    write_csv_streaming(slp_path, native_path, chunk_frames=64)
+    write_csv_sleap(slp_path, sleap_path)
+
+    native = pd.read_csv(native_path)
+    reference = pd.read_csv(sleap_path)
+    assert list(native.columns) == list(reference.columns)
+    pd.testing.assert_frame_equal(native, reference, check_dtype=False)
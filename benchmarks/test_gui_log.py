@@ -0,0 +1,65 @@
+"""
+Log throughput of the main window: messages per second through ModelGUI.log
+until they're on screen.
+
+Runs the window in a fresh interpreter on the offscreen Qt platform (like
+startup_time.py), so a broken Qt binding can't take the whole session down.
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+pytest.importorskip("qtpy")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOG_SCRIPT = """
+import sys, json, time
+from qtpy.QtWidgets import QApplication
+from sleapgui.main import ModelGUI
+
+messages, status_every = int(sys.argv[1]), int(sys.argv[2])
+app = QApplication([])
+gui = ModelGUI("face")
+gui.show()
+app.processEvents()
+
+start = time.perf_counter()
+for index in range(messages):
+    if status_every and index % status_every:
+        gui.log(f"UPDATE_LAST_LINE:Analyzing video 1/1... {index} s elapsed")
+    else:
+        gui.log(f"Processing line {index} of the benchmark, some typical length of a log message")
+    # The worker threads' signals are delivered between batches like this
+    if index % 100 == 0:
+        app.processEvents()
+# Until every queued line is in the document
+while gui.log_text.pending:
+    gui.log_text.flush()
+    app.processEvents()
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "lines": gui.log_text.document().blockCount()}))
+"""
+
+MESSAGES = 20000
+
+
+@pytest.mark.parametrize("status_every", [0, 2])
+def test_log_messages_per_second(status_every, results):
+    """status_every=2 mixes in an UPDATE_LAST_LINE status update after every other line"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    result = subprocess.run([sys.executable, "-c", LOG_SCRIPT, str(MESSAGES), str(status_every)],
+                            capture_output=True, text=True, env=env, timeout=600)
+    assert result.returncode == 0, result.stderr[-2000:]
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+    record = results.add("log_messages_per_second", messages=MESSAGES, status_every=status_every,
+                         seconds=round(measured["seconds"], 3),
+                         messages_per_second=round(MESSAGES / measured["seconds"]),
+                         document_lines=measured["lines"])
+    print(record)
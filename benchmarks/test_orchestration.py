@@ -0,0 +1,149 @@
+"""
+Orchestration benchmarks: what sleapGUI itself adds on top of sleap-track / sleap-render.
+
+The stub tools return right away (or after a fixed runtime), so the measured
+time is process startup, monitoring, progress parsing, caching and scheduling.
+"""
+import os
+import json
+import time
+import subprocess
+
+from fixtures import make_videos
+
+from sleapgui.tasks import TaskRunner
+from sleapgui.batch import BatchRunner, load_manifest, EXIT_OK, EXIT_FAILED
+
+
+def run_task(task, params):
+    """Run a TaskRunner in this thread, returns (success, message, seconds)"""
+    finished = []
+    runner = TaskRunner(task, params)
+    runner.finished.connect(lambda success, message: finished.append((success, message)))
+    start = time.perf_counter()
+    runner.run()
+    seconds = time.perf_counter() - start
+    success, message = finished[-1] if finished else (False, "no result")
+    return success, message, seconds
+
+
+def bare_stub_seconds(tool="sleap-track", repeat=10):
+    """Average wall time of running the stub directly, the floor for one job"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        subprocess.run([tool, "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) / repeat
+
+
+def write_manifest(directory, video_paths, **settings):
+    model_dir = os.path.join(directory, "model")
+    os.makedirs(model_dir, exist_ok=True)
+    manifest = {
+        "model": model_dir,
+        "base_name": "labels.v001",
+        "frame_rate": 30,
+        "renderer": "sleap-render",
+        "videos": [{"video": path, "output_dir": os.path.join(directory, "out", os.path.basename(path))}
+                   for path in video_paths],
+    }
+    manifest.update(settings)
+    path = os.path.join(directory, "manifest.json")
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+def test_analyze_job_overhead(batch_size, configure_stubs, results, tmp_path):
+    """Wall time per analyze job beyond the cost of running sleap-track itself"""
+    configure_stubs(runtime=0)
+    video_paths = make_videos(str(tmp_path / "videos"), batch_size)
+    params = {
+        "model_path": str(tmp_path),
+        "base_name": "labels.v001",
+        "video_paths": video_paths,
+        "output_dirs": [str(tmp_path / "out" / str(index)) for index in range(batch_size)],
+        "mode": "face",
+    }
+
+    success, message, seconds = run_task("analyze", params)
+    assert success, message
+    baseline = bare_stub_seconds()
+
+    per_job = seconds / batch_size
+    record = results.add("analyze_job_overhead", videos=batch_size, seconds=round(seconds, 3),
+                         per_job_seconds=round(per_job, 4), stub_seconds=round(baseline, 4),
+                         overhead_seconds=round(per_job - baseline, 4))
+    print(record)
+
+    # Every job after the first hits the skip cache
+    success, message, cached_seconds = run_task("analyze", params)
+    assert success, message
+    results.add("analyze_cached_check", videos=batch_size, seconds=round(cached_seconds, 3),
+                per_job_seconds=round(cached_seconds / batch_size, 5))
+
+
+def test_batch_makespan(batch_size, configure_stubs, results, tmp_path):
+    """End-to-end analyze -> CSV -> render of a headless batch"""
+    configure_stubs(runtime=0.05, frames=100)
+    video_paths = make_videos(str(tmp_path / "videos"), batch_size)
+    settings = load_manifest(write_manifest(str(tmp_path), video_paths, pipeline=True))
+    events = []
+
+    def report(event, **fields):
+        events.append(event)
+
+    start = time.perf_counter()
+    exit_code = BatchRunner(settings, report).run()
+    seconds = time.perf_counter() - start
+    assert exit_code == EXIT_OK
+
+    record = results.add("batch_makespan", videos=batch_size, stub_runtime=0.05,
+                         seconds=round(seconds, 3), videos_per_second=round(batch_size / seconds, 3),
+                         events=len(events))
+    print(record)
+
+
+def test_batch_failure(configure_stubs, results, tmp_path):
+    """A failing sleap-track stops the batch promptly and is reported as such"""
+    # Every stub run fails, a random rate could let the whole batch through
+    configure_stubs(runtime=0.05, fail_rate=1.0)
+    video_paths = make_videos(str(tmp_path / "videos"), 10)
+    settings = load_manifest(write_manifest(str(tmp_path), video_paths))
+    failures = []
+
+    def report(event, **fields):
+        if event == "step_finished" and not fields.get("success"):
+            failures.append(fields)
+
+    start = time.perf_counter()
+    exit_code = BatchRunner(settings, report).run()
+    seconds = time.perf_counter() - start
+    assert exit_code == EXIT_FAILED
+    assert failures
+
+    results.add("batch_failure", fail_rate=1.0, seconds_to_stop=round(seconds, 3))
+
+
+def test_render_pool_output_volume(configure_stubs, results, tmp_path):
+    """Parallel sleap-render jobs that write a lot of log output"""
+    configure_stubs(runtime=0.1, lines=5000, output_kb=1024)
+    from fixtures import make_slp
+
+    slp_files = []
+    for index in range(8):
+        directory = tmp_path / f"out{index}"
+        directory.mkdir()
+        slp_files.append(make_slp(str(directory / "labels.v001.slp"), n_frames=100))
+    params = {
+        "output_dirs": [os.path.dirname(path) for path in slp_files],
+        "slp_files": slp_files,
+        "frame_rate": 30,
+        "video_format": "mp4",
+        "render_jobs": 4,
+        "renderer": "sleap-render",
+    }
+
+    success, message, seconds = run_task("create_video", params)
+    assert success, message
+    results.add("render_pool_output_volume", jobs=len(slp_files), render_jobs=4, log_lines_per_job=5000,
+                seconds=round(seconds, 3))
@@ -24,10 +24,11 @@ setup(
     long_description_content_type='text/markdown',
     url='https://github.com/khicken/sleapGUI',
     packages=find_packages(),
+    package_data={'sleapgui': ['assets/*.ico']},
     install_requires=install_requires,
     entry_points={
         "console_scripts": [
-            "sleapgui=sleapgui.main:main",
+            "sleapgui=sleapgui.cli:main",
         ],
     },
     classifiers=[
@@ -0,0 +1,166 @@
+"""
+Index of what a batch produced for each video: video -> .slp -> export -> render.
+
+Stages record their outputs here as they write them, and later stages look them
+up instead of listing the output directories and taking every .slp they find
+(which pairs the wrong files when a folder holds several sessions, and is slow
+on shared folders with thousands of files). Outputs that were made before the
+index existed are found by their expected name (<output_dir>/<base_name>.slp,
+like analyze writes it) in a single os.scandir listing per directory.
+
+The index of a "Run All" batch is saved next to its journal, so a resumed batch
+knows the outputs of the steps it skips.
+"""
+import os
+import json
+import threading
+
+# Kinds of artifacts besides the video itself
+KINDS = ("slp", "export", "render", "preview")
+
+
+class ArtifactIndex:
+    """Artifacts of the videos of one batch, optionally persisted as JSON"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: JSON file the index is loaded from and saved to after every
+                  change, None keeps it in memory only
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.entries = []  # one dict per video: video, output_dir and the KINDS found so far
+        self.listings = {}  # directory -> set of file names, one scandir per directory
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f).get("videos", [])
+            except (OSError, ValueError):
+                self.entries = []
+
+    @classmethod
+    def for_videos(cls, video_paths, output_dirs, base_name, path=None):
+        """Index of a list of videos, with the .slp files that already exist filled in"""
+        index = cls(path)
+        # Entry i is video i, also when a video is in the batch twice. A saved index
+        # of the same batch (resumed) keeps what it recorded.
+        saved = {(entry["video"], entry["output_dir"]): entry for entry in index.entries}
+        index.entries = [saved.get((video_path, output_dir)) or {"video": video_path, "output_dir": output_dir}
+                         for video_path, output_dir in zip(video_paths, output_dirs)]
+        index.discover(base_name)
+        index.save()
+        return index
+
+    def add_video(self, video_path, output_dir):
+        """Register a video, returns its index (existing entries are kept)"""
+        with self.lock:
+            for position, entry in enumerate(self.entries):
+                if entry["video"] == video_path and entry["output_dir"] == output_dir:
+                    return position
+            self.entries.append({"video": video_path, "output_dir": output_dir})
+            self.save()
+            return len(self.entries) - 1
+
+    def record(self, video_path, kind, path):
+        """A stage wrote `path` for the video, e.g. record(video, "slp", slp_path)"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        directory, name = os.path.split(path)
+        with self.lock:
+            entries = [entry for entry in self.entries if entry["video"] == video_path]
+            # The same video can be in a batch twice with different output directories
+            in_directory = [entry for entry in entries
+                            if os.path.normpath(entry["output_dir"]) == os.path.normpath(directory)]
+            for entry in in_directory or entries:
+                entry[kind] = path
+            if directory in self.listings:
+                self.listings[directory].add(name)
+            self.save()
+
+    def record_for_slp(self, slp_path, kind, path):
+        """Like record(), for outputs made from a .slp file (export, rendered video)"""
+        with self.lock:
+            for entry in self.entries:
+                if entry.get("slp") and os.path.normpath(entry["slp"]) == os.path.normpath(slp_path):
+                    self.record(entry["video"], kind, path)
+                    return
+
+    def get(self, video, kind):
+        """
+        Args:
+            video: Position in the batch or video path
+            kind: One of KINDS
+
+        Returns:
+            str: path of the artifact if it was recorded and still exists, else None
+        """
+        with self.lock:
+            entry = self._entry(video)
+            path = entry.get(kind) if entry else None
+        if path and os.path.exists(path):
+            return path
+        return None
+
+    def slp_files(self, videos=None):
+        """.slp files of the given videos (default: all), videos without one are left out"""
+        with self.lock:
+            positions = range(len(self.entries)) if videos is None else videos
+            paths = [self.get(video, "slp") for video in positions]
+        return [path for path in paths if path]
+
+    def discover(self, base_name):
+        """Fill in the .slp files that exist under their expected name but weren't recorded"""
+        with self.lock:
+            changed = False
+            for entry in self.entries:
+                if entry.get("slp") and os.path.exists(entry["slp"]):
+                    continue
+                name = f"{base_name}.slp"
+                if name in self.listing(entry["output_dir"]):
+                    entry["slp"] = os.path.join(entry["output_dir"], name)
+                    changed = True
+            if changed:
+                self.save()
+
+    def listing(self, directory):
+        """File names in a directory, listed once with os.scandir and then kept up to date by record()"""
+        with self.lock:
+            if directory not in self.listings:
+                names = set()
+                try:
+                    with os.scandir(directory) as scan:
+                        for item in scan:
+                            if item.is_file():
+                                names.add(item.name)
+                except OSError:
+                    pass
+                self.listings[directory] = names
+            return self.listings[directory]
+
+    def directory_slp_files(self, directory):
+        """.slp files in a directory, for when there is no video list to go by (hidden segment files are skipped)"""
+        return [os.path.join(directory, name) for name in sorted(self.listing(directory))
+                if name.endswith(".slp") and not name.startswith(".")]
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, 'w') as f:
+                    json.dump({"videos": self.entries}, f, indent=1)
+                os.replace(temp_path, self.path)
+            except OSError:
+                # Recording is best effort, the outputs themselves are what matters
+                pass
+
+    def _entry(self, video):
+        if isinstance(video, int):
+            return self.entries[video] if 0 <= video < len(self.entries) else None
+        for entry in self.entries:
+            if entry["video"] == video:
+                return entry
+        return None
@@ -0,0 +1,499 @@
+"""
+Headless batch runner: `sleapgui batch manifest.json`
+
+Runs the same analyze -> save_csv -> create_video workflow as "Run All" in the
+GUI, but without Qt, so it works on display-less cluster nodes. Progress is
+written to stdout as one JSON object per line.
+
+Manifest (JSON, relative paths are relative to the manifest):
+
+    {
+        "model": "models/face",
+        "mode": "face",                # face, face_social or pupil
+        "base_name": "labels.v001",
+        "frame_rate": 120,
+        "video_format": "mp4",         # mp4 or avi
+        "export_format": "csv",        # csv, parquet, npz or npy
+        "render_jobs": 4,              # optional
+        "renderer": "native",          # optional, or "sleap-render"
+        "encoder": "auto",             # optional, native renderer: auto, ffmpeg or opencv
+        "preset": "veryfast",          # optional, libx264 preset/CRF when encoding with ffmpeg
+        "crf": 23,                     # optional
+        "preview": false,              # optional, true or {"scale": 0.5, "stride": 1, "max_duration": 60}:
+                                       # render <name>.preview.mp4 quick-look videos instead of full ones
+        "segments": 1,                 # optional, track each video as N parallel pieces
+        "warm_inference": false,       # optional
+        "pipeline": false,             # optional, overlap analysis with export/render
+        "force": false,                # optional
+        "job_order": "longest_first",  # optional, or "user": order of parallel jobs (render pool, coordinator)
+        "governor": {"min_available": 0.15, "max_load": 1.5},  # optional, see governor.py, false to disable
+        "videos": [
+            {"video": "raw/mouse1.mp4", "output_dir": "out/mouse1"},
+            "raw/mouse2.mp4"           # output_dir defaults to the video's directory
+        ]
+    }
+
+The {"event": "done"} line at the end lists the outputs of every video under
+"artifacts" (video, output_dir, slp, export, render/preview paths).
+
+With --trace PATH the timing spans of every step and child process are saved
+in Chrome's trace-event format (open in chrome://tracing or ui.perfetto.dev),
+with a summary table next to it; a {"event": "trace"} line after "done" lists
+the same summary.
+
+--metrics-listen [HOST:]PORT and --metrics-textfile PATH export Prometheus
+metrics of the batch (queues, finished/failed videos, frames/sec, stage
+durations, child memory), see metrics.py.
+
+Exit codes: 0 everything succeeded, 1 a step failed, 2 invalid manifest or
+arguments, 130 interrupted.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+
+try:
+    from sleapgui.tasks import TaskRunner, default_render_jobs
+    from sleapgui.pipeline import WorkflowPipeline
+    from sleapgui.export import EXPORT_FORMATS
+    from sleapgui.schedule import JOB_ORDERS
+    from sleapgui.governor import DEFAULT_LIMITS
+    from sleapgui.render import RENDERERS, ENCODERS, DEFAULT_PRESET, DEFAULT_CRF
+    from sleapgui.artifacts import ArtifactIndex
+    from sleapgui.tracing import Tracer, summary_path
+    from sleapgui.metrics import BatchMetrics, add_metrics_arguments, start_exporters
+except ModuleNotFoundError:
+    from tasks import TaskRunner, default_render_jobs
+    from pipeline import WorkflowPipeline
+    from export import EXPORT_FORMATS
+    from schedule import JOB_ORDERS
+    from governor import DEFAULT_LIMITS
+    from render import RENDERERS, ENCODERS, DEFAULT_PRESET, DEFAULT_CRF
+    from artifacts import ArtifactIndex
+    from tracing import Tracer, summary_path
+    from metrics import BatchMetrics, add_metrics_arguments, start_exporters
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+MODES = ("face", "face_social", "pupil")
+VIDEO_FORMATS = ("mp4", "avi")
+
+
+class ManifestError(Exception):
+    """The batch manifest is missing or has invalid fields"""
+
+
+def load_manifest(path, require_videos=True):
+    """
+    Read and validate a batch manifest.
+
+    Args:
+        path: Manifest file
+        require_videos: False for settings-only manifests (`sleapgui watch`)
+
+    Returns:
+        dict: settings with absolute paths and defaults filled in
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"Could not read manifest {path}: {str(e)}")
+    if not isinstance(manifest, dict):
+        raise ManifestError("The manifest must be a JSON object")
+
+    root = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value):
+        return os.path.normpath(os.path.join(root, os.path.expanduser(value)))
+
+    if not manifest.get("model"):
+        raise ManifestError("'model' is required")
+    model_path = resolve(manifest["model"])
+    if not os.path.exists(model_path):
+        raise ManifestError(f"Model does not exist: {model_path}")
+
+    mode = manifest.get("mode", "face")
+    if mode not in MODES:
+        raise ManifestError(f"Unknown mode '{mode}', expected one of {', '.join(MODES)}")
+
+    video_format = str(manifest.get("video_format", "mp4")).lower()
+    if video_format not in VIDEO_FORMATS:
+        raise ManifestError(f"Unknown video_format '{video_format}'")
+
+    export_format = str(manifest.get("export_format", "csv")).lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ManifestError(f"Unknown export_format '{export_format}'")
+
+    renderer = manifest.get("renderer", "native")
+    if renderer not in RENDERERS:
+        raise ManifestError(f"Unknown renderer '{renderer}', expected one of {', '.join(RENDERERS)}")
+    encoder = manifest.get("encoder", "auto")
+    if encoder not in ENCODERS:
+        raise ManifestError(f"Unknown encoder '{encoder}', expected one of {', '.join(ENCODERS)}")
+
+    preview = manifest.get("preview", False)
+    if isinstance(preview, dict):
+        unknown = set(preview) - {"scale", "stride", "max_duration"}
+        if unknown:
+            raise ManifestError(f"Unknown preview settings: {', '.join(sorted(unknown))}")
+    elif not isinstance(preview, bool):
+        raise ManifestError("'preview' must be true, false or an object")
+
+    job_order = manifest.get("job_order", "longest_first")
+    if job_order not in JOB_ORDERS:
+        raise ManifestError(f"Unknown job_order '{job_order}', expected one of {', '.join(JOB_ORDERS)}")
+
+    governor = manifest.get("governor")
+    if isinstance(governor, dict):
+        unknown = set(governor) - set(DEFAULT_LIMITS)
+        if unknown:
+            raise ManifestError(f"Unknown governor limits: {', '.join(sorted(unknown))}")
+        if not all(isinstance(value, (int, float)) for value in governor.values()):
+            raise ManifestError("Governor limits must be numbers")
+    elif governor not in (None, True, False):
+        raise ManifestError("'governor' must be an object with limits, or false")
+    if governor is True:
+        governor = None
+
+    video_paths = []
+    output_dirs = []
+    for entry in manifest.get("videos") or []:
+        if isinstance(entry, str):
+            entry = {"video": entry}
+        if not isinstance(entry, dict) or not entry.get("video"):
+            raise ManifestError(f"Invalid video entry: {entry!r}")
+        video_path = resolve(entry["video"])
+        if not os.path.isfile(video_path):
+            raise ManifestError(f"Video does not exist: {video_path}")
+        video_paths.append(video_path)
+        output_dirs.append(resolve(entry["output_dir"]) if entry.get("output_dir")
+                           else os.path.dirname(video_path))
+    if not video_paths and require_videos:
+        raise ManifestError("'videos' must list at least one video")
+
+    try:
+        frame_rate = int(manifest.get("frame_rate", 120))
+        render_jobs = int(manifest.get("render_jobs") or default_render_jobs())
+        segments = int(manifest.get("segments") or 1)
+        crf = int(manifest.get("crf", DEFAULT_CRF))
+    except (TypeError, ValueError) as e:
+        raise ManifestError(f"Invalid number: {str(e)}")
+
+    return {
+        "model_path": model_path,
+        "mode": mode,
+        "base_name": manifest.get("base_name", "labels.v001"),
+        "frame_rate": frame_rate,
+        "video_format": video_format,
+        "export_format": export_format,
+        "render_jobs": max(1, render_jobs),
+        "segments": max(1, segments),
+        "renderer": renderer,
+        "encoder": encoder,
+        "preset": str(manifest.get("preset", DEFAULT_PRESET)),
+        "crf": crf,
+        "preview": preview,
+        "warm_inference": bool(manifest.get("warm_inference", False)),
+        "pipeline": bool(manifest.get("pipeline", False)),
+        "force": bool(manifest.get("force", False)),
+        "job_order": job_order,
+        "governor": governor,
+        "video_paths": video_paths,
+        "output_dirs": output_dirs,
+    }
+
+
+def task_params(settings, step, video_index, artifacts=None, tracer=None):
+    """Worker params for one step of one video, same as the GUI's workflow"""
+    video_path = settings["video_paths"][video_index]
+    output_dir = settings["output_dirs"][video_index]
+    slp_path = os.path.join(output_dir, f"{settings['base_name']}.slp")
+    if artifacts is not None:
+        slp_path = artifacts.get(video_index, "slp") or slp_path
+
+    if step == "analyze":
+        return {
+            "model_path": settings["model_path"],
+            "base_name": settings["base_name"],
+            "video_paths": [video_path],
+            "output_dirs": [output_dir],
+            "mode": settings["mode"],
+            "segments": settings["segments"],
+            "governor": settings.get("governor"),
+            "warm_inference": settings["warm_inference"],
+            "artifacts": artifacts,
+            "tracer": tracer,
+            "force": settings["force"],
+        }
+    if step == "save_csv":
+        return {
+            "output_dirs": [output_dir],
+            "video_paths": [video_path],
+            "slp_files": [slp_path],
+            "base_name": settings["base_name"],
+            "export_format": settings["export_format"],
+            "artifacts": artifacts,
+            "tracer": tracer,
+            "force": settings["force"],
+        }
+    if step == "create_video":
+        return {
+            "output_dirs": [output_dir],
+            "slp_files": [slp_path],
+            "frame_rate": settings["frame_rate"],
+            "video_format": settings["video_format"],
+            "render_jobs": settings["render_jobs"],
+            "job_order": settings.get("job_order", "longest_first"),
+            "renderer": settings.get("renderer", "native"),
+            "encoder": settings.get("encoder", "auto"),
+            "preset": settings.get("preset", DEFAULT_PRESET),
+            "crf": settings.get("crf", DEFAULT_CRF),
+            "preview": settings.get("preview", False),
+            "governor": settings.get("governor"),
+            "artifacts": artifacts,
+            "tracer": tracer,
+            "force": settings["force"],
+        }
+    raise ValueError(f"Unknown workflow step: {step}")
+
+
+class JsonLinesReporter:
+    """Writes one JSON object per event, flushed right away so pipes see it live"""
+
+    def __init__(self, stream=None, verbose=True):
+        self.stream = stream or sys.stdout
+        self.verbose = verbose
+
+    def __call__(self, event, **fields):
+        if not self.verbose and event in ("message", "status"):
+            return
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+class BatchRunner:
+    """Drives a WorkflowPipeline with TaskRunners in background threads"""
+
+    def __init__(self, settings, report, trace_path=None, metrics=None):
+        self.settings = settings
+        self.report = report
+        # Timing spans of the steps and their child processes, saved to trace_path at the end
+        self.trace_path = trace_path
+        self.tracer = Tracer("sleapgui batch") if trace_path else None
+        # Optional BatchMetrics (metrics.py) fed with the same events as the report
+        self.metrics = metrics
+        self.pipeline = WorkflowPipeline(
+            len(settings["video_paths"]),
+            overlap=settings["pipeline"],
+            video_keys=[os.path.normpath(path) for path in settings["output_dirs"]]
+        )
+        # Outputs of every video as the steps write them, reported at the end
+        self.artifacts = ArtifactIndex.for_videos(settings["video_paths"], settings["output_dirs"],
+                                                  settings["base_name"])
+        # Events from the runner threads, handled in the calling thread
+        self.events = queue.Queue()
+        self.runners = {}
+        self.last_progress = {}
+
+    def run(self):
+        """Run every step of every video, returns the exit code"""
+        total = len(self.settings["video_paths"])
+        self.report("start", videos=total, model=self.settings["model_path"], mode=self.settings["mode"])
+        start_time = time.time()
+        if self.tracer is not None:
+            self.tracer.begin("batch", "batch", "workflow", videos=total)
+
+        try:
+            return self._run(start_time)
+        finally:
+            self._save_trace()
+
+    def _run(self, start_time):
+        try:
+            self._start_jobs()
+            while self.runners:
+                try:
+                    # With a timeout so Ctrl+C is handled on every platform
+                    kind, step, index, payload = self.events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind == "finished":
+                    if not self._on_finished(step, index, *payload):
+                        self.cancel()
+                        self.report("done", success=False, elapsed=round(time.time() - start_time, 1))
+                        return EXIT_FAILED
+                    self._start_jobs()
+                else:
+                    self._on_event(kind, step, index, payload)
+        except KeyboardInterrupt:
+            self.cancel()
+            self.report("done", success=False, interrupted=True, elapsed=round(time.time() - start_time, 1))
+            return EXIT_INTERRUPTED
+
+        self.report("done", success=True, elapsed=round(time.time() - start_time, 1),
+                    artifacts=self.artifacts.entries)
+        return EXIT_OK
+
+    def cancel(self):
+        """Ask every running task to stop and wait for their threads"""
+        for runner, thread in self.runners.values():
+            runner.cancel_requested = True
+        for runner, thread in self.runners.values():
+            thread.join()
+        self.runners = {}
+        if self.metrics is not None:
+            self.metrics.stopped()
+
+    def _save_trace(self):
+        if self.tracer is None:
+            return
+        self.tracer.end("batch")
+        try:
+            self.tracer.save(self.trace_path)
+        except (OSError, ValueError) as e:
+            self.report("message", text=f"Could not save the trace: {str(e)}")
+            return
+        self.report("trace", path=self.trace_path, summary_path=summary_path(self.trace_path),
+                    summary=[dict(row, total=round(row["total"], 3), mean=round(row["mean"], 3),
+                                  max=round(row["max"], 3), share=round(row["share"], 3))
+                             for row in self.tracer.summary()])
+
+    def _start_jobs(self):
+        for step, index in self.pipeline.next_jobs():
+            runner = TaskRunner(step, task_params(self.settings, step, index, self.artifacts, self.tracer))
+            self._connect(runner, step, index)
+            thread = threading.Thread(target=runner.run, name=f"{step}-{index}")
+            thread.daemon = True
+            self.runners[(step, index)] = (runner, thread)
+            if self.tracer is not None:
+                # One row per stage, pipelined stages overlap
+                self.tracer.begin((step, index), step, "workflow", tid=self.tracer.row(step),
+                                  video=os.path.basename(self.settings["video_paths"][index]))
+            self.report("step_started", video=index, step=step,
+                        path=self.settings["video_paths"][index])
+            if self.metrics is not None:
+                self.metrics.step_started(step, index)
+            thread.start()
+        if self.metrics is not None:
+            self.metrics.set_queues(self.pipeline.queued())
+
+    def _connect(self, runner, step, index):
+        def put(kind):
+            return lambda *payload: self.events.put((kind, step, index, payload))
+        runner.progress.connect(put("progress"))
+        runner.message.connect(put("message"))
+        runner.stats.connect(put("stats"))
+        runner.file_finished.connect(put("file_finished"))
+        runner.finished.connect(put("finished"))
+
+    def _on_event(self, kind, step, index, payload):
+        if kind == "progress":
+            value = payload[0]
+            if self.last_progress.get((step, index)) == value:
+                return
+            self.last_progress[(step, index)] = value
+            self.pipeline.set_progress(step, index, value)
+            self.report("progress", video=index, step=step, percent=value,
+                        overall=round(self.pipeline.overall_progress(), 1))
+        elif kind == "message":
+            text = payload[0]
+            if text.startswith("UPDATE_LAST_LINE:"):
+                self.report("status", video=index, step=step, text=text[len("UPDATE_LAST_LINE:"):])
+            else:
+                self.report("message", video=index, step=step, text=text)
+        elif kind == "stats":
+            self.report("stats", video=index, step=step, **payload[0])
+            if self.metrics is not None:
+                self.metrics.stats(step, index, payload[0])
+        elif kind == "file_finished":
+            source, success, result = payload
+            self.report("file_finished", video=index, step=step, source=source,
+                        success=success, result=result)
+
+    def _on_finished(self, step, index, success, message):
+        runner, thread = self.runners.pop((step, index))
+        thread.join()
+        if self.tracer is not None:
+            self.tracer.end((step, index), success=success)
+        self.report("step_finished", video=index, step=step, success=success, message=message)
+        if self.metrics is not None:
+            self.metrics.step_finished(step, index, success)
+        if not success:
+            return False
+        if self.pipeline.stage_finished(step, index):
+            self.report("video_finished", video=index, path=self.settings["video_paths"][index])
+            if self.metrics is not None:
+                self.metrics.video_finished(index)
+        return True
+
+
+def main(argv=None):
+    """Entry point of `sleapgui batch`, returns the exit code"""
+    parser = argparse.ArgumentParser(
+        prog="sleapgui batch",
+        description="Run the analyze/export/render workflow from a JSON manifest without the GUI"
+    )
+    parser.add_argument("manifest", help="Path to the batch manifest (JSON)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run steps even if their outputs are up to date")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Analyze the next video while exporting/rendering the current one")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Only report progress and results, not the log messages")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Save timing spans of every step as a Chrome trace (JSON) plus a summary table")
+    add_metrics_arguments(parser)
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    report = JsonLinesReporter(verbose=not args.quiet)
+    try:
+        settings = load_manifest(args.manifest)
+    except ManifestError as e:
+        report("error", message=str(e))
+        return EXIT_USAGE
+
+    if args.force:
+        settings["force"] = True
+    if args.pipeline:
+        settings["pipeline"] = True
+
+    metrics = None
+    exporters = []
+    if args.metrics_listen or args.metrics_textfile:
+        metrics = BatchMetrics()
+        try:
+            exporters = start_exporters(metrics, args.metrics_listen, args.metrics_textfile, args.metrics_interval)
+        except (OSError, ValueError) as e:
+            report("error", message=f"Could not export metrics: {str(e)}")
+            return EXIT_USAGE
+        for exporter in exporters:
+            report("metrics", address=exporter.address)
+
+    try:
+        return BatchRunner(settings, report, trace_path=args.trace, metrics=metrics).run()
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+        if settings["warm_inference"]:
+            try:
+                from sleapgui.inference_server import shutdown_inference_servers
+            except ModuleNotFoundError:
+                from inference_server import shutdown_inference_servers
+            shutdown_inference_servers()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Skip cache for outputs that are already up to date.
+
+Every output directory gets a small manifest (.sleapgui_cache.json) that maps an
+output file name to the key of the inputs it was made from. The key is a hash of
+everything that affects the output, e.g. for a .slp file: the video fingerprint,
+the model directory contents, the sleap-track arguments and the node indices.
+If the key of a new run matches and the output still exists, the step is skipped.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+MANIFEST_NAME = ".sleapgui_cache.json"
+
+# Several workers (pipelined workflow, CSV pool) can write the same manifest
+_manifest_lock = threading.Lock()
+_model_fingerprints = {}
+
+
+def fingerprint_file(path, block_size=65536, blocks=8):
+    """
+    Cheap fingerprint of a (possibly huge) file: size, mtime and a hash of a few
+    evenly spaced blocks instead of the whole content.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        if stat.st_size <= block_size * blocks:
+            digest.update(f.read())
+        else:
+            step = (stat.st_size - block_size) // (blocks - 1)
+            for i in range(blocks):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    return {
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+        "sample_sha1": digest.hexdigest(),
+    }
+
+
+def fingerprint_model(model_path):
+    """Fingerprint of every file in the model directory (weights and configs)"""
+    entries = []
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            entries.append((os.path.relpath(path, model_path), stat.st_size, int(stat.st_mtime)))
+
+    # Hashing the weights is the slow part, reuse it while nothing changed
+    memo_key = (os.path.abspath(model_path), tuple(entries))
+    if memo_key not in _model_fingerprints:
+        digest = hashlib.sha1()
+        for relative_path, _, _ in entries:
+            digest.update(relative_path.encode())
+            digest.update(json.dumps(fingerprint_file(os.path.join(model_path, relative_path))).encode())
+        _model_fingerprints[memo_key] = digest.hexdigest()
+    return _model_fingerprints[memo_key]
+
+
+def make_key(*parts):
+    """Hash of any JSON-serializable parts"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def analysis_key(video_path, model_path, track_args, kf_node_indices):
+    return make_key(
+        "analyze",
+        fingerprint_file(video_path),
+        fingerprint_model(model_path),
+        list(track_args),
+        kf_node_indices,
+    )
+
+
+def derived_key(stage, source_path, **options):
+    """Key of an output made from another file (CSV or video from a .slp)"""
+    return make_key(stage, fingerprint_file(source_path), options)
+
+
+class CacheManifest:
+    """Manifest of one output directory"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_up_to_date(self, output_path, key):
+        """True if output_path exists and was made from inputs with this key"""
+        if not os.path.exists(output_path):
+            return False
+        with _manifest_lock:
+            entry = self._load().get(os.path.basename(output_path))
+        if entry is None or entry.get("key") != key:
+            return False
+        # The output itself must not have been replaced or truncated since
+        return entry.get("output") == fingerprint_file(output_path)
+
+    def record(self, output_path, key):
+        with _manifest_lock:
+            # Re-read so entries written by other workers aren't lost
+            entries = self._load()
+            entries[os.path.basename(output_path)] = {
+                "key": key,
+                "output": fingerprint_file(output_path),
+                "time": time.time(),
+            }
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(entries, f, indent=1)
+            os.replace(temp_path, self.path)
+
+
+def manifest_for(output_path):
+    return CacheManifest(os.path.dirname(os.path.abspath(output_path)))
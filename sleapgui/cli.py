@@ -0,0 +1,51 @@
+"""
+`sleapgui` console entry point.
+
+`sleapgui batch ...`, `sleapgui coordinator ...`, `sleapgui worker ...`,
+`sleapgui schedule ...` and `sleapgui watch ...` run headless and never import Qt, everything else starts the GUI (`sleapgui`,
+`sleapgui face social`, `sleapgui pupil`, ...).
+"""
+import sys
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == "batch":
+        try:
+            from sleapgui.batch import main as batch_main
+        except ModuleNotFoundError:
+            from batch import main as batch_main
+        sys.exit(batch_main(argv[1:]))
+
+    if argv and argv[0] in ("coordinator", "worker"):
+        try:
+            from sleapgui import coordinator
+        except ModuleNotFoundError:
+            import coordinator
+        entry = coordinator.main if argv[0] == "coordinator" else coordinator.worker_main
+        sys.exit(entry(argv[1:]))
+
+    if argv and argv[0] == "schedule":
+        try:
+            from sleapgui.schedule import main as schedule_main
+        except ModuleNotFoundError:
+            from schedule import main as schedule_main
+        sys.exit(schedule_main(argv[1:]))
+
+    if argv and argv[0] == "watch":
+        try:
+            from sleapgui.watch import main as watch_main
+        except ModuleNotFoundError:
+            from watch import main as watch_main
+        sys.exit(watch_main(argv[1:]))
+
+    try:
+        from sleapgui.main import main as gui_main
+    except ModuleNotFoundError:
+        from main import main as gui_main
+    gui_main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Distribute a batch over several machines through a shared directory.
+
+    sleapgui coordinator submit manifest.json --queue /shared/queue
+    sleapgui coordinator serve --queue /shared/queue      # on one host
+    sleapgui worker --queue /shared/queue                 # on every host, as often as you like
+    sleapgui coordinator status --queue /shared/queue
+
+The queue is a directory with one JSON file per video job:
+
+    batch.json           batch settings (same fields as a batch manifest)
+    pending/<job>.json   waiting for a worker
+    leased/<job>.json    being processed, holds the worker id; its mtime is the heartbeat
+    done/<job>.json      finished, with the result
+    failed/<job>.json    gave up after max_attempts
+
+Jobs move between the directories with os.rename, which is atomic within one
+file system (also on NFS/SMB shares), so two workers can never lease the same
+job. A worker touches its lease file every few seconds. The coordinator puts
+leases whose heartbeat is older than the lease timeout back into pending/. A
+worker that finds its lease gone stops working on the job.
+
+Every job runs analyze -> save_csv -> create_video for one video with the same
+TaskRunner the GUI and `sleapgui batch` use.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+try:
+    from sleapgui.tasks import TaskRunner
+    from sleapgui.pipeline import STAGES
+    from sleapgui.probe import probe_videos
+    from sleapgui.schedule import order_jobs, estimate_durations, stage_fps
+    from sleapgui.batch import (load_manifest, task_params, JsonLinesReporter, ManifestError,
+                                EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED)
+except ModuleNotFoundError:
+    from tasks import TaskRunner
+    from pipeline import STAGES
+    from probe import probe_videos
+    from schedule import order_jobs, estimate_durations, stage_fps
+    from batch import (load_manifest, task_params, JsonLinesReporter, ManifestError,
+                       EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED)
+
+STATES = ("pending", "leased", "done", "failed")
+
+
+def _write_json(path, data):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """File based job queue in a (shared) directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.exists(os.path.join(directory, "batch.json")):
+            raise ValueError(f"{directory} is not a job queue, submit a batch first")
+
+    @classmethod
+    def create(cls, directory, settings):
+        """
+        Create the queue directory with one pending job per video of the batch settings.
+        Jobs are appended if the queue already exists. Workers lease jobs in name order,
+        which is longest video first unless the settings ask for job_order "user".
+        """
+        for state in STATES:
+            os.makedirs(os.path.join(directory, state), exist_ok=True)
+        batch_path = os.path.join(directory, "batch.json")
+        if os.path.exists(batch_path):
+            existing = _read_json(batch_path)
+            if any(existing.get(key) != settings.get(key) for key in ("model_path", "mode", "base_name")):
+                raise ValueError("The queue already holds a batch with a different model, mode or base name")
+        batch_settings = {key: value for key, value in settings.items()
+                          if key not in ("video_paths", "output_dirs")}
+        _write_json(batch_path, batch_settings)
+
+        queue = cls(directory)
+        existing_ids = set()
+        for state in STATES:
+            existing_ids.update(queue._job_ids(state))
+        videos = list(zip(settings["video_paths"], settings["output_dirs"]))
+        if settings.get("job_order", "longest_first") != "user":
+            metadata = probe_videos(settings["video_paths"])
+            frame_counts = [(metadata.get(video_path) or {}).get("frame_count") for video_path, _ in videos]
+            videos = order_jobs(videos, estimate_durations(frame_counts, stage_fps("analyze")))
+        for video_path, output_dir in videos:
+            job_id = f"{len(existing_ids):05d}_{os.path.splitext(os.path.basename(video_path))[0]}"
+            existing_ids.add(job_id)
+            _write_json(queue._path("pending", job_id), {
+                "id": job_id,
+                "video": video_path,
+                "output_dir": output_dir,
+                "attempts": 0,
+            })
+        return queue
+
+    def settings(self):
+        return _read_json(os.path.join(self.directory, "batch.json"))
+
+    def counts(self):
+        return {state: len(self._job_ids(state)) for state in STATES}
+
+    def lease(self, worker_id):
+        """
+        Take the next pending job.
+
+        Returns:
+            dict: the job, None if nothing is pending
+        """
+        for job_id in self._job_ids("pending"):
+            leased_path = self._path("leased", job_id)
+            try:
+                os.rename(self._path("pending", job_id), leased_path)
+            except FileNotFoundError:
+                # Another worker was faster
+                continue
+            # rename keeps the old mtime, start the heartbeat clock now
+            os.utime(leased_path, None)
+            job = _read_json(leased_path)
+            job["worker"] = worker_id
+            job["leased_at"] = time.time()
+            _write_json(leased_path, job)
+            return job
+        return None
+
+    def heartbeat(self, job):
+        """Renew the lease, returns False if it has been taken away"""
+        path = self._path("leased", job["id"])
+        try:
+            if _read_json(path).get("worker") != job["worker"]:
+                return False
+            os.utime(path, None)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def complete(self, job, success, message, max_attempts=2):
+        """Record the result of a leased job, failed jobs are retried up to max_attempts"""
+        if not self.heartbeat(job):
+            # Lease expired and the job was handed out again, that run reports the result
+            return
+        job = dict(job, success=success, message=message, finished_at=time.time())
+        job["attempts"] = job.get("attempts", 0) + 1
+        leased_path = self._path("leased", job["id"])
+        if success:
+            _write_json(self._path("done", job["id"]), job)
+            os.remove(leased_path)
+        elif job["attempts"] < max_attempts:
+            self._release(job)
+        else:
+            _write_json(self._path("failed", job["id"]), job)
+            os.remove(leased_path)
+
+    def release(self, job):
+        """Give a leased job back without counting an attempt (e.g. the worker is shutting down)"""
+        if self.heartbeat(job):
+            self._release(dict(job))
+
+    def requeue_expired(self, lease_timeout, max_attempts=2):
+        """
+        Put jobs whose worker stopped sending heartbeats back into pending (or
+        failed after max_attempts).
+
+        Returns:
+            list: ids of the jobs that were re-queued or failed
+        """
+        expired = []
+        now = time.time()
+        for job_id in self._job_ids("leased"):
+            path = self._path("leased", job_id)
+            try:
+                # rename updates ctime on POSIX, so a job that was just leased never looks stale
+                if now - max(os.path.getmtime(path), os.path.getctime(path)) <= lease_timeout:
+                    continue
+                job = _read_json(path)
+            except (OSError, ValueError):
+                continue
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["message"] = f"Lease of {job.get('worker')} expired"
+            if job["attempts"] < max_attempts:
+                self._release(job)
+            else:
+                _write_json(self._path("failed", job_id), job)
+                os.remove(path)
+            expired.append(job_id)
+        return expired
+
+    def results(self, state):
+        jobs = []
+        for job_id in self._job_ids(state):
+            try:
+                jobs.append(_read_json(self._path(state, job_id)))
+            except (OSError, ValueError):
+                pass
+        return jobs
+
+    def _release(self, job):
+        # Rewrite in place first, then move: the job must never appear in pending/
+        # while it's still being written
+        leased_path = self._path("leased", job["id"])
+        for key in ("worker", "leased_at"):
+            job.pop(key, None)
+        _write_json(leased_path, job)
+        os.rename(leased_path, self._path("pending", job["id"]))
+
+    def _path(self, state, job_id):
+        return os.path.join(self.directory, state, f"{job_id}.json")
+
+    def _job_ids(self, state):
+        directory = os.path.join(self.directory, state)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+
+
+def run_job(queue, job, report, heartbeat_interval=10):
+    """
+    Run every stage of one job, renewing the lease in the background.
+
+    Returns:
+        tuple: (success, message)
+    """
+    settings = dict(queue.settings(), video_paths=[job["video"]], output_dirs=[job["output_dir"]])
+    state = {"runner": None, "lost": False}
+    stop = threading.Event()
+
+    def keep_lease():
+        while not stop.wait(heartbeat_interval):
+            if not queue.heartbeat(job):
+                state["lost"] = True
+                report("lease_lost", job=job["id"])
+                runner = state["runner"]
+                if runner is not None:
+                    runner.cancel_requested = True
+                return
+
+    heartbeat_thread = threading.Thread(target=keep_lease)
+    heartbeat_thread.daemon = True
+    heartbeat_thread.start()
+    try:
+        for step in STAGES:
+            if state["lost"]:
+                return False, "Lease lost"
+            result = {}
+            runner = TaskRunner(step, task_params(settings, step, 0))
+            runner.message.connect(lambda text, step=step: report("message", job=job["id"], step=step, text=text))
+            runner.finished.connect(lambda success, message: result.update(success=success, message=message))
+            state["runner"] = runner
+            report("step_started", job=job["id"], step=step)
+            runner.run()
+            report("step_finished", job=job["id"], step=step, **result)
+            if not result.get("success"):
+                return False, f"{step}: {result.get('message', '')}"
+        return True, ""
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+
+
+def worker_main(argv=None):
+    """Entry point of `sleapgui worker`, returns the exit code"""
+    parser = argparse.ArgumentParser(prog="sleapgui worker",
+                                     description="Process jobs from a shared sleapGUI job queue")
+    parser.add_argument("--queue", required=True, help="Shared queue directory")
+    parser.add_argument("--id", default=None, help="Worker id (default: host-pid)")
+    parser.add_argument("--heartbeat", type=float, default=10, help="Seconds between lease renewals")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Attempts per job before it fails")
+    parser.add_argument("--wait", action="store_true",
+                        help="Keep polling for new jobs instead of exiting when the queue is empty")
+    parser.add_argument("--poll", type=float, default=5, help="Seconds between polls with --wait")
+    parser.add_argument("--quiet", action="store_true", help="Don't report log messages")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    report = JsonLinesReporter(verbose=not args.quiet)
+    try:
+        queue = JobQueue(args.queue)
+    except ValueError as e:
+        report("error", message=str(e))
+        return EXIT_USAGE
+
+    worker_id = args.id or default_worker_id()
+    report("worker_started", worker=worker_id, queue=os.path.abspath(args.queue))
+    failures = 0
+    job = None
+    try:
+        while True:
+            job = queue.lease(worker_id)
+            if job is None:
+                if args.wait:
+                    time.sleep(args.poll)
+                    continue
+                break
+            report("job_started", job=job["id"], video=job["video"])
+            success, message = run_job(queue, job, report, args.heartbeat)
+            queue.complete(job, success, message, args.max_attempts)
+            report("job_finished", job=job["id"], success=success, message=message)
+            failures += 0 if success else 1
+            job = None
+    except KeyboardInterrupt:
+        if job is not None:
+            # Hand the job back right away instead of waiting for the lease to expire
+            queue.release(job)
+        report("worker_stopped", worker=worker_id, interrupted=True)
+        return EXIT_INTERRUPTED
+
+    report("worker_stopped", worker=worker_id, failures=failures)
+    return EXIT_OK if failures == 0 else EXIT_FAILED
+
+
+def main(argv=None):
+    """Entry point of `sleapgui coordinator`, returns the exit code"""
+    parser = argparse.ArgumentParser(prog="sleapgui coordinator",
+                                     description="Own a shared sleapGUI job queue")
+    subparsers = parser.add_subparsers(dest="command")
+
+    submit = subparsers.add_parser("submit", help="Add the videos of a batch manifest to the queue")
+    submit.add_argument("manifest")
+    submit.add_argument("--queue", required=True)
+
+    serve = subparsers.add_parser("serve", help="Re-queue expired leases and report progress until done")
+    serve.add_argument("--queue", required=True)
+    serve.add_argument("--lease-timeout", type=float, default=120,
+                       help="Seconds without heartbeat before a job is handed to another worker")
+    serve.add_argument("--max-attempts", type=int, default=2)
+    serve.add_argument("--poll", type=float, default=5)
+
+    status = subparsers.add_parser("status", help="Print the number of jobs per state")
+    status.add_argument("--queue", required=True)
+
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    if args.command is None:
+        parser.print_usage()
+        return EXIT_USAGE
+
+    report = JsonLinesReporter()
+    try:
+        if args.command == "submit":
+            settings = load_manifest(args.manifest)
+            queue = JobQueue.create(args.queue, settings)
+            report("submitted", jobs=len(settings["video_paths"]), **queue.counts())
+            return EXIT_OK
+        queue = JobQueue(args.queue)
+    except (ManifestError, ValueError, OSError) as e:
+        report("error", message=str(e))
+        return EXIT_USAGE
+
+    if args.command == "status":
+        report("status", **queue.counts())
+        return EXIT_FAILED if queue.counts()["failed"] else EXIT_OK
+
+    last_counts = None
+    try:
+        while True:
+            for job_id in queue.requeue_expired(args.lease_timeout, args.max_attempts):
+                report("lease_expired", job=job_id)
+            counts = queue.counts()
+            if counts != last_counts:
+                report("status", **counts)
+                last_counts = counts
+            if counts["pending"] == 0 and counts["leased"] == 0:
+                break
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+
+    for job in queue.results("failed"):
+        report("job_failed", job=job["id"], video=job["video"], message=job.get("message", ""))
+    return EXIT_FAILED if last_counts["failed"] else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Functions that run inside the export process pool.
+
+Everything here has to be importable by a freshly spawned interpreter, so keep it
+free of Qt and only import sleap inside the pool processes.
+
+The writers take an optional spans list that gets (name, start, end) tuples
+appended for reading the .slp ("load_file") and writing the output ("write"),
+export_slp_traced() sends them back to the batch trace (tracing.py).
+"""
+import os
+import time
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from sleapgui.slpio import UnsupportedSlpError, read_metadata, check_streamable, iter_instance_chunks
+except ModuleNotFoundError:
+    from slpio import UnsupportedSlpError, read_metadata, check_streamable, iter_instance_chunks
+
+_sleap = None
+_CSVAdaptor = None
+
+# Export format -> suffix of the output file
+EXPORT_FORMATS = {
+    "csv": ".analysis.csv",
+    "parquet": ".analysis.parquet",
+    "npz": ".analysis.npz",
+    "npy": ".analysis.npy",
+}
+
+
+@contextlib.contextmanager
+def _span(spans, name):
+    start = time.time()
+    try:
+        yield
+    finally:
+        if spans is not None:
+            spans.append((name, start, time.time()))
+
+
+def _timed(iterable, spans, name):
+    """Iterate, adding the time spent in every next() as a span"""
+    iterator = iter(iterable)
+    while True:
+        with _span(spans, name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _init_export_process():
+    """Import sleap once per process, on the first conversion that needs it"""
+    global _sleap, _CSVAdaptor
+    import sleap
+    from sleap.io.format.csv import CSVAdaptor
+    _sleap = sleap
+    _CSVAdaptor = CSVAdaptor
+
+
+def write_csv_sleap(slp_path, csv_path, spans=None):
+    """Convert through sleap's Labels objects and CSVAdaptor (slow, handles every file)"""
+    if _sleap is None:
+        with _span(spans, "import_sleap"):
+            _init_export_process()
+    with _span(spans, "load_file"):
+        labels = _sleap.load_file(slp_path)
+    with _span(spans, "write"):
+        _CSVAdaptor.write(csv_path, labels)
+
+
+def write_csv_streaming(slp_path, csv_path, chunk_frames=20000, spans=None):
+    """
+    Convert straight from the HDF5 datasets, a chunk of frames at a time.
+
+    Writes the same columns as CSVAdaptor (track, frame_idx, instance.score and
+    x/y/score per node) with bounded memory. Raises UnsupportedSlpError for files
+    that need the sleap based path.
+    """
+    import pandas as pd
+
+    temp_path = csv_path + ".part"
+    with _span(spans, "load_file"):
+        h5, metadata = _open_streamable(slp_path)
+    try:
+        with open(temp_path, "w", newline="") as f:
+            header = True
+            for columns in _timed(_iter_table_chunks(h5, metadata, chunk_frames), spans, "load_file"):
+                with _span(spans, "write"):
+                    pd.DataFrame(columns).to_csv(f, index=False, header=header)
+                header = False
+    finally:
+        h5.close()
+
+    if header:
+        os.remove(temp_path)
+        raise UnsupportedSlpError("No instances to export")
+    os.replace(temp_path, csv_path)
+
+
+def convert_slp_to_csv(slp_path, csv_path, exporter="native", spans=None):
+    """
+    Convert one .slp file to CSV.
+
+    Returns:
+        tuple: (csv_path, note) where note says why the sleap fallback was used, or ""
+    """
+    note = ""
+    if exporter == "native":
+        try:
+            write_csv_streaming(slp_path, csv_path, spans=spans)
+            return csv_path, note
+        except Exception as e:
+            # Anything unexpected goes through the reference implementation
+            note = f"native exporter not used ({str(e)})"
+            if os.path.exists(csv_path + ".part"):
+                os.remove(csv_path + ".part")
+
+    write_csv_sleap(slp_path, csv_path, spans)
+    return csv_path, note
+
+
+def _iter_table_chunks(h5, metadata, chunk_frames):
+    """Column dicts in the CSVAdaptor layout, one per chunk of frames"""
+    import numpy as np
+
+    node_names = metadata["node_names"]
+    track_names = np.array(metadata["track_names"], dtype=object)
+    for chunk in iter_instance_chunks(h5, metadata, chunk_frames):
+        # Instances without any visible point aren't exported
+        keep = ~np.isnan(chunk["points"]).all(axis=(1, 2))
+        if not keep.any():
+            continue
+
+        columns = {
+            "track": track_names[chunk["track"][keep]],
+            "frame_idx": chunk["frame_idx"][keep],
+            "instance.score": chunk["score"][keep],
+        }
+        points = chunk["points"][keep]
+        point_scores = chunk["point_scores"][keep]
+        for node_index, node_name in enumerate(node_names):
+            columns[f"{node_name}.x"] = points[:, node_index, 0]
+            columns[f"{node_name}.y"] = points[:, node_index, 1]
+            columns[f"{node_name}.score"] = point_scores[:, node_index]
+        yield columns
+
+
+def _open_streamable(slp_path):
+    import h5py
+
+    h5 = h5py.File(slp_path, "r")
+    try:
+        metadata = read_metadata(h5)
+        check_streamable(h5, metadata)
+        if not metadata["track_names"]:
+            raise UnsupportedSlpError("No tracks to export")
+    except Exception:
+        h5.close()
+        raise
+    return h5, metadata
+
+
+def _frame_count(h5):
+    """Length of the frame axis, so that index == frame_idx"""
+    frames = h5["frames"]
+    if len(frames) == 0:
+        return 0
+    # check_streamable made sure frames are sorted
+    return int(frames[-1]["frame_idx"]) + 1
+
+
+def write_parquet_streaming(slp_path, parquet_path, chunk_frames=20000, spans=None):
+    """Same table as the CSV, written as Parquet one row group per chunk (needs pyarrow)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    temp_path = parquet_path + ".part"
+    writer = None
+    with _span(spans, "load_file"):
+        h5, metadata = _open_streamable(slp_path)
+    try:
+        for columns in _timed(_iter_table_chunks(h5, metadata, chunk_frames), spans, "load_file"):
+            with _span(spans, "write"):
+                table = pyarrow.table(columns)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(temp_path, table.schema)
+                writer.write_table(table)
+    finally:
+        h5.close()
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise UnsupportedSlpError("No instances to export")
+    os.replace(temp_path, parquet_path)
+
+
+def _fill_dense(h5, metadata, points, point_scores=None, instance_scores=None, chunk_frames=20000, spans=None):
+    """Write the instances of every chunk into (frames, tracks, ...) arrays"""
+    for chunk in _timed(iter_instance_chunks(h5, metadata, chunk_frames), spans, "load_file"):
+        frame_idx, track = chunk["frame_idx"], chunk["track"]
+        points[frame_idx, track] = chunk["points"]
+        if point_scores is not None:
+            point_scores[frame_idx, track] = chunk["point_scores"]
+        if instance_scores is not None:
+            instance_scores[frame_idx, track] = chunk["score"]
+
+
+def _dense_metadata(slp_path, metadata, shape):
+    return {
+        "source": os.path.basename(slp_path),
+        "video": metadata["video_paths"][0] if metadata["video_paths"] else None,
+        "shape": list(shape),
+        "axes": ["frame", "track", "node", "xy"],
+        "dtype": "float32",
+        "node_names": metadata["node_names"],
+        "track_names": metadata["track_names"],
+        "edges": [list(edge) for edge in metadata["edges"]],
+    }
+
+
+def write_npz(slp_path, npz_path, chunk_frames=20000, spans=None):
+    """
+    Compressed NPZ with dense arrays indexed by frame_idx and track:
+    tracks (frames, tracks, nodes, 2), point_scores (frames, tracks, nodes),
+    instance_scores (frames, tracks), plus node_names, track_names and edges.
+    Missing instances/points are NaN.
+    """
+    import numpy as np
+
+    with _span(spans, "load_file"):
+        h5, metadata = _open_streamable(slp_path)
+    try:
+        shape = (_frame_count(h5), len(metadata["track_names"]), len(metadata["node_names"]))
+        points = np.full(shape + (2,), np.nan, dtype=np.float32)
+        point_scores = np.full(shape, np.nan, dtype=np.float32)
+        instance_scores = np.full(shape[:2], np.nan, dtype=np.float32)
+        _fill_dense(h5, metadata, points, point_scores, instance_scores, chunk_frames, spans)
+    finally:
+        h5.close()
+
+    temp_path = npz_path + ".part"
+    with _span(spans, "write"), open(temp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            tracks=points,
+            point_scores=point_scores,
+            instance_scores=instance_scores,
+            node_names=np.array(metadata["node_names"]),
+            track_names=np.array(metadata["track_names"]),
+            edges=np.array(metadata["edges"], dtype=np.int64).reshape(-1, 2),
+        )
+    os.replace(temp_path, npz_path)
+
+
+def write_npy(slp_path, npy_path, chunk_frames=20000, spans=None):
+    """
+    Raw float32 (frames, tracks, nodes, 2) array that np.load(mmap_mode='r') opens
+    without reading it, plus a JSON sidecar (same name, .json) with node/track
+    names and edges. Written through a memmap, so memory use stays bounded.
+    """
+    import json
+    import numpy as np
+
+    with _span(spans, "load_file"):
+        h5, metadata = _open_streamable(slp_path)
+    temp_path = npy_path + ".part"
+    try:
+        shape = (_frame_count(h5), len(metadata["track_names"]), len(metadata["node_names"]), 2)
+        points = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float32, shape=shape)
+        points[:] = np.nan
+        _fill_dense(h5, metadata, points, chunk_frames=chunk_frames, spans=spans)
+        with _span(spans, "write"):
+            points.flush()
+        del points
+    finally:
+        h5.close()
+
+    sidecar_path = os.path.splitext(npy_path)[0] + ".json"
+    with open(sidecar_path + ".part", "w") as f:
+        json.dump(_dense_metadata(slp_path, metadata, shape), f, indent=1)
+    os.replace(temp_path, npy_path)
+    os.replace(sidecar_path + ".part", sidecar_path)
+
+
+def export_slp(slp_path, output_path, export_format="csv", exporter="native", spans=None):
+    """
+    Export one .slp file in the given format (see EXPORT_FORMATS).
+
+    Returns:
+        tuple: (output_path, note) where note says why the sleap fallback was used, or ""
+    """
+    if export_format == "csv":
+        return convert_slp_to_csv(slp_path, output_path, exporter, spans)
+
+    writers = {
+        "parquet": write_parquet_streaming,
+        "npz": write_npz,
+        "npy": write_npy,
+    }
+    if export_format not in writers:
+        raise ValueError(f"Unknown export format: {export_format}")
+    try:
+        writers[export_format](slp_path, output_path, spans=spans)
+    except Exception:
+        if os.path.exists(output_path + ".part"):
+            os.remove(output_path + ".part")
+        raise
+    return output_path, ""
+
+
+def export_slp_traced(slp_path, output_path, export_format="csv", exporter="native"):
+    """
+    export_slp() for a traced batch.
+
+    Returns:
+        tuple: (output_path, note, spans, pid) with the (name, start, end) spans of
+        the export and the pid of the pool process that ran it
+    """
+    spans = []
+    with _span(spans, "export"):
+        output_path, note = export_slp(slp_path, output_path, export_format, exporter, spans)
+    return output_path, note, spans, os.getpid()
+
+
+def default_export_jobs():
+    """Default number of export processes"""
+    return max(1, os.cpu_count() or 1)
+
+
+def create_export_pool(max_workers):
+    """Process pool for exports, spawn-based so it is safe next to Qt threads"""
+    context = multiprocessing.get_context("spawn")
+    # No initializer: sleap (and TensorFlow) is only imported by a process that
+    # actually needs the fallback exporter
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context
+    )
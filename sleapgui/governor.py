@@ -0,0 +1,232 @@
+"""
+Admission control for parallel sleap-track / sleap-render processes.
+
+Every child can take several GB, and starting one too many makes the node swap
+or wakes the OOM killer. ResourceGovernor looks at /proc (available memory,
+load average and the RSS of the running children) before each new child is
+started:
+
+- a new child is only admitted if the memory that would be left after it
+  (estimated from the biggest child seen so far) stays above min_available,
+  and the load average is below max_load per CPU
+- while memory is below critical_available and more than one child runs, the
+  youngest child should be stopped and requeued (see should_back_off)
+
+The first child is always admitted, so a batch can't get stuck. On systems
+without /proc only the load average (if any) is checked.
+
+Jobs that run as threads of this process (the built-in renderer) go through
+admit_thread_job() instead, with thread_job_rss() as their memory estimate.
+"""
+import os
+import time
+
+DEFAULT_LIMITS = {
+    # Fraction of total memory that must stay available after admitting a child
+    "min_available": 0.15,
+    # Below this fraction of available memory the youngest child is requeued
+    "critical_available": 0.05,
+    # 1-minute load average per CPU above which no new child is started
+    "max_load": 1.5,
+    # Seconds to wait after a back off before admitting anything again
+    "cooldown": 30,
+    # Minimum seconds between two admissions, a child that just started hasn't
+    # loaded its model yet so its memory use says little
+    "admit_interval": 5,
+}
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_meminfo(path="/proc/meminfo"):
+    """Total and available memory in bytes, None if /proc isn't there"""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                fields = rest.split()
+                if fields:
+                    values[name] = int(fields[0]) * 1024
+    except (OSError, ValueError):
+        return None
+    if "MemTotal" not in values:
+        return None
+    available = values.get("MemAvailable")
+    if available is None:
+        # Kernels before 3.14
+        available = values.get("MemFree", 0) + values.get("Buffers", 0) + values.get("Cached", 0)
+    return {"total": values["MemTotal"], "available": available}
+
+
+def read_load():
+    """1-minute load average per CPU, None if unknown"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def process_table():
+    """pid -> (parent pid, resident memory in bytes) of all processes, empty without /proc"""
+    table = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return table
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", 'r') as f:
+                stat = f.read()
+            with open(f"/proc/{name}/statm", 'r') as f:
+                statm = f.read().split()
+        except OSError:
+            continue
+        # The command name can contain spaces and parentheses, the fields start after the last ')'
+        fields = stat[stat.rfind(")") + 2:].split()
+        table[int(name)] = (int(fields[1]), int(statm[1]) * _PAGE_SIZE)
+    return table
+
+
+def tree_rss(pid, table=None):
+    """Resident memory (bytes) of a process and all its descendants, 0 if unknown"""
+    table = process_table() if table is None else table
+    children = {}
+    for child, (parent, _) in table.items():
+        children.setdefault(parent, []).append(child)
+
+    total = 0
+    stack = [pid]
+    seen = set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        total += table.get(current, (0, 0))[1]
+        stack.extend(children.get(current, []))
+    return total
+
+
+def command_name(pid):
+    """Executable name of a process (/proc/<pid>/comm), "" if unknown"""
+    try:
+        with open(f"/proc/{pid}/comm", 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def thread_job_rss(jobs, commands=("ffmpeg",), table=None):
+    """
+    Estimated resident memory (bytes) of one of `jobs` jobs that run as threads of
+    this process: an equal share of the process' own memory plus its biggest child
+    running one of commands (the ffmpeg a render pipes its frames into).
+    """
+    table = process_table() if table is None else table
+    own_pid = os.getpid()
+    own = table.get(own_pid, (0, 0))[1]
+    helpers = [tree_rss(pid, table) for pid, (parent, _) in table.items()
+               if parent == own_pid and command_name(pid) in commands]
+    return own // max(1, jobs) + max(helpers, default=0)
+
+
+def format_bytes(value):
+    return f"{value / 1024 ** 3:.1f} GB"
+
+
+class ResourceGovernor:
+    """Decides whether another child process may start, see the module docstring"""
+
+    def __init__(self, limits=None):
+        """
+        Args:
+            limits: dict overriding entries of DEFAULT_LIMITS
+        """
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        # Biggest RSS seen for a single child, used as the estimate for the next one
+        self.child_estimate = 0
+        self.backed_off_at = 0
+        self.admitted_at = 0
+
+    def observe(self, pids):
+        """Update the per-child memory estimate from the running children"""
+        table = process_table()
+        for pid in pids:
+            self.child_estimate = max(self.child_estimate, tree_rss(pid, table))
+
+    def admit(self, pids):
+        """
+        Args:
+            pids: Process ids of the children that are running now
+
+        Returns:
+            tuple: (admitted (bool), reason (str) for the log)
+        """
+        if not pids:
+            self.admitted_at = time.time()
+            return True, "no other jobs running"
+        self.observe(pids)
+        return self._admit_next()
+
+    def admit_thread_job(self, running, job_rss):
+        """
+        admit() for jobs that run as threads of this process instead of child processes.
+
+        Args:
+            running: Number of these jobs running now
+            job_rss: Memory of one of them in bytes, see thread_job_rss
+
+        Returns:
+            tuple: (admitted (bool), reason (str) for the log)
+        """
+        if not running:
+            self.admitted_at = time.time()
+            return True, "no other jobs running"
+        self.child_estimate = max(self.child_estimate, job_rss)
+        return self._admit_next()
+
+    def _admit_next(self):
+        remaining_wait = self.admitted_at + self.limits["admit_interval"] - time.time()
+        if remaining_wait > 0:
+            return False, f"letting the last job start up for {remaining_wait:.0f} more seconds"
+
+        remaining_cooldown = self.backed_off_at + self.limits["cooldown"] - time.time()
+        if remaining_cooldown > 0:
+            return False, f"backing off for {remaining_cooldown:.0f} more seconds after memory pressure"
+
+        memory = read_meminfo()
+        if memory is not None:
+            left = memory["available"] - self.child_estimate
+            reserve = self.limits["min_available"] * memory["total"]
+            if left < reserve:
+                return False, (f"{format_bytes(memory['available'])} of {format_bytes(memory['total'])} available, "
+                               f"a job needs about {format_bytes(self.child_estimate)}")
+
+        load = read_load()
+        if load is not None and load > self.limits["max_load"]:
+            return False, f"load average {load:.2f} per CPU is above {self.limits['max_load']}"
+
+        self.admitted_at = time.time()
+        if memory is None:
+            return True, "no memory information"
+        return True, (f"{format_bytes(memory['available'])} of {format_bytes(memory['total'])} available"
+                      + (f", load {load:.2f} per CPU" if load is not None else ""))
+
+    def should_back_off(self, pids):
+        """
+        True if memory is critically low and one of several running children
+        should be stopped to protect the others.
+
+        Args:
+            pids: The running children (or thread jobs), only their number matters
+        """
+        if len(pids) < 2:
+            return False
+        memory = read_meminfo()
+        if memory is None or memory["available"] >= self.limits["critical_available"] * memory["total"]:
+            return False
+        self.backed_off_at = time.time()
+        return True
@@ -0,0 +1,138 @@
+"""
+Long-lived inference process that keeps a SLEAP model loaded between videos.
+
+Running sleap-track once per video pays for the TensorFlow import, model graph
+construction and weight loading every time. The server loads the model once and
+then takes per-video jobs over a multiprocessing pipe. If it can't start or dies,
+the worker falls back to plain sleap-track.
+
+This module is imported by the spawned server process, so keep it free of Qt.
+"""
+import atexit
+import threading
+import traceback
+import multiprocessing
+
+# sleap-track's own helpers in sleap.nn.inference. They're private, so a sleap
+# release can rename them; the server then reports a fatal error and every video
+# goes through sleap-track instead.
+CLI_HELPERS = ("_make_cli_parser", "_make_predictor_from_cli", "_make_tracker_from_cli")
+
+
+def serve(conn, track_args):
+    """Entry point of the server process"""
+    try:
+        import sleap
+        from sleap.nn import inference
+
+        missing = [name for name in CLI_HELPERS if not hasattr(inference, name)]
+        if missing:
+            conn.send({"status": "error", "fatal": True,
+                       "error": f"sleap {getattr(sleap, '__version__', '?')} has no sleap.nn.inference."
+                                f"{', '.join(missing)}, the inference server can't be used with it"})
+            return
+
+        parser = inference._make_cli_parser()
+        # Output and video are per job, the placeholders only satisfy the parser
+        args, _ = parser.parse_known_args(track_args + ["-o", "unused.slp", "unused.mp4"])
+        predictor = inference._make_predictor_from_cli(args)
+    except Exception:
+        conn.send({"status": "error", "fatal": True, "error": traceback.format_exc()})
+        return
+
+    conn.send({"status": "ready"})
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if request.get("cmd") == "shutdown":
+            break
+
+        try:
+            # Fresh tracker for every video, track identities must not leak between videos
+            predictor.tracker = inference._make_tracker_from_cli(args)
+            video = sleap.load_video(request["video_path"])
+            labels = predictor.predict(video)
+            labels.save(request["output_path"])
+            conn.send({"status": "done", "output_path": request["output_path"]})
+        except Exception:
+            conn.send({"status": "error", "fatal": False, "error": traceback.format_exc()})
+
+
+class InferenceServer:
+    """Handle to a server process, owned by the GUI process"""
+
+    def __init__(self, track_args):
+        self.track_args = list(track_args)
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.failed = False
+        self.lock = threading.Lock()  # one job at a time
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=serve, args=(child_conn, self.track_args))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def submit(self, video_path, output_path):
+        self.conn.send({"cmd": "track", "video_path": video_path, "output_path": output_path})
+
+    def poll(self, timeout):
+        """Return the next message from the server or None if there is none yet"""
+        if self.conn.poll(timeout):
+            return self.conn.recv()
+        return None
+
+    def stop(self):
+        """Stop the server, killing it if it doesn't exit on its own"""
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                self.conn.send({"cmd": "shutdown"})
+                self.process.join(5)
+        except (OSError, EOFError, BrokenPipeError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(2)
+        self.process = None
+        self.ready = False
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def get_inference_server(track_args):
+    """Get the server for these model/tracker settings, one per distinct setting"""
+    key = tuple(track_args)
+    with _servers_lock:
+        server = _servers.get(key)
+        if server is None:
+            server = InferenceServer(track_args)
+            _servers[key] = server
+        return server
+
+
+def shutdown_inference_servers():
+    """Stop every running server, called when the application exits"""
+    with _servers_lock:
+        servers = list(_servers.values())
+        _servers.clear()
+    for server in servers:
+        server.stop()
+
+
+atexit.register(shutdown_inference_servers)
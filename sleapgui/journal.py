@@ -0,0 +1,132 @@
+"""
+Append-only journal of a "Run All" batch, so it can be resumed after a crash.
+
+Every batch gets a JSONL file in ~/.sleapgui/journals. The first record holds the
+batch settings, then one record is appended per stage transition:
+
+    {"event": "batch_started", "settings": {...}}
+    {"event": "step_started", "step": "analyze", "video": 0}
+    {"event": "step_finished", "step": "analyze", "video": 0, "success": true}
+    ...
+    {"event": "batch_finished"}
+
+Records are flushed and fsync'ed one by one, and a torn last line (crash in the
+middle of a write) is ignored when reading. The outputs of the batch are indexed
+next to the journal (batch_*.artifacts.json, see artifacts.py), its timing trace
+is saved there too (batch_*.trace.json and batch_*.summary.txt, see tracing.py).
+"""
+import os
+import json
+import time
+
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".sleapgui", "journals")
+# Only the most recent journals are kept
+MAX_JOURNALS = 20
+
+
+class WorkflowJournal:
+    """Appends the stage transitions of one batch to its journal file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a')
+
+    @classmethod
+    def create(cls, settings, directory=JOURNAL_DIR):
+        """Start the journal of a new batch"""
+        os.makedirs(directory, exist_ok=True)
+        _prune(directory)
+        name = time.strftime("batch_%Y%m%d_%H%M%S") + f"_{os.getpid()}.jsonl"
+        journal = cls(os.path.join(directory, name))
+        journal.append("batch_started", settings=settings)
+        return journal
+
+    def append(self, event, **fields):
+        record = {"event": event, "time": time.time()}
+        record.update(fields)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def step_started(self, step, video_index):
+        self.append("step_started", step=step, video=video_index)
+
+    def step_finished(self, step, video_index, success, message=""):
+        self.append("step_finished", step=step, video=video_index, success=success, message=message)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def artifacts_path(journal_path):
+    """Where the artifact index of a journal's batch is kept"""
+    return os.path.splitext(journal_path)[0] + ".artifacts.json"
+
+
+def latest_journal(directory=JOURNAL_DIR):
+    """Path of the most recently written journal, None if there is none"""
+    if not os.path.isdir(directory):
+        return None
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")]
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+def load_journal(path):
+    """
+    Replay a journal.
+
+    Returns:
+        dict with settings, completed (set of (step, video) that finished
+        successfully), interrupted (set of (step, video) that were started but
+        never finished successfully, their outputs may be partial) and finished
+        (the whole batch completed)
+    """
+    settings = None
+    started = set()
+    completed = set()
+    finished = False
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write at the end of the file
+                continue
+            event = record.get("event")
+            if event == "batch_started":
+                settings = record.get("settings")
+            elif event == "step_started":
+                started.add((record["step"], record["video"]))
+            elif event == "step_finished":
+                if record.get("success"):
+                    completed.add((record["step"], record["video"]))
+                else:
+                    completed.discard((record["step"], record["video"]))
+            elif event == "batch_finished":
+                finished = True
+
+    if settings is None:
+        raise ValueError(f"{path} is not a workflow journal")
+    return {
+        "settings": settings,
+        "completed": completed,
+        "interrupted": started - completed,
+        "finished": finished,
+    }
+
+
+def _prune(directory):
+    paths = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")),
+        key=os.path.getmtime
+    )
+    for path in paths[:-(MAX_JOURNALS - 1)]:
+        base = os.path.splitext(path)[0]
+        for stale_path in (path, artifacts_path(path), base + ".trace.json", base + ".summary.txt"):
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
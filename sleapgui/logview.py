@@ -0,0 +1,84 @@
+from collections import deque
+from qtpy.QtCore import QTimer
+from qtpy.QtGui import QTextCursor
+from qtpy.QtWidgets import QPlainTextEdit
+
+
+class LogView(QPlainTextEdit):
+    """
+    Read-only log widget whose updates cost the same no matter how long it is.
+
+    - The document keeps at most max_lines lines (maximumBlockCount), older ones are dropped
+    - Lines are queued and inserted in one batch per flush_interval ms
+    - A status line (e.g. elapsed time) is replaced in place instead of re-setting all text
+    """
+
+    def __init__(self, parent=None, max_lines=20000, flush_interval=50):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+
+        # Ring buffer of ("line" | "status", text) waiting for the next flush
+        self.pending = deque(maxlen=max_lines)
+        self.status_active = False  # the last line in the document is a status line
+        self.has_text = False
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append_line(self, text):
+        """Queue a regular log line"""
+        self.pending.append(("line", text))
+        self._schedule()
+
+    def set_status(self, text):
+        """Queue a new text for the status line, replacing the previous one"""
+        if self.pending and self.pending[-1][0] == "status":
+            # Only the latest status of a batch is ever visible
+            self.pending[-1] = ("status", text)
+        else:
+            self.pending.append(("status", text))
+        self._schedule()
+
+    def flush(self):
+        """Insert all queued lines in a single edit"""
+        if not self.pending:
+            return
+
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        while self.pending:
+            kind, text = self.pending.popleft()
+            if kind == "status" and self.status_active:
+                # Replace the last line
+                cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+                cursor.insertText(text)
+                continue
+
+            if self.has_text:
+                cursor.insertBlock()
+            cursor.insertText(text)
+            self.has_text = True
+            # A regular line freezes the status line above it as part of the history
+            self.status_active = kind == "status"
+        cursor.endEditBlock()
+
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear(self):
+        self.pending.clear()
+        self.status_active = False
+        self.has_text = False
+        super().clear()
+
+    def _schedule(self):
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
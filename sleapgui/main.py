@@ -2,6 +2,7 @@
 import sys, argparse
 import os
 import json
+import importlib.util
 from datetime import datetime
 # you a qtpy
 try:
@@ -11,28 +12,64 @@ except (ImportError, AttributeError):
     print("Warning: QtPy version information not available")
 from qtpy.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, 
                            QFileDialog, QLabel, QLineEdit, QWidget, QGroupBox, 
-                           QGridLayout, QTextEdit, QSpinBox, QProgressBar, QMessageBox, QComboBox)
-from qtpy.QtCore import QThread, Signal, Qt, QRect, QRectF
+                           QGridLayout, QTextEdit, QSpinBox, QProgressBar, QMessageBox, QComboBox,
+                           QCheckBox)
+from qtpy.QtCore import QThread, Signal, Qt, QRect, QRectF, QTimer
 from qtpy.QtGui import QIcon, QPixmap, QTextCursor
-import sleap
 
 try:
-    from sleapgui.worker import Worker
+    from sleapgui.worker import Worker, ProbeWorker, WatchWorker, default_render_jobs
     from sleapgui.dragdrop import DragDropTextEdit
-    from sleapgui.utils import get_video_framerate, set_app_icon
+    from sleapgui.utils import set_app_icon
+    from sleapgui.pipeline import WorkflowPipeline, STAGES
+    from sleapgui.inference_server import shutdown_inference_servers
+    from sleapgui.progress import format_eta
+    from sleapgui.logview import LogView
+    from sleapgui.journal import WorkflowJournal, latest_journal, load_journal, artifacts_path
+    from sleapgui.artifacts import ArtifactIndex
+    from sleapgui.probe import format_metadata, FILE_NOT_FOUND
+    from sleapgui.watch import watch_output_dir
+    from sleapgui.tracing import Tracer, trace_path_for, default_trace_path
+    from sleapgui.metrics import add_metrics_arguments, start_exporters, BatchMetrics
 except ModuleNotFoundError:
-    from worker import Worker
+    from worker import Worker, ProbeWorker, WatchWorker, default_render_jobs
     from dragdrop import DragDropTextEdit
-    from utils import get_video_framerate, set_app_icon
+    from utils import set_app_icon
+    from pipeline import WorkflowPipeline, STAGES
+    from inference_server import shutdown_inference_servers
+    from progress import format_eta
+    from logview import LogView
+    from journal import WorkflowJournal, latest_journal, load_journal, artifacts_path
+    from artifacts import ArtifactIndex
+    from probe import format_metadata, FILE_NOT_FOUND
+    from watch import watch_output_dir
+    from tracing import Tracer, trace_path_for, default_trace_path
+    from metrics import add_metrics_arguments, start_exporters, BatchMetrics
 
 class ModelGUI(QMainWindow):
-    def __init__(self, mode='face'):
+    def __init__(self, mode='face', metrics=None):
         super().__init__()
         self.mode = mode
+        # BatchMetrics (metrics.py) fed from the worker signals, None unless they're exported
+        self.metrics = metrics
         # Create a nice title from the mode
         title_mode = mode.replace('_', ' ').title()
         self.setWindowTitle(f"SLEAP: {title_mode} Analysis")
         self.setMinimumSize(800, 600)
+
+        # Finished workflow workers are kept alive until their threads have exited
+        self.retired_workers = []
+        # Video metadata from the probe workers: path -> metadata dict ({} if unreadable)
+        self.video_metadata = {}
+        self.probing = set()
+        # Listed paths the probe workers found no file for, probed again once the list is edited
+        self.missing_videos = set()
+        self.probe_workers = []
+        # Frame rate spinbox follows this video once its metadata is in
+        self.fps_video = None
+        # Drop folder being watched, and the videos from it that wait for the next workflow
+        self.watch_worker = None
+        self.watch_queue = []
         
         set_app_icon(self)
 
@@ -57,15 +94,8 @@ class ModelGUI(QMainWindow):
         self.model_path_combo.addItem("(No model selected)")
         self.model_path_combo.addItem("Browse for model directory...")
         
-        # Add existing models if available
-        pretrained_models_dir = os.path.join(os.path.dirname(sleap.__file__), "models", "pretrained")
-        if os.path.exists(pretrained_models_dir):
-            # Look for model directories
-            for item in os.listdir(pretrained_models_dir):
-                item_path = os.path.join(pretrained_models_dir, item)
-                
-                if os.path.isdir(item_path):
-                    self.model_path_combo.addItem(f"Model: {item}", item_path)
+        # Pretrained models are added once the window is up (see populate_pretrained_models)
+        QTimer.singleShot(0, self.populate_pretrained_models)
         
         # Load last used model from settings
         self.settings_file = os.path.join(os.path.expanduser("~"), ".sleapgui_settings.json")
@@ -80,6 +110,22 @@ class ModelGUI(QMainWindow):
         self.video_path_label = QLabel("Video Paths:")
         self.video_paths_list = DragDropTextEdit(self)
         self.video_paths_list.setMaximumHeight(100)
+        # Resolution, fps, length, ... of every video, filled in by the probe workers
+        self.video_info_list = QTextEdit()
+        self.video_info_list.setReadOnly(True)
+        self.video_info_list.setMaximumHeight(80)
+        self.video_info_list.setLineWrapMode(QTextEdit.NoWrap)
+        self.video_info_list.setPlaceholderText("Video details show up here")
+        video_list_layout = QVBoxLayout()
+        video_list_layout.addWidget(self.video_paths_list)
+        video_list_layout.addWidget(self.video_info_list)
+        # Redrawing the details on every keystroke/result would be wasteful with hundreds of videos
+        self.video_info_timer = QTimer(self)
+        self.video_info_timer.setSingleShot(True)
+        self.video_info_timer.setInterval(200)
+        self.video_info_timer.timeout.connect(self.refresh_video_info)
+        self.video_paths_list.textChanged.connect(self.missing_videos.clear)
+        self.video_paths_list.textChanged.connect(self.video_info_timer.start)
 
         video_buttons_layout = QVBoxLayout()
         self.video_path_button = QPushButton("Add Videos...")
@@ -88,9 +134,15 @@ class ModelGUI(QMainWindow):
         self.clear_videos_button.clicked.connect(lambda: (self.video_paths_list.clear(), self.output_dir_list.clear()))
         self.remove_selected_button = QPushButton("Remove Selected")
         self.remove_selected_button.clicked.connect(self.remove_selected_videos)
+        # Runs every new recording in a folder through the whole workflow once it's completely written
+        self.watch_button = QPushButton("Watch Folder...")
+        self.watch_button.setToolTip("Process every video written to a folder with Run All, "
+                                     "outputs go to <folder>/<video name>/")
+        self.watch_button.clicked.connect(self.toggle_watch_folder)
         video_buttons_layout.addWidget(self.video_path_button)
         video_buttons_layout.addWidget(self.remove_selected_button)
         video_buttons_layout.addWidget(self.clear_videos_button)
+        video_buttons_layout.addWidget(self.watch_button)
 
         # Working directories
         self.output_dir_label = QLabel(".slp Directories:")
@@ -108,17 +160,56 @@ class ModelGUI(QMainWindow):
         self.video_format_combo = QComboBox()
         self.video_format_combo.addItems(["MP4", "AVI"])
         self.video_format_combo.setCurrentText("MP4")
+
+        # Format of the tracking data export
+        self.export_format_label = QLabel("Export Format:")
+        self.export_format_combo = QComboBox()
+        self.export_format_combo.addItem("CSV", "csv")
+        if importlib.util.find_spec("pyarrow") is not None:
+            self.export_format_combo.addItem("Parquet", "parquet")
+        self.export_format_combo.addItem("NPZ (compressed arrays)", "npz")
+        self.export_format_combo.addItem("NPY + JSON (memory-mappable)", "npy")
+
+        # Number of sleap-render processes to run at once
+        self.render_jobs_label = QLabel("Render Jobs:")
+        self.render_jobs_spin = QSpinBox()
+        self.render_jobs_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.render_jobs_spin.setValue(default_render_jobs())
+
+        # Split long videos into overlapping frame ranges tracked in parallel (CPU nodes)
+        self.segments_label = QLabel("Segments per Video:")
+        self.segments_spin = QSpinBox()
+        self.segments_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.segments_spin.setValue(1)
+        self.segments_spin.setToolTip("Track each video as this many overlapping pieces in parallel "
+                                      "and stitch the tracks together. 1 tracks the video in one piece.")
         
         # Output file naming
         self.output_basename_label = QLabel("Output Base Name:")
         self.output_basename_text = QLineEdit("labels.v001")
+
+        # Overlap analysis of the next video with CSV/render of the current one
+        self.pipeline_checkbox = QCheckBox("Pipeline \"Run All\" (analyze next video while exporting/rendering)")
+        self.pipeline_checkbox.setChecked(False)
+
+        # Keep the model loaded in a background process between videos
+        self.warm_inference_checkbox = QCheckBox("Keep model loaded between videos (inference server)")
+        self.warm_inference_checkbox.setChecked(False)
+
+        # Re-run steps even if their outputs are up to date
+        self.force_checkbox = QCheckBox("Force re-run (ignore outputs that are already up to date)")
+        self.force_checkbox.setChecked(False)
+
+        # Start the longest videos first when several render jobs run at once
+        self.longest_first_checkbox = QCheckBox("Start longest videos first (uncheck to keep list order)")
+        self.longest_first_checkbox.setChecked(True)
         
         ########### LAYOUTS ###########
         input_layout.addWidget(self.model_path_label, 0, 0)
         input_layout.addWidget(self.model_path_combo, 0, 1)
         
         input_layout.addWidget(self.video_path_label, 1, 0)
-        input_layout.addWidget(self.video_paths_list, 1, 1)
+        input_layout.addLayout(video_list_layout, 1, 1)
         input_layout.addLayout(video_buttons_layout, 1, 2)
 
         input_layout.addWidget(self.output_dir_label, 2, 0)
@@ -131,8 +222,22 @@ class ModelGUI(QMainWindow):
         input_layout.addWidget(self.video_format_label, 4, 0)
         input_layout.addWidget(self.video_format_combo, 4, 1)
 
-        input_layout.addWidget(self.output_basename_label, 5, 0)
-        input_layout.addWidget(self.output_basename_text, 5, 1)
+        input_layout.addWidget(self.export_format_label, 5, 0)
+        input_layout.addWidget(self.export_format_combo, 5, 1)
+
+        input_layout.addWidget(self.output_basename_label, 6, 0)
+        input_layout.addWidget(self.output_basename_text, 6, 1)
+
+        input_layout.addWidget(self.render_jobs_label, 7, 0)
+        input_layout.addWidget(self.render_jobs_spin, 7, 1)
+
+        input_layout.addWidget(self.segments_label, 8, 0)
+        input_layout.addWidget(self.segments_spin, 8, 1)
+
+        input_layout.addWidget(self.pipeline_checkbox, 9, 1)
+        input_layout.addWidget(self.warm_inference_checkbox, 10, 1)
+        input_layout.addWidget(self.force_checkbox, 11, 1)
+        input_layout.addWidget(self.longest_first_checkbox, 12, 1)
         
         input_group.setLayout(input_layout)
         
@@ -143,13 +248,17 @@ class ModelGUI(QMainWindow):
         self.analyze_button.clicked.connect(self.analyze_data)
         
         self.create_video_button = QPushButton("Create Videos")
-        self.create_video_button.clicked.connect(self.create_video)
+        self.create_video_button.clicked.connect(lambda: self.create_video())
+        # Small, decimated videos next to the full renders, enough to check the tracking
+        self.preview_button = QPushButton("Create Previews")
+        self.preview_button.setToolTip("Half size, at most one minute per video, written as <name>.preview.<format>")
+        self.preview_button.clicked.connect(lambda: self.create_video(preview=True))
         
         self.save_csv_button = QPushButton("Create CSV(s)")
         self.save_csv_button.clicked.connect(self.save_csv)
         
         self.all_in_one_button = QPushButton("Run All")
-        self.all_in_one_button.clicked.connect(self.run_complete_workflow)
+        self.all_in_one_button.clicked.connect(lambda: self.run_complete_workflow())
         self.all_in_one_button.setStyleSheet("background-color: #4CAF50; color: white;")
         
         self.cancel_button = QPushButton("Cancel")
@@ -157,13 +266,18 @@ class ModelGUI(QMainWindow):
         self.cancel_button.setStyleSheet("background-color: #f44336; color: white;")
         self.cancel_button.setEnabled(False)  # Disabled initially, enabled when a task starts
         
+        self.resume_button = QPushButton("Resume Last Batch")
+        self.resume_button.clicked.connect(self.resume_last_batch)
+        
         self.clear_all_button = QPushButton("Clear All")
         self.clear_all_button.clicked.connect(self.clear_all_fields)
 
         action_layout.addWidget(self.analyze_button)
         action_layout.addWidget(self.create_video_button)
+        action_layout.addWidget(self.preview_button)
         action_layout.addWidget(self.save_csv_button)
         action_layout.addWidget(self.all_in_one_button)
+        action_layout.addWidget(self.resume_button)
         action_layout.addWidget(self.cancel_button)
         action_layout.addWidget(self.clear_all_button)
         
@@ -171,12 +285,14 @@ class ModelGUI(QMainWindow):
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
+
+        # Frame-based throughput and ETA of the running job
+        self.stats_label = QLabel("")
         
         # Log display
         log_group = QGroupBox("Log")
         log_layout = QVBoxLayout()
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
+        self.log_text = LogView(max_lines=self.log_max_lines)
         log_layout.addWidget(self.log_text)
         log_group.setLayout(log_layout)
         
@@ -184,6 +300,7 @@ class ModelGUI(QMainWindow):
         main_layout.addWidget(input_group)
         main_layout.addLayout(action_layout)
         main_layout.addWidget(self.progress_bar)
+        main_layout.addWidget(self.stats_label)
         main_layout.addWidget(log_group)
         
         main_widget.setLayout(main_layout)
@@ -206,48 +323,13 @@ class ModelGUI(QMainWindow):
                 self.csv_path_text.setText(base_path + ".csv")
     
     def log(self, message):
+        timestamp = datetime.now().strftime("%H:%M:%S")
         if message.startswith("UPDATE_LAST_LINE:"):
-            # Extract the actual message
-            actual_message = message[17:]
-            
-            current_text = self.log_text.toPlainText()
-        
-            if current_text:
-                # Find the last line break
-                last_newline = current_text.rfind('\n')
-                
-                if last_newline >= 0:
-                    # Keep everything up to the last line break
-                    base_text = current_text[:last_newline]
-                    
-                    # Add the new message with timestamp
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    formatted_message = f"[{timestamp}] {actual_message}"
-                    
-                    # Set the text with the new last line
-                    self.log_text.setPlainText(base_text + '\n' + formatted_message)
-                else:
-                    # Single line text, just replace it entirely
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    formatted_message = f"[{timestamp}] {actual_message}"
-                    self.log_text.setPlainText(formatted_message)
-                
-                # Move cursor to the end
-                cursor = self.log_text.textCursor()
-                cursor.movePosition(QTextCursor.End)
-                self.log_text.setTextCursor(cursor)
-            else:
-                # Handle empty text case - just add as normal
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                formatted_message = f"[{timestamp}] {actual_message}"
-                self.log_text.append(formatted_message)
+            # Replace the status line in place
+            self.log_text.set_status(f"[{timestamp}] {message[17:]}")
         else:
             # Regular log message
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            formatted_message = f"[{timestamp}] {message}"
-            self.log_text.append(formatted_message)
-        
-        self.log_text.ensureCursorVisible()
+            self.log_text.append_line(f"[{timestamp}] {message}")
     
     def browse_directory(self, text_field):
         """Browse for a directory"""
@@ -338,26 +420,41 @@ class ModelGUI(QMainWindow):
             "base_name": base_name,
             "video_paths": video_paths,
             "output_dirs": output_paths,
-            "mode": self.mode
+            "mode": self.mode,
+            "segments": self.segments_spin.value(),
+            "warm_inference": self.warm_inference_checkbox.isChecked(),
+            "force": self.force_checkbox.isChecked()
         }
         
         self.worker = Worker("analyze", params)
         self.worker.progress.connect(self.update_progress)
         self.worker.message.connect(self.log)
+        self.worker.stats.connect(self.update_stats)
         self.worker.finished.connect(self.on_task_finished)
         self.worker.start()
         
         self.disable_buttons()
 
-    def run_complete_workflow(self):
-        """Run all three operations in sequence: analyze, save CSV, create video for each video before moving to the next"""
+    def run_complete_workflow(self, video_paths=None, output_paths=None, watched=False):
+        """
+        Run all three operations (analyze, save CSV, create video) for every video
+        
+        Args:
+            video_paths: Videos to process, default: the video list
+            output_paths: Their output directories, default: the directory list
+            watched: The videos come from the watched folder, finishing (or failing)
+                     doesn't pop up a dialog and the next waiting videos are started
+        """
         # Get and validate inputs
         model_path = self.get_model_path()
-        video_paths = self.video_paths_list.toPlainText().splitlines()
-        output_paths = self.output_dir_list.toPlainText().splitlines()
+        if video_paths is None:
+            video_paths = self.video_paths_list.toPlainText().splitlines()
+            output_paths = self.output_dir_list.toPlainText().splitlines()
         base_name = self.output_basename_text.text()
         frame_rate = self.frame_rate_spin.value()
         video_format = self.video_format_combo.currentText().lower()
+        render_jobs = self.render_jobs_spin.value()
+        pipelined = self.pipeline_checkbox.isChecked()
 
         # Validate inputs
         if not model_path or model_path == "Select a model...":
@@ -385,56 +482,271 @@ class ModelGUI(QMainWindow):
         
         self.save_settings()
         
-        # Store workflow state for per-video processing
-        self.workflow_state = {
-            "current_video_index": 0,
-            "total_videos": len(video_paths),
+        settings = {
+            "mode": self.mode,
             "video_paths": video_paths,
             "output_paths": output_paths,
             "model_path": model_path,
             "base_name": base_name,
             "frame_rate": frame_rate,
             "video_format": video_format,
-            "current_step": "analyze",
-            "success": True
+            "render_jobs": render_jobs,
+            "segments": self.segments_spin.value(),
+            "export_format": self.export_format_combo.currentData(),
+            "warm_inference": self.warm_inference_checkbox.isChecked(),
+            "force": self.force_checkbox.isChecked(),
+            "pipelined": pipelined
         }
         
+        try:
+            journal = WorkflowJournal.create(settings)
+        except OSError as e:
+            # Not being able to resume later is no reason not to run
+            self.log(f"Warning: could not create the workflow journal, this batch can't be resumed: {str(e)}")
+            journal = None
+        
         self.log(f"Starting complete workflow for {len(video_paths)} videos...")
-        self.log(f"Each video will be fully processed before moving to the next video.")
+        if pipelined:
+            self.log("Pipelined mode: analysis of the next video overlaps CSV export and rendering of the current one.")
+        else:
+            self.log("Each video will be fully processed before moving to the next video.")
+        
+        self.start_workflow(settings, journal, watched=watched)
+
+    def resume_last_batch(self):
+        """Continue the most recent "Run All" batch at its first incomplete (video, step)"""
+        journal_path = latest_journal()
+        if journal_path is None:
+            QMessageBox.information(self, "Resume Last Batch", "There is no batch to resume.")
+            return
+        
+        try:
+            state = load_journal(journal_path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Resume Last Batch", f"Could not read the last batch:\n{str(e)}")
+            return
+        
+        settings = state["settings"]
+        if state["finished"]:
+            QMessageBox.information(self, "Resume Last Batch", "The last batch already finished.")
+            return
+        
+        if settings.get("mode", self.mode) != self.mode:
+            QMessageBox.warning(self, "Resume Last Batch",
+                                f"The last batch was run in '{settings['mode']}' mode, "
+                                f"restart sleapgui in that mode to resume it.")
+            return
+        
+        missing = [path for path in settings["video_paths"] if not os.path.exists(path)]
+        if missing:
+            QMessageBox.warning(self, "Resume Last Batch", "These videos no longer exist:\n" + "\n".join(missing))
+            return
+        
+        total_steps = len(settings["video_paths"]) * len(STAGES)
+        remaining = total_steps - len(state["completed"])
+        answer = QMessageBox.question(
+            self, "Resume Last Batch",
+            f"{len(settings['video_paths'])} videos, {remaining} of {total_steps} steps left.\n"
+            f"Steps that were interrupted will be redone.\n\nResume?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if answer != QMessageBox.Yes:
+            return
+        
+        # Show what is being processed
+        self.video_paths_list.setPlainText("\n".join(settings["video_paths"]))
+        self.output_dir_list.setPlainText("\n".join(settings["output_paths"]))
+        self.output_basename_text.setText(settings["base_name"])
+        
+        try:
+            journal = WorkflowJournal(journal_path)
+            journal.append("batch_resumed")
+        except OSError as e:
+            self.log(f"Warning: could not open the workflow journal: {str(e)}")
+            journal = None
+        
+        self.log(f"Resuming batch from {journal_path} ({remaining} of {total_steps} steps left)...")
+        for step, video_index in sorted(state["interrupted"], key=lambda job: (job[1], STAGES.index(job[0]))):
+            self.log(f"Video {video_index+1}: {step} was interrupted and will be redone")
+        
+        self.start_workflow(settings, journal, state["completed"], state["interrupted"])
+
+    def start_workflow(self, settings, journal, completed_steps=None, redo_steps=None, watched=False):
+        """
+        Start (or resume) the complete workflow.
+        
+        Args:
+            settings: Batch settings, see run_complete_workflow
+            journal: WorkflowJournal stage transitions are written to, or None
+            completed_steps: (step, video_index) pairs to skip
+            redo_steps: (step, video_index) pairs whose outputs may be partial,
+                        they're re-run even if the output looks up to date
+            watched: The videos come from the watched folder, see run_complete_workflow
+        """
+        video_paths = settings["video_paths"]
+        pipeline = WorkflowPipeline(
+            len(video_paths),
+            overlap=settings["pipelined"],
+            video_keys=[os.path.normpath(path) for path in settings["output_paths"]]
+        )
+        if completed_steps:
+            pipeline.resume(completed_steps)
+        
+        # What each step produced, so later steps don't have to search the output folders
+        artifacts = ArtifactIndex.for_videos(
+            video_paths, settings["output_paths"], settings["base_name"],
+            path=artifacts_path(journal.path) if journal is not None else None
+        )
+        
+        # Timing spans of every step and its child processes, saved next to the journal
+        tracer = Tracer("sleapgui workflow")
+        tracer.begin("batch", "batch", "workflow", videos=len(video_paths))
+        
+        # Store workflow state, the pipeline decides which (stage, video) runs next
+        self.workflow_state = {
+            "total_videos": len(video_paths),
+            "video_paths": video_paths,
+            "output_paths": settings["output_paths"],
+            "model_path": settings["model_path"],
+            "base_name": settings["base_name"],
+            "frame_rate": settings["frame_rate"],
+            "video_format": settings["video_format"],
+            "render_jobs": settings["render_jobs"],
+            "segments": settings.get("segments", 1),
+            "export_format": settings["export_format"],
+            "warm_inference": settings["warm_inference"],
+            "force": settings["force"],
+            "redo_steps": set(redo_steps or ()),
+            "journal": journal,
+            "artifacts": artifacts,
+            "tracer": tracer,
+            "trace_path": trace_path_for(journal.path) if journal is not None else default_trace_path(),
+            "pipeline": pipeline,
+            "workers": {},
+            "watched": watched,
+            "success": True
+        }
         
-        # Process the first video
+        self.progress_bar.setValue(int(pipeline.overall_progress()))
         self.process_next_video_step()
 
+    def journal_event(self, event, *args, **kwargs):
+        """Write to the workflow journal, a failing journal doesn't stop the workflow"""
+        journal = self.workflow_state.get("journal") if hasattr(self, 'workflow_state') else None
+        if journal is None:
+            return
+        try:
+            getattr(journal, event)(*args, **kwargs)
+        except (OSError, ValueError) as e:
+            self.log(f"Warning: could not write the workflow journal: {str(e)}")
+            self.workflow_state["journal"] = None
+
+    def save_workflow_trace(self):
+        """Write the trace of the batch and log its summary, once per batch"""
+        tracer = self.workflow_state.get("tracer") if hasattr(self, 'workflow_state') else None
+        if tracer is None:
+            return
+        self.workflow_state["tracer"] = None
+        path = self.workflow_state["trace_path"]
+        tracer.end("batch")
+        try:
+            summary = tracer.save(path)
+        except (OSError, ValueError) as e:
+            self.log(f"Warning: could not save the workflow trace: {str(e)}")
+            return
+        self.log(f"Timing trace saved to {path}")
+        for line in summary.splitlines():
+            self.log(line)
+
+    def workflow_force(self, step, video_index):
+        """Whether a workflow step has to ignore outputs that look up to date"""
+        return self.workflow_state["force"] or (step, video_index) in self.workflow_state["redo_steps"]
+
+    def workflow_slp(self, video_index):
+        """The .slp of a workflow video from the artifact index, None (and the workflow stopped) if there is none"""
+        artifacts = self.workflow_state["artifacts"]
+        slp_path = artifacts.get(video_index, "slp")
+        if slp_path is None:
+            # Made outside of this batch, e.g. skipped steps of a resumed one
+            artifacts.discover(self.workflow_state["base_name"])
+            slp_path = artifacts.get(video_index, "slp")
+        if slp_path is None:
+            output_path = self.workflow_state["output_paths"][video_index]
+            self.workflow_error(f"No {self.workflow_state['base_name']}.slp found in {output_path}")
+        return slp_path
+
     def process_next_video_step(self):
-        """Process the current step for the current video in the workflow"""
+        """Start every workflow step whose stage slot is free and has a video waiting"""
         if not hasattr(self, 'workflow_state'):
             return
         
-        video_index = self.workflow_state["current_video_index"]
-        total_videos = self.workflow_state["total_videos"]
-        current_step = self.workflow_state["current_step"]
+        pipeline = self.workflow_state["pipeline"]
         
         # If we've processed all videos, we're done
-        if video_index >= total_videos:
+        if pipeline.is_done():
+            self.journal_event("append", "batch_finished")
+            self.journal_event("close")
+            self.save_workflow_trace()
             self.log("Complete workflow finished successfully!")
-            QMessageBox.information(self, "Workflow Complete", "All operations completed successfully!")
+            if not self.workflow_state.get("watched"):
+                QMessageBox.information(self, "Workflow Complete", "All operations completed successfully!")
             delattr(self, 'workflow_state')
+            self.update_metric_queues()
             self.progress_bar.setValue(100)
+            self.enable_buttons()
+            # Videos that arrived in the watched folder meanwhile
+            QTimer.singleShot(0, self.run_watched_videos)
             return
         
-        # Get the current video and output path
+        for current_step, video_index in pipeline.next_jobs():
+            worker = self.create_workflow_worker(current_step, video_index)
+            if worker is None:
+                # workflow_error has already been reported
+                return
+            
+            # Connect signals and start the worker
+            worker.progress.connect(
+                lambda value, step=current_step, index=video_index: self.update_workflow_progress(value, step, index))
+            worker.message.connect(self.log)
+            worker.stats.connect(
+                lambda stats, index=video_index: self.update_stats(stats, index))
+            worker.finished.connect(
+                lambda success, message, step=current_step, index=video_index:
+                    self.on_video_step_finished(success, message, step, index))
+            if self.metrics is not None:
+                worker.stats.connect(
+                    lambda stats, step=current_step, index=video_index: self.metrics.stats(step, index, stats))
+                self.metrics.step_started(current_step, video_index)
+            
+            self.workflow_state["workers"][current_step] = worker
+            self.worker = worker
+            self.journal_event("step_started", current_step, video_index)
+            tracer = self.workflow_state["tracer"]
+            if tracer is not None:
+                # One row per stage, pipelined stages overlap
+                tracer.begin((current_step, video_index), current_step, "workflow", tid=tracer.row(current_step),
+                             video=os.path.basename(self.workflow_state["video_paths"][video_index]))
+            worker.start()
+        
+        self.update_metric_queues()
+        self.disable_buttons()
+
+    def update_metric_queues(self):
+        """Queue depths for the metrics: the stage queues and the watched videos waiting for the next batch"""
+        if self.metrics is None:
+            return
+        queues = {stage: 0 for stage in STAGES}
+        if hasattr(self, 'workflow_state'):
+            queues.update(self.workflow_state["pipeline"].queued())
+        queues["watch"] = len(self.watch_queue)
+        self.metrics.set_queues(queues)
+
+    def create_workflow_worker(self, current_step, video_index):
+        """Build the Worker for one step of one video in the workflow"""
+        total_videos = self.workflow_state["total_videos"]
         video_path = self.workflow_state["video_paths"][video_index]
         output_path = self.workflow_state["output_paths"][video_index]
         
-        # Calculate overall progress percentage
-        step_weight = 1/3  # Each step (analyze, CSV, video) is 1/3 of the process
-        video_weight = 1/total_videos  # Each video is 1/total of the whole job
-        steps_completed = 0 if current_step == "analyze" else (1 if current_step == "save_csv" else 2)
-        
-        base_progress = (video_index * 3 + steps_completed) / (total_videos * 3) * 100
-        self.progress_bar.setValue(int(base_progress))
-        
-        # Process the current step for the current video
         if current_step == "analyze":
             self.log(f"Video {video_index+1}/{total_videos}: Analyzing...")
             
@@ -444,215 +756,199 @@ class ModelGUI(QMainWindow):
                 "base_name": self.workflow_state["base_name"],
                 "video_paths": [video_path],
                 "output_dirs": [output_path],
-                "mode": self.mode
+                "mode": self.mode,
+                "segments": self.workflow_state["segments"],
+                "warm_inference": self.workflow_state["warm_inference"],
+                "artifacts": self.workflow_state["artifacts"],
+                "tracer": self.workflow_state["tracer"],
+                "force": self.workflow_force(current_step, video_index)
             }
             
-            self.worker = Worker("analyze", params)
+            return Worker("analyze", params)
             
         elif current_step == "save_csv":
-            self.log(f"Video {video_index+1}/{total_videos}: Creating CSV...")
+            self.log(f"Video {video_index+1}/{total_videos}: Exporting {self.workflow_state['export_format'].upper()}...")
             
-            # Find the slp file that was just created
-            slp_files = []
-            base_name = self.workflow_state["base_name"]
-            try:
-                if os.path.exists(output_path):
-                    for file in os.listdir(output_path):
-                        if file.endswith(".slp"):
-                            slp_files.append(os.path.join(output_path, file))
-            except Exception as e:
-                self.log(f"Error finding .slp files: {str(e)}")
-                self.workflow_error(f"Could not find .slp files in {output_path}")
-                return
-                
-            if not slp_files:
-                self.workflow_error(f"No .slp files found in {output_path}")
-                return
+            # The slp file that analyze created for this video
+            slp_path = self.workflow_slp(video_index)
+            if slp_path is None:
+                return None
             
             params = {
                 "output_dirs": [output_path],
                 "video_paths": [video_path],
-                "slp_files": slp_files,
-                "base_name": base_name,
+                "slp_files": [slp_path],
+                "base_name": self.workflow_state["base_name"],
+                "export_format": self.workflow_state["export_format"],
+                "artifacts": self.workflow_state["artifacts"],
+                "tracer": self.workflow_state["tracer"],
+                "force": self.workflow_force(current_step, video_index)
             }
             
-            self.worker = Worker("save_csv", params)
+            return Worker("save_csv", params)
             
         elif current_step == "create_video":
             self.log(f"Video {video_index+1}/{total_videos}: Creating visualization video...")
             
-            # Find all .slp files in the output directory
-            slp_files = []
-            try:
-                if os.path.exists(output_path):
-                    for file in os.listdir(output_path):
-                        if file.endswith(".slp"):
-                            slp_files.append(os.path.join(output_path, file))
-            except Exception as e:
-                self.log(f"Error finding .slp files: {str(e)}")
-                self.workflow_error(f"Could not find .slp files in {output_path}")
-                return
-            
-            if not slp_files:
-                self.workflow_error(f"No .slp files found in {output_path}")
-                return
+            slp_path = self.workflow_slp(video_index)
+            if slp_path is None:
+                return None
             
             params = {
                 "output_dirs": [output_path],
-                "slp_files": slp_files,
+                "slp_files": [slp_path],
+                "artifacts": self.workflow_state["artifacts"],
+                "tracer": self.workflow_state["tracer"],
                 "frame_rate": self.workflow_state["frame_rate"],
-                "video_format": self.workflow_state["video_format"]
+                "video_format": self.workflow_state["video_format"],
+                "render_jobs": self.workflow_state["render_jobs"],
+                "job_order": "longest_first" if self.longest_first_checkbox.isChecked() else "user",
+                "force": self.workflow_force(current_step, video_index)
             }
             
-            self.worker = Worker("create_video", params)
-        
-        # Connect signals and start the worker
-        if hasattr(self, 'worker'):
-            self.worker.progress.connect(self.update_workflow_progress)
-            self.worker.message.connect(self.log)
-            self.worker.finished.connect(self.on_video_step_finished)
-            self.worker.start()
-            self.disable_buttons()
-        else:
-            self.workflow_error("Worker initialization failed")
+            return Worker("create_video", params)
+        
+        self.workflow_error(f"Unknown workflow step: {current_step}")
+        return None
 
-    def update_workflow_progress(self, value):
+    def update_workflow_progress(self, value, current_step=None, video_index=None):
         """Update the progress bar for workflow operations"""
-        if hasattr(self, 'workflow_state'):
-            video_index = self.workflow_state["current_video_index"]
-            total_videos = self.workflow_state["total_videos"]
-            current_step = self.workflow_state["current_step"]
-            
-            # Calculate overall progress
-            step_index = 0
-            if current_step == "save_csv":
-                step_index = 1
-            elif current_step == "create_video":
-                step_index = 2
-                
-            # Base progress (completed videos + completed steps)
-            base_progress = (video_index * 3 + step_index) * 100 / (total_videos * 3)
-            
-            # Current step progress weighted to 1/3 of a video's progress
-            step_progress = value / 100 * (100 / (total_videos * 3))
-            
-            # Combined progress
-            total_progress = base_progress + step_progress
-            
-            self.progress_bar.setValue(int(total_progress))
+        if hasattr(self, 'workflow_state') and current_step is not None:
+            # Every (video, step) pair has its own progress, the bar shows the average
+            pipeline = self.workflow_state["pipeline"]
+            pipeline.set_progress(current_step, video_index, value)
+            self.progress_bar.setValue(int(pipeline.overall_progress()))
         else:
             # Fall back to standard progress update if not in workflow
             self.progress_bar.setValue(value)
 
-    def on_video_step_finished(self, success, message):
+    def on_video_step_finished(self, success, message, current_step, video_index):
         """Handle completion of a step in the per-video workflow"""
         if not hasattr(self, 'workflow_state'):
             # Not in workflow anymore (maybe cancelled)
-            self.enable_buttons()
+            if not self.workflow_running():
+                self.enable_buttons()
             return
+        
+        self.journal_event("step_finished", current_step, video_index, success, message)
+        if self.metrics is not None:
+            self.metrics.step_finished(current_step, video_index, success)
+        if self.workflow_state["tracer"] is not None:
+            self.workflow_state["tracer"].end((current_step, video_index), success=success)
             
         if success:
-            current_step = self.workflow_state["current_step"]
-            video_index = self.workflow_state["current_video_index"]
             total_videos = self.workflow_state["total_videos"]
             
-            # Disconnect previous worker signals
-            if hasattr(self, 'worker'):
+            # Disconnect the finished worker's signals, but keep a reference until
+            # its thread has actually exited
+            worker = self.workflow_state["workers"].pop(current_step, None)
+            if worker is not None:
                 try:
-                    self.worker.finished.disconnect()
-                    self.worker.progress.disconnect()
-                    self.worker.message.disconnect()
+                    worker.finished.disconnect()
+                    worker.progress.disconnect()
+                    worker.message.disconnect()
                 except TypeError:
                     # Already disconnected
                     pass
+                self.retired_workers = [w for w in self.retired_workers if not w.isFinished()]
+                self.retired_workers.append(worker)
             
-            # Move to the next step in the workflow
-            if current_step == "analyze":
-                self.workflow_state["current_step"] = "save_csv"
-                self.process_next_video_step()
-            elif current_step == "save_csv":
-                self.workflow_state["current_step"] = "create_video"
-                self.process_next_video_step()
-            elif current_step == "create_video":
-                # This video is complete, move to the next video
-                self.workflow_state["current_video_index"] += 1
-                self.workflow_state["current_step"] = "analyze"
+            pipeline = self.workflow_state["pipeline"]
+            if pipeline.stage_finished(current_step, video_index):
                 self.log(f"Video {video_index+1}/{total_videos} processing complete.")
-                
-                # Process the next video
-                self.process_next_video_step()
+                if self.metrics is not None:
+                    self.metrics.video_finished(video_index)
+            self.progress_bar.setValue(int(pipeline.overall_progress()))
+            
+            # Start whatever can run now (next step of this video, next video, ...)
+            self.process_next_video_step()
         else:
             # Error occurred, stop the workflow
             self.workflow_error(message)
 
+    def workflow_running(self):
+        """Check if any workflow worker is still running"""
+        if not hasattr(self, 'workflow_state'):
+            return False
+        return any(worker.isRunning() for worker in self.workflow_state["workers"].values())
+
+    def stop_workflow_workers(self):
+        """Ask every running workflow worker to stop and wait for them"""
+        if not hasattr(self, 'workflow_state'):
+            return
+        # The journal stays as it is, so the batch can be resumed
+        self.journal_event("close")
+        self.save_workflow_trace()
+        if self.metrics is not None:
+            self.metrics.stopped()
+        workers = list(self.workflow_state["workers"].values())
+        for worker in workers:
+            try:
+                worker.finished.disconnect()
+            except TypeError:
+                pass
+            worker.cancel_requested = True
+        for worker in workers:
+            worker.wait(500)
+            if worker.isRunning():
+                worker.terminate()
+                worker.wait()
+
     def workflow_error(self, message):
         """Handle workflow errors"""
         self.log(f"Error in workflow: {message}")
         self.progress_bar.setValue(0)
+
+        # Other stages may still be busy with different videos
+        self.stop_workflow_workers()
         
-        QMessageBox.critical(self, "Workflow Error", 
-                            f"An error occurred during the workflow:\n{message}\n\nWorkflow stopped.")
+        # Nobody might be watching the rig, a dialog would stall the folder until it's closed
+        watched = hasattr(self, 'workflow_state') and self.workflow_state.get("watched")
+        if not watched:
+            QMessageBox.critical(self, "Workflow Error", 
+                                f"An error occurred during the workflow:\n{message}\n\nWorkflow stopped.")
         
         if hasattr(self, 'workflow_state'):
             delattr(self, 'workflow_state')
+        self.update_metric_queues()
         
         self.enable_buttons()
+        if watched:
+            QTimer.singleShot(0, self.run_watched_videos)
 
     def on_task_finished(self, success, message):
+        """A single task (Analyze, Save CSV, Create Video) is done, workflow steps finish in on_video_step_finished"""
         self.enable_buttons()
         
         if success:
             self.progress_bar.setValue(100)
             self.log(f"Success: {message}")
-            
-            # Check if we're in a workflow
-            if hasattr(self, 'workflow_state'):
-                current_step = self.workflow_state["current_step"]
-                self.workflow_state["steps_completed"] += 1
-                
-                # Disconnect previous worker signals to prevent multiple callbacks
-                if hasattr(self, 'worker'):
-                    try:
-                        self.worker.finished.disconnect()
-                        self.worker.progress.disconnect()
-                        self.worker.message.disconnect()
-                    except TypeError:
-                        # Already disconnected
-                        pass
-                
-                # Move to next step
-                if current_step == "analyze":
-                    self.workflow_state["current_step"] = "save_csv"
-                    self.log("Workflow: Continuing to CSV export...")
-                    self.save_csv()
-                elif current_step == "save_csv":
-                    self.workflow_state["current_step"] = "create_video"
-                    self.log("Workflow: Continuing to video creation...")
-                    self.create_video()
-                elif current_step == "create_video":
-                    # Workflow complete
-                    percent_complete = 100
-                    self.progress_bar.setValue(percent_complete)
-                    self.log("Complete workflow finished successfully!")
-                    QMessageBox.information(self, "Workflow Complete", 
-                                        "All operations completed successfully!")
-                    delattr(self, 'workflow_state')
-            else:
-                # Single task complete
-                QMessageBox.information(self, "Success", message)
+            QMessageBox.information(self, "Success", message)
         else:
             self.progress_bar.setValue(0)
             self.log(f"Error: {message}")
-            
-            # Clear workflow state if error
-            if hasattr(self, 'workflow_state'):
-                delattr(self, 'workflow_state')
-            
             QMessageBox.critical(self, "Error", message)
 
     def cancel_operation(self):
         """Cancel the current operation"""
-        if hasattr(self, 'worker') and self.worker.isRunning():
+        if self.workflow_running():
+            self.log("Cancelling operation...")
+            self.cancel_button.setEnabled(False)
+            self.cancel_button.setText("Cancelling...")
+
+            # A pipelined workflow can have one worker per stage running
+            self.stop_workflow_workers()
+            self.log("Operation cancelled")
+
+            delattr(self, 'workflow_state')
+
+            self.progress_bar.setValue(0)
+            self.enable_buttons()
+            self.log("Ready for new operation")
+            self.cancel_button.setText("Cancel")
+            self.cancel_button.setEnabled(False)
+
+        elif hasattr(self, 'worker') and self.worker.isRunning():
             self.log("Cancelling operation...")
             
             # Signal the worker to stop
@@ -685,36 +981,32 @@ class ModelGUI(QMainWindow):
             self.cancel_button.setText("Cancel")
             self.cancel_button.setEnabled(False)
 
-    def create_video(self):
-        """Create video from .slp files in multiple directories"""
+    def create_video(self, preview=False):
+        """Create video from .slp files in multiple directories, or quick previews of them"""
         output_dirs = self.output_dir_list.toPlainText().splitlines()
         frame_rate = self.frame_rate_spin.value()
         video_format = self.video_format_combo.currentText().lower()
+        render_jobs = self.render_jobs_spin.value()
         
         if not output_dirs:
             QMessageBox.warning(self, "Missing Information", "Please specify at least one output directory.")
             return
         
-        # Find all .slp files in the output directories
+        # Find all .slp files in the output directories, one listing per directory
+        artifacts = ArtifactIndex()
         slp_files = []
         for output_dir in output_dirs:
-            try:
-                if os.path.exists(output_dir):
-                    for file in os.listdir(output_dir):
-                        if file.endswith(".slp"):
-                            slp_files.append(os.path.join(output_dir, file))
-            except Exception as e:
-                QMessageBox.warning(self, "Directory Error", f"Could not read directory: {output_dir}\nError: {str(e)}")
-                return
+            slp_files.extend(artifacts.directory_slp_files(output_dir))
         
         if not slp_files:
             QMessageBox.warning(self, "No SLP Files", f"No .slp files found in any of the specified directories")
             return
         
-        self.log(f"Creating videos...")
+        self.log("Creating preview videos..." if preview else "Creating videos...")
         self.log(f"Output directories: {len(output_dirs)} directories")
         self.log(f"Found {len(slp_files)} .slp files to process")
         self.log(f"Frame rate: {frame_rate}")
+        self.log(f"Parallel render jobs: {render_jobs}")
         
         self.progress_bar.setValue(0)
         
@@ -722,12 +1014,17 @@ class ModelGUI(QMainWindow):
             "output_dirs": output_dirs,
             "slp_files": slp_files,
             "frame_rate": frame_rate,
-            "video_format": video_format
+            "video_format": video_format,
+            "render_jobs": render_jobs,
+            "job_order": "longest_first" if self.longest_first_checkbox.isChecked() else "user",
+            "preview": preview,
+            "force": self.force_checkbox.isChecked()
         }
         
         self.worker = Worker("create_video", params)
         self.worker.progress.connect(self.update_progress)
         self.worker.message.connect(self.log)
+        self.worker.stats.connect(self.update_stats)
         self.worker.finished.connect(self.on_task_finished)
         self.worker.start()
         
@@ -743,22 +1040,14 @@ class ModelGUI(QMainWindow):
             QMessageBox.warning(self, "Missing Information", "Please specify at least one output directory.")
             return
         
-        slp_files = []
-        for output_dir in output_dirs:
-            try:
-                if os.path.exists(output_dir):
-                    for file in os.listdir(output_dir):
-                        if file.endswith(".slp"):
-                            slp_files.append(os.path.join(output_dir, file))
-            except Exception as e:
-                QMessageBox.warning(self, "Directory Error", f"Could not read directory: {output_dir}\nError: {str(e)}")
-                return
-
         if len(output_dirs) != len(video_paths):
             QMessageBox.warning(self, "Mismatch", f"There must exist a one-to-one relationship between videos and output directories.")
             return
 
-        if len(slp_files) != len(output_dirs):
+        # The .slp of every video, paired by position rather than by whatever a folder listing returns
+        artifacts = ArtifactIndex.for_videos(video_paths, output_dirs, base_name)
+        slp_files = [artifacts.get(position, "slp") for position in range(len(video_paths))]
+        if None in slp_files:
             QMessageBox.warning(self, "Mismatch", f"Not every directory contains a .slp file with the base name '{base_name}'")
             return
         
@@ -772,6 +1061,8 @@ class ModelGUI(QMainWindow):
             "video_paths": video_paths,
             "slp_files": slp_files,
             "base_name": self.output_basename_text.text(),
+            "export_format": self.export_format_combo.currentData(),
+            "force": self.force_checkbox.isChecked()
         }
         
         self.worker = Worker("save_csv", params)
@@ -784,12 +1075,53 @@ class ModelGUI(QMainWindow):
     
     def update_progress(self, value):
         self.progress_bar.setValue(value)
+
+    def update_stats(self, stats, video_index=None):
+        """Show frames/sec and ETA from a worker's stats signal"""
+        parts = []
+        if stats.get("label"):
+            parts.append(stats["label"])
+        elif stats.get("video_path"):
+            parts.append(os.path.basename(stats["video_path"]))
+        if stats.get("percent") is not None:
+            parts.append(f"{stats['percent']:.1f}% ({stats['frames_done']}/{stats['total_frames']} frames)")
+        else:
+            parts.append(f"{stats.get('frames_done', 0)} frames")
+        if stats.get("fps") is not None:
+            parts.append(f"{stats['fps']:.1f} fps (avg {stats['fps_smoothed']:.1f})")
+        parts.append(f"ETA {format_eta(stats.get('eta'))}")
+
+        batch_eta = stats.get("batch_eta")
+        if hasattr(self, 'workflow_state') and video_index is not None and stats.get("task") == "analyze":
+            batch_eta = self.estimate_workflow_eta(stats, video_index)
+        if batch_eta is not None:
+            parts.append(f"Batch ETA {format_eta(batch_eta)}")
+
+        self.stats_label.setText("  |  ".join(parts))
+
+    def estimate_workflow_eta(self, stats, video_index):
+        """Inference time left for the workflow, based on the current throughput"""
+        frame_counts = self.workflow_state.setdefault("frame_counts", {})
+        if stats.get("total_frames"):
+            frame_counts[video_index] = stats["total_frames"]
+        fps = stats.get("fps_smoothed")
+        if not fps or not frame_counts:
+            return None
+
+        # Videos that haven't been analyzed yet count with the average known length
+        average = sum(frame_counts.values()) / len(frame_counts)
+        remaining = max(0, (stats.get("total_frames") or average) - stats.get("frames_done", 0))
+        for index in range(video_index + 1, self.workflow_state["total_videos"]):
+            remaining += frame_counts.get(index, average)
+        return remaining / fps
     
     def disable_buttons(self):
         self.analyze_button.setEnabled(False)
         self.create_video_button.setEnabled(False)
+        self.preview_button.setEnabled(False)
         self.save_csv_button.setEnabled(False)
         self.all_in_one_button.setEnabled(False)
+        self.resume_button.setEnabled(False)
         self.clear_all_button.setEnabled(False)
         # Enable the cancel button when operation is in progress
         self.cancel_button.setEnabled(True)
@@ -797,8 +1129,10 @@ class ModelGUI(QMainWindow):
     def enable_buttons(self):
         self.analyze_button.setEnabled(True)
         self.create_video_button.setEnabled(True)
+        self.preview_button.setEnabled(True)
         self.save_csv_button.setEnabled(True)
         self.all_in_one_button.setEnabled(True)
+        self.resume_button.setEnabled(True)
         self.clear_all_button.setEnabled(True)
         # Disable the cancel button when no operation is in progress
         self.cancel_button.setEnabled(False)
@@ -806,18 +1140,21 @@ class ModelGUI(QMainWindow):
     def load_settings(self):
         """Load settings from file"""
         self.last_model_path = ""
+        self.log_max_lines = 20000
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r') as f:
                     settings = json.load(f)
                     self.last_model_path = settings.get('last_model_path', '')
+                    self.log_max_lines = int(settings.get('log_max_lines', self.log_max_lines))
             except:
                 pass
 
     def save_settings(self):
         """Save settings to file"""
         settings = {
-            'last_model_path': self.get_model_path()
+            'last_model_path': self.get_model_path(),
+            'log_max_lines': self.log_max_lines
         }
         try:
             with open(self.settings_file, 'w') as f:
@@ -825,6 +1162,27 @@ class ModelGUI(QMainWindow):
         except:
             pass
 
+    def populate_pretrained_models(self):
+        """Add sleap's pretrained models to the dropdown, without importing sleap (and TensorFlow)"""
+        try:
+            spec = importlib.util.find_spec("sleap")
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            return
+        
+        pretrained_models_dir = os.path.join(list(spec.submodule_search_locations)[0], "models", "pretrained")
+        if not os.path.exists(pretrained_models_dir):
+            return
+        
+        # Insert after "(No model selected)" and "Browse...", before "Last used"
+        index = 2
+        for item in sorted(os.listdir(pretrained_models_dir)):
+            item_path = os.path.join(pretrained_models_dir, item)
+            if os.path.isdir(item_path):
+                self.model_path_combo.insertItem(index, f"Model: {item}", item_path)
+                index += 1
+
     def handle_model_selection(self, index):
         """Handle selection from the model dropdown"""
         if index == 1:  # Browse option
@@ -885,7 +1243,72 @@ class ModelGUI(QMainWindow):
         
         return True, ""
     
-    def add_video_paths(self, file_paths=[], dropped=False):
+    def toggle_watch_folder(self):
+        """Start watching a drop folder, or stop watching it"""
+        if self.watch_worker is not None:
+            self.stop_watching()
+            return
+        
+        model_path = self.get_model_path()
+        if not model_path or model_path == "Select a model...":
+            QMessageBox.warning(self, "Missing Information", "Please select a model before watching a folder.")
+            return
+        
+        directory = QFileDialog.getExistingDirectory(self, "Select the Folder to Watch")
+        if not directory:
+            return
+        
+        # Rendered videos land in the per-video subfolders, but skip them anyway in case
+        # the folder is also an output directory
+        output_prefix = f"{self.output_basename_text.text()}."
+        self.watch_worker = WatchWorker(directory, ignore=lambda name: name.startswith(output_prefix))
+        self.watch_worker.ready.connect(self.on_watched_video)
+        self.watch_worker.message.connect(self.log)
+        self.watch_worker.start()
+        self.watch_button.setText("Stop Watching")
+        self.log(f"Watching {directory}, videos are processed once they stop growing")
+    
+    def stop_watching(self):
+        if self.watch_worker is None:
+            return
+        self.watch_worker.stop()
+        self.watch_worker.wait()
+        self.log(f"Stopped watching {self.watch_worker.directory}")
+        self.watch_worker = None
+        self.watch_queue = []
+        self.update_metric_queues()
+        self.watch_button.setText("Watch Folder...")
+    
+    def on_watched_video(self, video_path):
+        """A video in the watched folder is completely written"""
+        if self.watch_worker is None:
+            return
+        output_dir = watch_output_dir(video_path, self.watch_worker.directory)
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            self.log(f"Skipping {os.path.basename(video_path)}, could not create {output_dir}: {str(e)}")
+            return
+        self.log(f"New video in watched folder: {os.path.basename(video_path)}")
+        self.add_video_paths([video_path], dropped=True, output_dirs=[output_dir])
+        self.watch_queue.append((video_path, output_dir))
+        self.update_metric_queues()
+        self.run_watched_videos()
+    
+    def run_watched_videos(self):
+        """Run All on the watched videos that are waiting, unless something else is running"""
+        if not self.watch_queue or hasattr(self, 'workflow_state'):
+            return
+        if hasattr(self, 'worker') and self.worker.isRunning():
+            # Another task, or the last one is still wrapping up
+            QTimer.singleShot(1000, self.run_watched_videos)
+            return
+        video_paths = [video_path for video_path, _ in self.watch_queue]
+        output_paths = [output_dir for _, output_dir in self.watch_queue]
+        self.watch_queue = []
+        self.run_complete_workflow(video_paths, output_paths, watched=True)
+
+    def add_video_paths(self, file_paths=[], dropped=False, output_dirs=None):
         if not dropped:
             file_paths, _ = QFileDialog.getOpenFileNames(
                 self, "Select Video Files", "", "Video Files (*.avi *.mp4 *.mov)")
@@ -904,8 +1327,13 @@ class ModelGUI(QMainWindow):
             
             # Create corresponding directory list (one-to-one relationship)
             dir_paths = []
-            for video_path in all_video_paths:
-                dir_paths.append(os.path.dirname(video_path))
+            if output_dirs is not None:
+                # Given for the new videos, keep the ones that are there
+                dir_paths = self.output_dir_list.toPlainText().splitlines()[:len(all_video_paths) - len(file_paths)]
+                dir_paths += list(output_dirs)
+            else:
+                for video_path in all_video_paths:
+                    dir_paths.append(os.path.dirname(video_path))
             
             # Update the output_dir_list with the directories in the same order as videos
             self.output_dir_list.setText('\n'.join(dir_paths))
@@ -917,15 +1345,80 @@ class ModelGUI(QMainWindow):
                     if hasattr(self, 'output_dir_text'):
                         self.output_dir_text.setText(dir_paths[0])
             
-            # Set frame rate based on the first/most recent video
-            most_recent_video = file_paths[0]
-            try:
-                fps = get_video_framerate(self.log, most_recent_video)
+            # Set frame rate based on the first/most recent video once it has been probed
+            self.fps_video = file_paths[0]
+            self.probe_video_metadata(file_paths)
+            if self.fps_video in self.video_metadata:
+                self.on_video_probed(self.fps_video, self.video_metadata[self.fps_video], "")
+    
+    def probe_video_metadata(self, video_paths):
+        """Read the metadata of the videos in the background (cached on disk, see probe.py)"""
+        video_paths = [path for path in video_paths
+                       if path not in self.video_metadata and path not in self.probing and path not in self.missing_videos]
+        if not video_paths:
+            return
+        self.probing.update(video_paths)
+        probe_worker = ProbeWorker(video_paths)
+        probe_worker.probed.connect(self.on_video_probed)
+        probe_worker.finished.connect(lambda: self.probe_workers.remove(probe_worker))
+        self.probe_workers.append(probe_worker)
+        probe_worker.start()
+    
+    def on_video_probed(self, video_path, metadata, error):
+        self.probing.discard(video_path)
+        if error == FILE_NOT_FOUND:
+            # Shown in the video info list, typing a path would log every prefix of it
+            self.missing_videos.add(video_path)
+        else:
+            self.video_metadata[video_path] = metadata
+            if error:
+                self.log(f"Could not read {os.path.basename(video_path)}: {error}")
+        
+        if video_path == self.fps_video:
+            self.fps_video = None
+            if metadata.get("fps"):
+                fps = int(round(metadata["fps"]))
                 self.frame_rate_spin.setValue(fps)
-                self.log(f"Auto-detected frame rate: {fps} fps from {os.path.basename(most_recent_video)}")
-            except Exception as e:
-                self.log(f"Could not detect frame rate from {os.path.basename(most_recent_video)}: {str(e)}")
+                self.log(f"Auto-detected frame rate: {fps} fps from {os.path.basename(video_path)}")
+            else:
+                self.log(f"Could not detect frame rate from {os.path.basename(video_path)}")
         
+        self.video_info_timer.start()
+    
+    def refresh_video_info(self):
+        """Show the metadata of the listed videos, probing the ones that were typed/pasted in"""
+        video_paths = [path for path in self.video_paths_list.toPlainText().splitlines() if path.strip()]
+        # No file checks here, with hundreds of videos on a network share that alone blocks the GUI
+        self.probe_video_metadata(video_paths)
+        
+        lines = []
+        total_frames = 0
+        total_duration = 0
+        for path in video_paths:
+            if path in self.video_metadata:
+                metadata = self.video_metadata[path]
+                total_frames += metadata.get("frame_count") or 0
+                total_duration += metadata.get("duration") or 0
+                details = format_metadata(metadata)
+            elif path in self.missing_videos:
+                details = "file not found"
+            else:
+                details = "reading..."
+            lines.append(f"{os.path.basename(path)}: {details}")
+        if len(lines) > 1 and total_frames:
+            seconds = int(round(total_duration))
+            lines.insert(0, f"{len(lines)} videos, {total_frames} frames, "
+                            f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d} total")
+        self.video_info_list.setPlainText("\n".join(lines))
+        
+    def closeEvent(self, event):
+        """Stop background inference servers when the window is closed"""
+        shutdown_inference_servers()
+        for probe_worker in self.probe_workers:
+            probe_worker.cancel_requested = True
+        self.stop_watching()
+        super().closeEvent(event)
+
     def clear_all_fields(self):
         self.model_path_combo.setCurrentIndex(0)  # reset dropdown
         self.video_paths_list.clear()
@@ -933,7 +1426,15 @@ class ModelGUI(QMainWindow):
         self.output_basename_text.setText("labels.v001")
         self.frame_rate_spin.setValue(120)
         self.video_format_combo.setCurrentText("MP4")
+        self.export_format_combo.setCurrentIndex(0)
+        self.render_jobs_spin.setValue(default_render_jobs())
+        self.segments_spin.setValue(1)
+        self.pipeline_checkbox.setChecked(False)
+        self.warm_inference_checkbox.setChecked(False)
+        self.force_checkbox.setChecked(False)
+        self.longest_first_checkbox.setChecked(True)
         self.progress_bar.setValue(0)
+        self.stats_label.setText("")
         self.log_text.clear()
         
 
@@ -945,6 +1446,8 @@ def main():
     parser.add_argument('submode', nargs='?', default=None,
                       help='Sub-mode: "social" for face social analysis (18 nodes)')
 
+    add_metrics_arguments(parser)
+
     args, _ = parser.parse_known_args()
 
     # Combine mode and submode
@@ -953,12 +1456,28 @@ def main():
     else:
         full_mode = args.mode
 
+    # Prometheus metrics for unattended rigs, the GUI runs without them if they can't be exported
+    metrics = None
+    exporters = []
+    if args.metrics_listen or args.metrics_textfile:
+        metrics = BatchMetrics()
+        try:
+            exporters = start_exporters(metrics, args.metrics_listen, args.metrics_textfile, args.metrics_interval)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not export metrics: {str(e)}")
+            metrics = None
+        for exporter in exporters:
+            print(f"Exporting metrics to {exporter.address}")
+
     app = QApplication(sys.argv)
 
-    window = ModelGUI(mode=full_mode)
+    window = ModelGUI(mode=full_mode, metrics=metrics)
     window.show()
 
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    for exporter in exporters:
+        exporter.stop()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,314 @@
+"""
+Prometheus metrics of the running workflow.
+
+BatchMetrics is fed with the same events the GUI log and the batch reporter get
+(step started/finished, stats snapshots, pipeline queues) and renders them in
+Prometheus' text format. Two ways to get them to Prometheus, both optional:
+
+    --metrics-listen 9464            http://127.0.0.1:9464/metrics (MetricsServer)
+    --metrics-listen 0.0.0.0:9464    same, reachable from other hosts
+    --metrics-textfile /var/lib/node_exporter/textfile/sleapgui.prom
+                                     rewritten every few seconds for node_exporter's
+                                     textfile collector (TextfileExporter)
+
+Exported metrics:
+
+    sleapgui_queue_depth{queue}                   videos waiting in front of a stage (or the watch folder)
+    sleapgui_jobs_running{stage}                  steps running right now
+    sleapgui_videos_done_total                    videos that went through every stage
+    sleapgui_videos_failed_total                  videos whose workflow stopped with an error
+    sleapgui_steps_total{stage,result}            finished steps, result "success" or "failure"
+    sleapgui_job_frames_per_second{stage,job}     current throughput of every active job
+    sleapgui_stage_duration_seconds{stage}        histogram of successful step durations
+    sleapgui_child_rss_bytes{pid,command}         resident memory of every child process (and its children)
+    sleapgui_last_event_timestamp_seconds         when the last event came in
+
+No prometheus_client needed, the format is written by hand.
+"""
+import os
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+try:
+    from sleapgui.governor import process_table, tree_rss, command_name
+except ModuleNotFoundError:
+    from governor import process_table, tree_rss, command_name
+
+# Upper bounds (seconds) of the stage duration buckets, steps take seconds to hours
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400)
+DEFAULT_TEXTFILE_INTERVAL = 15
+DEFAULT_HOST = "127.0.0.1"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def child_rss():
+    """pid -> (command, resident memory in bytes incl. descendants) of this process' children"""
+    table = process_table()
+    own_pid = os.getpid()
+    return {pid: (command_name(pid), tree_rss(pid, table))
+            for pid, (parent, _) in table.items() if parent == own_pid}
+
+
+class BatchMetrics:
+    """Workflow state for Prometheus, thread-safe so exporters can read it at any time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queue_depth = {}  # queue name -> videos waiting
+        self.running = {}  # (stage, video_index) -> start time
+        self.videos_done = 0
+        self.videos_failed = 0
+        self.steps = {}  # (stage, result) -> count
+        self.fps = {}  # (stage, video_index, job) -> frames per second
+        self.durations = {}  # stage -> [bucket counts..., +Inf count], sum
+        self.last_event = time.time()
+
+    def set_queues(self, depths):
+        """Replace the queue depths, e.g. {"analyze": 3, "save_csv": 1, "create_video": 0}"""
+        with self._lock:
+            self.queue_depth.update(depths)
+            self.last_event = time.time()
+
+    def step_started(self, stage, video_index):
+        with self._lock:
+            self.running[(stage, video_index)] = time.time()
+            self.last_event = time.time()
+
+    def stats(self, stage, video_index, stats):
+        """A stats snapshot of a running step (see progress.py)"""
+        fps = stats.get("fps")
+        if fps is None:
+            fps = stats.get("fps_smoothed")
+        if fps is None:
+            return
+        job = stats.get("label") or os.path.basename(stats.get("video_path") or "") or f"video {video_index}"
+        with self._lock:
+            self.fps[(stage, video_index, job)] = fps
+            self.last_event = time.time()
+
+    def step_finished(self, stage, video_index, success):
+        """A step is over, a failed step means a failed video"""
+        now = time.time()
+        with self._lock:
+            started = self.running.pop((stage, video_index), None)
+            for key in [key for key in self.fps if key[:2] == (stage, video_index)]:
+                del self.fps[key]
+            result = "success" if success else "failure"
+            self.steps[(stage, result)] = self.steps.get((stage, result), 0) + 1
+            if success and started is not None:
+                counts, total = self.durations.get(stage, ([0] * (len(DURATION_BUCKETS) + 1), 0.0))
+                seconds = now - started
+                for position, bound in enumerate(DURATION_BUCKETS + (float("inf"),)):
+                    if seconds <= bound:
+                        counts[position] += 1
+                self.durations[stage] = (counts, total + seconds)
+            if not success:
+                self.videos_failed += 1
+            self.last_event = now
+
+    def video_finished(self, video_index):
+        """Every stage of a video is done"""
+        with self._lock:
+            self.videos_done += 1
+            self.last_event = time.time()
+
+    def stopped(self):
+        """The workflow was stopped, nothing is running anymore"""
+        with self._lock:
+            self.running.clear()
+            self.fps.clear()
+            self.last_event = time.time()
+
+    def render(self):
+        """The metrics in Prometheus' text exposition format"""
+        children = child_rss()
+        with self._lock:
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for suffix, labels, value in samples:
+                    lines.append(f"{name}{suffix}{_labels(**labels)} {_number(value)}")
+
+            metric("sleapgui_queue_depth", "gauge", "Videos waiting in front of a stage",
+                   [("", {"queue": queue_name}, depth) for queue_name, depth in sorted(self.queue_depth.items())])
+            # Idle stages stay in the output as 0 instead of disappearing
+            running = {stage: 0 for stage, _ in self.steps}
+            for stage, _ in self.running:
+                running[stage] = running.get(stage, 0) + 1
+            metric("sleapgui_jobs_running", "gauge", "Workflow steps running right now",
+                   [("", {"stage": stage}, count) for stage, count in sorted(running.items())])
+            metric("sleapgui_videos_done_total", "counter", "Videos that went through every stage",
+                   [("", {}, self.videos_done)])
+            metric("sleapgui_videos_failed_total", "counter", "Videos whose workflow stopped with an error",
+                   [("", {}, self.videos_failed)])
+            metric("sleapgui_steps_total", "counter", "Finished workflow steps",
+                   [("", {"stage": stage, "result": result}, count)
+                    for (stage, result), count in sorted(self.steps.items())])
+            metric("sleapgui_job_frames_per_second", "gauge", "Current throughput of the active jobs",
+                   [("", {"stage": stage, "job": job}, float(fps))
+                    for (stage, _, job), fps in sorted(self.fps.items(), key=lambda item: str(item[0]))])
+
+            samples = []
+            for stage, (counts, total) in sorted(self.durations.items()):
+                for bound, count in zip(DURATION_BUCKETS + (float("inf"),), counts):
+                    samples.append(("_bucket", {"stage": stage, "le": _number(bound)}, count))
+                samples.append(("_sum", {"stage": stage}, total))
+                samples.append(("_count", {"stage": stage}, counts[-1]))
+            metric("sleapgui_stage_duration_seconds", "histogram", "Duration of successful workflow steps", samples)
+
+            metric("sleapgui_child_rss_bytes", "gauge", "Resident memory of a child process and its descendants",
+                   [("", {"pid": pid, "command": command}, rss) for pid, (command, rss) in sorted(children.items())])
+            metric("sleapgui_last_event_timestamp_seconds", "gauge", "Time of the last workflow event",
+                   [("", {}, self.last_event)])
+        return "\n".join(lines) + "\n"
+
+
+def parse_listen(value):
+    """"9464" or "host:9464" -> (host, port)"""
+    host, _, port = str(value).rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Invalid metrics address '{value}', expected [HOST:]PORT")
+    return host or DEFAULT_HOST, port
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood stderr
+        pass
+
+
+class MetricsServer:
+    """Serves /metrics over HTTP from a daemon thread"""
+
+    def __init__(self, metrics, host=DEFAULT_HOST, port=9464):
+        self.httpd = HTTPServer((host, port), _MetricsHandler)
+        self.httpd.metrics = metrics
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TextfileExporter:
+    """Rewrites a .prom file for node_exporter's textfile collector every interval seconds"""
+
+    def __init__(self, metrics, path, interval=DEFAULT_TEXTFILE_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.path
+
+    def write(self):
+        # node_exporter only reads *.prom, so it never sees the half written file
+        temp_path = self.path + ".part"
+        with open(temp_path, 'w') as f:
+            f.write(self.metrics.render())
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.write()
+        self.thread = threading.Thread(target=self._run, name="metrics-textfile")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                # e.g. the directory was unmounted for a moment, try again next time
+                pass
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.write()
+        except OSError:
+            pass
+
+
+def add_metrics_arguments(parser):
+    """The --metrics-* options shared by the GUI, `sleapgui batch` and `sleapgui watch`"""
+    parser.add_argument("--metrics-listen", metavar="[HOST:]PORT",
+                        help=f"Serve Prometheus metrics at http://HOST:PORT/metrics (host defaults to {DEFAULT_HOST})")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="Write Prometheus metrics to PATH (*.prom) for node_exporter's textfile collector")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_TEXTFILE_INTERVAL,
+                        help=f"Seconds between textfile updates (default {DEFAULT_TEXTFILE_INTERVAL})")
+
+
+def start_exporters(metrics, listen=None, textfile=None, interval=DEFAULT_TEXTFILE_INTERVAL):
+    """
+    Start the exporters that were asked for.
+
+    Returns:
+        list: started MetricsServer / TextfileExporter objects, call stop() on each at exit
+
+    Raises:
+        OSError: the port is taken, the textfile can't be written, ...
+        ValueError: listen isn't [HOST:]PORT
+    """
+    exporters = []
+    try:
+        if listen:
+            host, port = parse_listen(listen)
+            exporters.append(MetricsServer(metrics, host, port).start())
+        if textfile:
+            exporters.append(TextfileExporter(metrics, textfile, interval).start())
+    except Exception:
+        for exporter in exporters:
+            exporter.stop()
+        raise
+    return exporters
@@ -0,0 +1,135 @@
+from collections import deque
+
+# Order matters: each video goes through these stages one after the other
+STAGES = ("analyze", "save_csv", "create_video")
+
+
+class WorkflowPipeline:
+    """
+    Bookkeeping for the complete workflow (analyze -> CSV -> video).
+
+    This class doesn't run anything itself, it only decides which (stage, video)
+    jobs can start next and keeps track of per-stage, per-video progress. Each
+    stage has a single slot and the stages are connected by bounded queues, so
+    with overlap enabled the inference slot can work on video N+1 while video N
+    is still being exported/rendered. With overlap disabled only one job runs at
+    a time, which gives the classic "finish one video before starting the next"
+    order.
+    """
+
+    def __init__(self, total_videos, overlap=True, queue_size=2, video_keys=None):
+        """
+        Args:
+            total_videos: Number of videos in the workflow
+            overlap: Allow different stages to run at the same time on different videos
+            queue_size: Maximum number of videos waiting in front of a stage
+            video_keys: Optional list (one per video) of output locations. Two videos
+                        sharing a key are never in flight at the same time, since they
+                        would overwrite each other's .slp file.
+        """
+        self.total_videos = total_videos
+        self.overlap = overlap
+        self.queue_size = max(1, queue_size)
+        self.video_keys = list(video_keys) if video_keys else [None] * total_videos
+
+        self.waiting = {stage: deque() for stage in STAGES}
+        self.waiting[STAGES[0]].extend(range(total_videos))
+        self.running = {stage: None for stage in STAGES}
+        self.progress = {}  # (video_index, stage) -> percent
+        self.in_flight = set()
+        self.completed = set()
+
+    def resume(self, completed_steps):
+        """
+        Skip stages that are already done, e.g. when resuming a batch from its journal.
+
+        Args:
+            completed_steps: set of (stage, video_index). Stages run in order, so a
+                             video restarts at its first stage that isn't in the set.
+        """
+        self.waiting = {stage: deque() for stage in STAGES}
+        for video_index in range(self.total_videos):
+            position = 0
+            while position < len(STAGES) and (STAGES[position], video_index) in completed_steps:
+                self.progress[(video_index, STAGES[position])] = 100
+                position += 1
+            if position == len(STAGES):
+                self.completed.add(video_index)
+            else:
+                self.waiting[STAGES[position]].append(video_index)
+                if position > 0:
+                    # Its .slp is waiting for export/render, another video with the same
+                    # output must not be analyzed over it
+                    self.in_flight.add(video_index)
+
+    def next_jobs(self):
+        """
+        Return a list of (stage, video_index) jobs that can be started now and mark
+        them as running. Downstream stages are served first so the queues drain.
+        """
+        jobs = []
+        for position in reversed(range(len(STAGES))):
+            stage = STAGES[position]
+            if self.running[stage] is not None or not self.waiting[stage]:
+                continue
+            if not self.overlap and (jobs or self.active_jobs()):
+                break
+
+            # Backpressure: don't produce more work than the next stage can queue up
+            if position + 1 < len(STAGES):
+                next_stage = STAGES[position + 1]
+                if len(self.waiting[next_stage]) >= self.queue_size:
+                    continue
+
+            video_index = self.waiting[stage][0]
+            if position == 0 and self._output_in_use(video_index):
+                continue
+
+            self.waiting[stage].popleft()
+            self.in_flight.add(video_index)
+            self.running[stage] = video_index
+            self.progress[(video_index, stage)] = 0
+            jobs.append((stage, video_index))
+        return jobs
+
+    def stage_finished(self, stage, video_index):
+        """Mark a running job as done and hand the video to the next stage"""
+        if self.running.get(stage) == video_index:
+            self.running[stage] = None
+        self.progress[(video_index, stage)] = 100
+
+        position = STAGES.index(stage)
+        if position + 1 < len(STAGES):
+            self.waiting[STAGES[position + 1]].append(video_index)
+            return False
+
+        self.in_flight.discard(video_index)
+        self.completed.add(video_index)
+        return True
+
+    def set_progress(self, stage, video_index, value):
+        self.progress[(video_index, stage)] = max(0, min(100, value))
+
+    def overall_progress(self):
+        """Overall percentage, every (video, stage) pair has the same weight"""
+        if self.total_videos == 0:
+            return 100
+        total = sum(self.progress.values())
+        return total / (self.total_videos * len(STAGES))
+
+    def queued(self):
+        """Number of videos waiting in front of every stage"""
+        return {stage: len(self.waiting[stage]) for stage in STAGES}
+
+    def active_jobs(self):
+        return [(stage, index) for stage, index in self.running.items() if index is not None]
+
+    def is_done(self):
+        return len(self.completed) >= self.total_videos
+
+    def _output_in_use(self, video_index):
+        key = self.video_keys[video_index]
+        if key is None:
+            return False
+        # Another video with the same output is somewhere past the analyze queue
+        return any(self.video_keys[other] == key for other in self.in_flight)
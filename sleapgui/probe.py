@@ -0,0 +1,208 @@
+"""
+Video metadata (fps, frame count, resolution, codec, duration) with an on-disk cache.
+
+Opening a video with OpenCV can take a while, especially on network shares, so
+results are cached in ~/.sleapgui/video_metadata.json keyed by (path, size,
+mtime), and probe_videos() opens several videos at once in a thread pool.
+"""
+import os
+import json
+import stat as stat_module
+import time
+import threading
+import concurrent.futures
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".sleapgui", "video_metadata.json")
+# Oldest entries are dropped beyond this
+MAX_CACHE_ENTRIES = 5000
+# Error probe_videos() reports for paths that aren't a file, e.g. half typed in the GUI
+FILE_NOT_FOUND = "file not found"
+
+
+def probe_video(video_path):
+    """
+    Read the metadata of one video with OpenCV.
+
+    Returns:
+        dict with fps, frame_count, width, height, codec and duration (seconds),
+        values are None if unknown
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+
+    fps = fps if 0 < fps <= 1000 else None
+    frame_count = frame_count if frame_count > 0 else None
+    codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") if fourcc > 0 else None
+    return {
+        "fps": fps,
+        "frame_count": frame_count,
+        "width": width or None,
+        "height": height or None,
+        "codec": codec or None,
+        "duration": frame_count / fps if fps and frame_count else None,
+    }
+
+
+class ProbeCache:
+    """JSON file mapping video paths to their metadata, valid while size and mtime match"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+        self.dirty = False
+
+    def get(self, video_path, stat=None):
+        stat = stat or os.stat(video_path)
+        with self.lock:
+            entry = self._entries().get(os.path.abspath(video_path))
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["metadata"]
+        return None
+
+    def put(self, video_path, metadata, stat=None):
+        stat = stat or os.stat(video_path)
+        with self.lock:
+            self._entries()[os.path.abspath(video_path)] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "probed_at": time.time(),
+                "metadata": metadata,
+            }
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = self._entries()
+            if len(entries) > MAX_CACHE_ENTRIES:
+                newest = sorted(entries.items(), key=lambda item: item[1]["probed_at"])[-MAX_CACHE_ENTRIES:]
+                entries = self.entries = dict(newest)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.path)
+                self.dirty = False
+            except OSError:
+                # Only a cache
+                pass
+
+    def _entries(self):
+        if self.entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ProbeCache()
+        return _default_cache
+
+
+def video_metadata(video_path, cache=None, save=True):
+    """
+    Metadata of one video, from the cache if it's up to date.
+
+    Args:
+        video_path: Video to probe
+        cache: ProbeCache to use, default_cache() if None
+        save: Write the cache file right away if the video had to be probed
+
+    Raises:
+        OSError/IOError if the video can't be read, FileNotFoundError/IsADirectoryError
+        if the path isn't a file
+    """
+    cache = cache or default_cache()
+    stat = os.stat(video_path)
+    if stat_module.S_ISDIR(stat.st_mode):
+        raise IsADirectoryError(f"Is a directory: {video_path}")
+    metadata = cache.get(video_path, stat)
+    if metadata is None:
+        metadata = probe_video(video_path)
+        cache.put(video_path, metadata, stat)
+        if save:
+            cache.save()
+    return metadata
+
+
+def probe_videos(video_paths, on_result=None, max_workers=8, cache=None, cancelled=None):
+    """
+    Probe many videos in parallel, cached ones don't open the file at all.
+
+    Args:
+        video_paths: Videos to probe
+        on_result: Called as on_result(path, metadata, error) from the pool threads as
+                   soon as a video is done; metadata is None if it failed, error is
+                   FILE_NOT_FOUND if the path isn't a file
+        max_workers: Number of videos opened at the same time
+        cache: ProbeCache to use, default_cache() if None
+        cancelled: Optional callable, remaining videos are skipped once it returns True
+
+    Returns:
+        dict: path -> metadata (None if it failed)
+    """
+    cache = cache or default_cache()
+    results = {}
+
+    def probe(path):
+        if cancelled is not None and cancelled():
+            return
+        try:
+            metadata, error = video_metadata(path, cache, save=False), ""
+        except (FileNotFoundError, IsADirectoryError):
+            metadata, error = None, FILE_NOT_FOUND
+        except Exception as e:
+            metadata, error = None, str(e)
+        results[path] = metadata
+        if on_result is not None:
+            on_result(path, metadata, error)
+
+    unique_paths = list(dict.fromkeys(video_paths))
+    if unique_paths:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_paths)))) as pool:
+            list(pool.map(probe, unique_paths))
+    cache.save()
+    return results
+
+
+def format_metadata(metadata):
+    """Short one-line description, e.g. "1920x1080, 120.0 fps, 432000 frames, 1:00:00, h264" """
+    if not metadata:
+        return "unreadable"
+    parts = []
+    if metadata.get("width") and metadata.get("height"):
+        parts.append(f"{metadata['width']}x{metadata['height']}")
+    if metadata.get("fps"):
+        parts.append(f"{metadata['fps']:.4g} fps")
+    if metadata.get("frame_count"):
+        parts.append(f"{metadata['frame_count']} frames")
+    if metadata.get("duration"):
+        seconds = int(round(metadata["duration"]))
+        parts.append(f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}")
+    if metadata.get("codec"):
+        parts.append(metadata["codec"])
+    return ", ".join(parts) or "no metadata"
@@ -0,0 +1,264 @@
+"""
+Event-driven monitoring of child processes.
+
+One ProcessMonitor watches the stdout/stderr of any number of children from a
+single loop. On POSIX it waits on the pipes with selectors, so the caller only
+wakes up when there is output, a child exits, a timeout passes or wakeup() is
+called (e.g. on cancel). On Windows, where pipes can't be selected, one reader
+thread per pipe feeds a queue instead.
+
+With a Tracer (tracing.py) every child gets its own row in the batch trace: the
+Popen call ("spawn"), the time until its first output ("startup", mostly
+imports and model loading for sleap-track) and the rest until it exits ("run").
+"""
+import os
+import time
+import queue
+import threading
+import subprocess
+from collections import namedtuple
+
+# kind is "line" (data is the line, stream "stdout"/"stderr") or "exit" (data is the return code)
+ProcessEvent = namedtuple("ProcessEvent", ["kind", "key", "stream", "data"])
+
+_USE_SELECTORS = os.name != 'nt'
+# How often wait() checks a child that closed its output but hasn't exited yet,
+# there's nothing to select on for the exit itself
+EXIT_POLL_INTERVAL = 0.05
+if _USE_SELECTORS:
+    import selectors
+
+
+class _Child:
+    def __init__(self, key, process):
+        self.key = key
+        self.process = process
+        self.buffers = {"stdout": b"", "stderr": b""}
+        self.open_streams = {"stdout", "stderr"}
+        self.exited = False
+        self.spawned = None  # time.time() when Popen returned
+        self.first_output = None
+
+
+class ProcessMonitor:
+    """Spawns child processes and turns their output and exit into events"""
+
+    def __init__(self, tracer=None, category="process"):
+        """
+        Args:
+            tracer: Optional Tracer the spans of the children are added to
+            category: Category of those spans, e.g. the task name
+        """
+        self.children = {}
+        self.tracer = tracer
+        self.category = category
+        if _USE_SELECTORS:
+            self.selector = selectors.DefaultSelector()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            os.set_blocking(self._wake_w, False)
+            self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        else:
+            self.events = queue.Queue()
+
+    def spawn(self, key, cmd, **popen_kwargs):
+        """Start cmd and watch its output, returns the Popen object"""
+        started = time.time()
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            **popen_kwargs
+        )
+        child = _Child(key, process)
+        child.spawned = time.time()
+        self.children[key] = child
+        if self.tracer is not None:
+            self.tracer.name_process(process.pid, f"{os.path.basename(str(cmd[0]))} {key}")
+            self.tracer.add("spawn", started, child.spawned, self.category, pid=process.pid, tid=0,
+                            args={"job": str(key)})
+
+        for stream, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+            if _USE_SELECTORS:
+                os.set_blocking(pipe.fileno(), False)
+                self.selector.register(pipe.fileno(), selectors.EVENT_READ, (child, stream))
+            else:
+                reader = threading.Thread(target=self._read_pipe, args=(child, stream, pipe))
+                reader.daemon = True
+                reader.start()
+        return process
+
+    def running(self):
+        """Number of children that haven't been reported as exited yet"""
+        return sum(1 for child in self.children.values() if not child.exited)
+
+    def wakeup(self):
+        """Make a blocked wait() return early, safe to call from any thread"""
+        if _USE_SELECTORS:
+            try:
+                os.write(self._wake_w, b"x")
+            except (BlockingIOError, OSError):
+                pass
+        else:
+            self.events.put(None)
+
+    def wait(self, timeout=None):
+        """
+        Block until something happens or timeout seconds have passed.
+
+        Returns:
+            list: ProcessEvent objects, empty on timeout or wakeup
+        """
+        events = []
+        if self._exit_pending():
+            timeout = EXIT_POLL_INTERVAL if timeout is None else min(timeout, EXIT_POLL_INTERVAL)
+        if _USE_SELECTORS:
+            for selector_key, _ in self.selector.select(timeout):
+                if selector_key.data is None:
+                    self._drain_wakeup()
+                    continue
+                child, stream = selector_key.data
+                self._read_ready(child, stream, selector_key.fd, events)
+        else:
+            try:
+                item = self.events.get(timeout=timeout)
+                while True:
+                    if item is not None:
+                        self._handle_thread_event(item, events)
+                    item = self.events.get_nowait()
+            except queue.Empty:
+                pass
+
+        self._collect_exits(events)
+        return events
+
+    def terminate(self, key, grace_period=0.5):
+        """Terminate one child, killing it if it doesn't exit within grace_period"""
+        child = self.children.get(key)
+        if child is None or child.process.poll() is not None:
+            return
+        child.process.terminate()
+        try:
+            child.process.wait(grace_period)
+        except subprocess.TimeoutExpired:
+            child.process.kill()
+
+    def terminate_all(self, grace_period=0.5):
+        alive = [child for child in self.children.values() if child.process.poll() is None]
+        for child in alive:
+            child.process.terminate()
+        deadline = time.time() + grace_period
+        for child in alive:
+            try:
+                child.process.wait(max(0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                child.process.kill()
+
+    def close(self):
+        self.terminate_all()
+        if _USE_SELECTORS:
+            for child in self.children.values():
+                for pipe in (child.process.stdout, child.process.stderr):
+                    try:
+                        self.selector.unregister(pipe.fileno())
+                    except (KeyError, ValueError):
+                        pass
+                    pipe.close()
+            self.selector.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+        for child in self.children.values():
+            try:
+                child.process.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _read_ready(self, child, stream, fd, events):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if data:
+            self._split_lines(child, stream, data, events)
+            return
+
+        # EOF, flush the incomplete last line
+        self.selector.unregister(fd)
+        child.open_streams.discard(stream)
+        if child.buffers[stream]:
+            events.append(ProcessEvent("line", child.key, stream, self._decode(child.buffers[stream])))
+            child.buffers[stream] = b""
+
+    def _split_lines(self, child, stream, data, events):
+        # Progress bars rewrite their line with \r, treat it as a line break too
+        buffer = (child.buffers[stream] + data).replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        *lines, child.buffers[stream] = buffer.split(b"\n")
+        if child.first_output is None and buffer.strip():
+            child.first_output = time.time()
+        for line in lines:
+            line = self._decode(line)
+            if line:
+                events.append(ProcessEvent("line", child.key, stream, line))
+
+    def _read_pipe(self, child, stream, pipe):
+        for raw_line in iter(pipe.readline, b""):
+            self.events.put((child, stream, raw_line))
+        pipe.close()
+        self.events.put((child, stream, None))
+
+    def _handle_thread_event(self, item, events):
+        child, stream, data = item
+        if data is None:
+            child.open_streams.discard(stream)
+        else:
+            self._split_lines(child, stream, data, events)
+            if child.buffers[stream]:
+                events.append(ProcessEvent("line", child.key, stream, self._decode(child.buffers[stream])))
+                child.buffers[stream] = b""
+
+    def _exit_pending(self):
+        """A child closed its output but is still running"""
+        return any(not child.exited and not child.open_streams and child.process.returncode is None
+                   for child in self.children.values())
+
+    def _collect_exits(self, events):
+        for child in self.children.values():
+            if child.exited:
+                continue
+            # Wait for the pipes to close first so no output is lost
+            if child.open_streams:
+                continue
+            # Never block here, the other children's output and the timeouts would have to wait
+            if child.process.poll() is None:
+                # Closed its output but still running, check again on the next wait()
+                continue
+            child.exited = True
+            self._trace_exit(child)
+            events.append(ProcessEvent("exit", child.key, None, child.process.returncode))
+
+    def _trace_exit(self, child):
+        if self.tracer is None:
+            return
+        exited = time.time()
+        pid = child.process.pid
+        args = {"job": str(child.key), "returncode": child.process.returncode}
+        # Children without any output only get a run span
+        if child.first_output is not None:
+            self.tracer.add("startup", child.spawned, child.first_output, self.category, pid=pid, tid=0, args=args)
+        self.tracer.add("run", child.first_output or child.spawned, exited, self.category, pid=pid, tid=0, args=args)
+        self.tracer.instant("exit", exited, self.category, pid=pid, tid=0, args=args)
+
+    @staticmethod
+    def _decode(raw):
+        return raw.decode("utf-8", errors="replace").strip()
@@ -0,0 +1,128 @@
+"""
+Frame-based progress for sleap-track / sleap-render.
+
+sleap-track is started with "--verbosity json", which makes it print one JSON
+object per progress update (n_processed, n_total, rate, ...). The rich progress
+bar and sleap-render's "Finished N frames" lines are parsed as a fallback.
+"""
+import re
+import json
+import time
+
+_FRACTION_RE = re.compile(r"(\d+)\s*/\s*(\d+)")
+_FINISHED_RE = re.compile(r"Finished\s+(\d+)\s+frames", re.IGNORECASE)
+_FPS_RE = re.compile(r"(?:fps\s*=\s*([\d.]+))|(?:([\d.]+)\s*(?:FPS|fps|it/s))")
+
+
+class ProgressTracker:
+    """Keeps track of frames done, throughput and ETA for one process"""
+
+    def __init__(self, total_frames=None, smoothing=0.1):
+        """
+        Args:
+            total_frames: Frame count of the video, if known
+            smoothing: Weight of the newest sample in the smoothed frames/sec
+        """
+        self.total_frames = total_frames if total_frames and total_frames > 0 else None
+        self.smoothing = smoothing
+        self.frames_done = 0
+        self.fps = None
+        self.fps_smoothed = None
+        self.start_time = time.time()
+        self.last_time = None
+        self.last_frames = 0
+        self.last_reported = 0
+
+    def parse_line(self, line):
+        """
+        Update the tracker from one line of output.
+
+        Returns:
+            tuple: (is_progress_line (bool), updated (bool)). Progress lines in JSON
+            format don't need to be echoed to the log.
+        """
+        line = line.strip()
+        if line.startswith("{") and "n_processed" in line:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                return False, False
+            return True, self.update(
+                data.get("n_processed"), data.get("n_total"), data.get("rate"))
+
+        match = _FINISHED_RE.search(line)
+        if match:
+            fps_match = _FPS_RE.search(line)
+            rate = float(fps_match.group(1) or fps_match.group(2)) if fps_match else None
+            return False, self.update(int(match.group(1)), None, rate)
+
+        # Rich progress bar, e.g. "Predicting... ━━━━ 1200/36000 ETA: 0:10:00 52.1 FPS"
+        if "ETA" in line or "FPS" in line:
+            match = _FRACTION_RE.search(line)
+            if match:
+                fps_match = _FPS_RE.search(line)
+                rate = float(fps_match.group(1) or fps_match.group(2)) if fps_match else None
+                return False, self.update(int(match.group(1)), int(match.group(2)), rate)
+
+        return False, False
+
+    def update(self, frames_done, total=None, rate=None):
+        if frames_done is None:
+            return False
+        now = time.time()
+
+        if total and total > 0:
+            self.total_frames = total
+
+        # Instantaneous rate from the last two samples, unless the tool reports one
+        if rate is None and self.last_time is not None and now > self.last_time:
+            rate = (frames_done - self.last_frames) / (now - self.last_time)
+        if rate is not None and rate >= 0:
+            self.fps = rate
+            if self.fps_smoothed is None:
+                self.fps_smoothed = rate
+            else:
+                self.fps_smoothed = self.smoothing * rate + (1 - self.smoothing) * self.fps_smoothed
+
+        self.frames_done = frames_done
+        self.last_frames = frames_done
+        self.last_time = now
+        return True
+
+    def percent(self):
+        if not self.total_frames:
+            return None
+        return min(100.0, 100.0 * self.frames_done / self.total_frames)
+
+    def frames_remaining(self):
+        if not self.total_frames:
+            return None
+        return max(0, self.total_frames - self.frames_done)
+
+    def eta(self):
+        """Seconds left for this video, None if unknown"""
+        remaining = self.frames_remaining()
+        if remaining is None or not self.fps_smoothed:
+            return None
+        return remaining / self.fps_smoothed
+
+    def snapshot(self):
+        return {
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "percent": self.percent(),
+            "fps": self.fps,
+            "fps_smoothed": self.fps_smoothed,
+            "eta": self.eta(),
+            "elapsed": time.time() - self.start_time,
+        }
+
+
+def format_eta(seconds):
+    """Format seconds as H:MM:SS, or "--" if unknown"""
+    if seconds is None:
+        return "--"
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
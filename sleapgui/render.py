@@ -0,0 +1,323 @@
+"""
+Built-in skeleton video renderer, used instead of sleap-render.
+
+sleap-render starts a new Python interpreter with TensorFlow for every video and
+loads all predictions as Python objects. render_video() streams the poses from
+the .slp file in chunks (slpio), decodes the source video with OpenCV, draws
+all instances of a frame with a handful of vectorized calls and pipes the frames
+into ffmpeg (libx264 with a selectable preset/CRF) or cv2.VideoWriter if ffmpeg
+isn't installed.
+
+Like sleap-render, every labeled frame of the video is written, played back at
+the given frame rate.
+
+Preview renders (scale, stride, max_duration) only decode the frames they keep,
+seeking over long gaps, and are written as <name>.preview.<format> next to the
+full render, for a quick look at the tracking quality.
+
+Files that aren't in the layout slpio understands raise UnsupportedSlpError,
+and a source video that can't be found or ends before the labeled frames
+raises SourceVideoError, so the caller can fall back to sleap-render.
+"""
+import os
+import shutil
+import subprocess
+
+try:
+    from sleapgui.slpio import UnsupportedSlpError, read_metadata, check_streamable, iter_instance_chunks
+except ModuleNotFoundError:
+    from slpio import UnsupportedSlpError, read_metadata, check_streamable, iter_instance_chunks
+
+RENDERERS = ("native", "sleap-render")
+ENCODERS = ("auto", "ffmpeg", "opencv")
+DEFAULT_PRESET = "veryfast"
+DEFAULT_CRF = 23
+# Frames whose gap to the next labeled frame is bigger than this are reached by seeking
+SEEK_THRESHOLD = 64
+# Half size, and at most one minute of video; stride is raised to fit
+DEFAULT_PREVIEW = {"scale": 0.5, "stride": 1, "max_duration": 60}
+PREVIEW_SUFFIX = ".preview"
+
+# BGR colors the tracks cycle through (matplotlib's tab10)
+TRACK_COLORS = [
+    (180, 119, 31), (14, 127, 255), (44, 160, 44), (40, 39, 214), (189, 103, 148),
+    (75, 86, 140), (194, 119, 227), (127, 127, 127), (34, 189, 188), (207, 190, 23),
+]
+UNTRACKED_COLOR = (255, 255, 255)
+
+
+class SourceVideoError(Exception):
+    """The video the predictions were made on can't be found or read"""
+
+
+class RenderCancelled(Exception):
+    """render_video() was stopped through its cancelled callback"""
+
+
+def find_source_video(slp_path, video_paths):
+    """Locate the video of a .slp file: as stored, relative to the .slp, or next to it"""
+    slp_dir = os.path.dirname(os.path.abspath(slp_path))
+    for stored in video_paths:
+        if not stored:
+            continue
+        candidates = [stored, os.path.join(slp_dir, stored),
+                      os.path.join(slp_dir, os.path.basename(stored.replace("\\", "/")))]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+    if not any(video_paths):
+        raise SourceVideoError(f"{os.path.basename(slp_path)} doesn't say which video it was made from")
+    raise SourceVideoError(f"Source video of {os.path.basename(slp_path)} not found: {', '.join(filter(None, video_paths))}")
+
+
+def select_frames(labeled_frames, stride=1, max_duration=None, frame_rate=30):
+    """
+    Frames of a preview: every stride-th labeled frame, with the stride raised
+    so the preview isn't longer than max_duration seconds at frame_rate.
+    """
+    stride = max(1, int(stride))
+    if max_duration:
+        max_frames = max(1, int(max_duration * frame_rate))
+        stride = max(stride, -(-len(labeled_frames) // max_frames))
+    return labeled_frames[::stride]
+
+
+def preview_frames(slp_path, stride=1, max_duration=None, frame_rate=30):
+    """select_frames() for a .slp file, None if its frames can't be read"""
+    try:
+        import h5py
+        with h5py.File(slp_path, "r") as h5:
+            labeled_frames = sorted(int(frame_idx) for frame_idx in h5["frames"]["frame_idx"])
+    except Exception:
+        return None
+    return select_frames(labeled_frames, stride, max_duration, frame_rate)
+
+
+def ffmpeg_path():
+    return shutil.which("ffmpeg")
+
+
+class FrameWriter:
+    """Encodes BGR frames with ffmpeg through a pipe, or with cv2.VideoWriter"""
+
+    def __init__(self, output_path, width, height, frame_rate, video_format="mp4",
+                 encoder="auto", preset=DEFAULT_PRESET, crf=DEFAULT_CRF):
+        import cv2
+
+        self.process = None
+        self.writer = None
+        ffmpeg = ffmpeg_path() if encoder in ("auto", "ffmpeg") else None
+        if encoder == "ffmpeg" and ffmpeg is None:
+            raise RuntimeError("ffmpeg was requested but isn't installed")
+
+        if ffmpeg:
+            cmd = [
+                ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(frame_rate),
+                "-i", "-",
+                "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+                # yuv420p needs even dimensions
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p",
+                "-f", "avi" if video_format == "avi" else "mp4",
+                output_path
+            ]
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*("MJPG" if video_format == "avi" else "mp4v"))
+            self.writer = cv2.VideoWriter(output_path, fourcc, float(frame_rate), (width, height))
+            if not self.writer.isOpened():
+                raise RuntimeError(f"OpenCV could not open a {video_format} writer for {output_path}")
+
+    def write(self, frame):
+        if self.writer is not None:
+            self.writer.write(frame)
+            return
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError):
+            raise RuntimeError(f"ffmpeg failed: {self._ffmpeg_error()}")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {self._ffmpeg_error()}")
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.release()
+            return
+        self.process.kill()
+        self.process.wait()
+
+    def _ffmpeg_error(self):
+        try:
+            self.process.kill()
+            return self.process.stderr.read().decode("utf-8", errors="replace").strip()
+        except (OSError, ValueError):
+            return "unknown error"
+
+
+def _disc_offsets(radius):
+    """(k, 2) pixel offsets (x, y) of a filled disc"""
+    import numpy as np
+
+    span = np.arange(-radius, radius + 1)
+    x, y = np.meshgrid(span, span)
+    inside = x * x + y * y <= radius * radius
+    return np.stack([x[inside], y[inside]], axis=-1)
+
+
+def draw_poses(frame, points, tracks, edges, node_offsets, line_width=2):
+    """
+    Draw the skeletons of one frame in place.
+
+    Args:
+        frame: BGR image
+        points: (instances, nodes, 2) pixel coordinates, NaN for missing nodes
+        tracks: (instances,) track index per instance, -1 if untracked
+        edges: (edges, 2) node index pairs
+        node_offsets: Pixel offsets of a node marker, see _disc_offsets
+    """
+    import cv2
+    import numpy as np
+
+    height, width = frame.shape[:2]
+    for track in np.unique(tracks):
+        color = TRACK_COLORS[track % len(TRACK_COLORS)] if track >= 0 else UNTRACKED_COLOR
+        track_points = points[tracks == track]
+
+        # All edges of all instances of this track in one polylines call
+        if len(edges):
+            segments = track_points[:, edges[:, 0]], track_points[:, edges[:, 1]]
+            segments = np.stack(segments, axis=2).reshape(-1, 2, 2)
+            segments = segments[~np.isnan(segments).any(axis=(1, 2))]
+            if len(segments):
+                cv2.polylines(frame, list(np.round(segments).astype(np.int32)), False, color,
+                              line_width, cv2.LINE_AA)
+
+        # Nodes as filled discs, written straight into the pixel array
+        nodes = track_points.reshape(-1, 2)
+        nodes = np.round(nodes[~np.isnan(nodes).any(axis=1)]).astype(np.int64)
+        if len(nodes):
+            pixels = (nodes[:, None, :] + node_offsets[None, :, :]).reshape(-1, 2)
+            pixels = pixels[(pixels[:, 0] >= 0) & (pixels[:, 0] < width) &
+                            (pixels[:, 1] >= 0) & (pixels[:, 1] < height)]
+            frame[pixels[:, 1], pixels[:, 0]] = color
+
+
+def _iter_frame_poses(h5, metadata, chunk_frames):
+    """Yield (frame_idx, points, tracks) for every frame that has instances, in frame order"""
+    import numpy as np
+
+    for chunk in iter_instance_chunks(h5, metadata, chunk_frames):
+        frame_idx = chunk["frame_idx"]
+        if not len(frame_idx):
+            continue
+        starts = np.flatnonzero(np.r_[True, frame_idx[1:] != frame_idx[:-1]])
+        ends = np.r_[starts[1:], len(frame_idx)]
+        for start, end in zip(starts, ends):
+            yield int(frame_idx[start]), chunk["points"][start:end], chunk["track"][start:end]
+
+
+def render_video(slp_path, output_path, frame_rate, video_format="mp4", encoder="auto",
+                 preset=DEFAULT_PRESET, crf=DEFAULT_CRF, scale=1.0, stride=1, max_duration=None,
+                 chunk_frames=2000, progress=None, cancelled=None):
+    """
+    Render the predictions of a .slp file on top of its source video.
+
+    Args:
+        slp_path: Predictions
+        output_path: Video to write
+        frame_rate: Frame rate of the output video
+        video_format: "mp4" or "avi"
+        encoder: "ffmpeg", "opencv" or "auto" (ffmpeg if it's installed)
+        preset, crf: libx264 settings when encoding with ffmpeg
+        scale: Size of the output relative to the source video
+        stride, max_duration: Only render some frames, see select_frames()
+        chunk_frames: Frames of predictions read at once, bounds the memory use
+        progress: Optional callable progress(frames_done, total_frames)
+        cancelled: Optional callable, rendering stops with RenderCancelled once it returns True
+
+    Returns:
+        int: number of frames written
+    """
+    import cv2
+    import h5py
+    import numpy as np
+
+    with h5py.File(slp_path, "r") as h5:
+        metadata = read_metadata(h5)
+        check_streamable(h5, metadata)
+        source_video = find_source_video(slp_path, metadata["video_paths"])
+        labeled_frames = select_frames(h5["frames"]["frame_idx"].astype(np.int64), stride, max_duration, frame_rate)
+        total = len(labeled_frames)
+        if total == 0:
+            raise UnsupportedSlpError("No labeled frames to render")
+
+        cap = cv2.VideoCapture(source_video)
+        if not cap.isOpened():
+            raise SourceVideoError(f"Could not open {source_video}")
+        source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        width = max(2, int(round(source_size[0] * scale)))
+        height = max(2, int(round(source_size[1] * scale)))
+
+        edges = np.array(metadata["edges"], dtype=np.int64).reshape(-1, 2)
+        node_offsets = _disc_offsets(max(2, int(round(min(width, height) / 250))))
+        line_width = max(1, int(round(min(width, height) / 400)))
+
+        temp_path = f"{output_path}.part.{video_format}"
+        writer = FrameWriter(temp_path, width, height, frame_rate, video_format, encoder, preset, crf)
+        written = 0
+        try:
+            poses = _iter_frame_poses(h5, metadata, chunk_frames)
+            next_pose = next(poses, None)
+            position = 0  # index of the frame cap.read() returns next
+            for frame_idx in labeled_frames:
+                if cancelled is not None and cancelled():
+                    raise RenderCancelled()
+
+                gap = frame_idx - position
+                if gap > SEEK_THRESHOLD:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+                else:
+                    for _ in range(max(0, gap)):
+                        cap.grab()
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                position = frame_idx + 1
+                if (width, height) != source_size:
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+                while next_pose is not None and next_pose[0] < frame_idx:
+                    next_pose = next(poses, None)
+                if next_pose is not None and next_pose[0] == frame_idx:
+                    points = next_pose[1] * (width / source_size[0], height / source_size[1])
+                    draw_poses(frame, points, next_pose[2], edges, node_offsets, line_width)
+
+                writer.write(frame)
+                written += 1
+                if progress is not None and written % 100 == 0:
+                    progress(written, total)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            cap.release()
+
+    if written < total:
+        # A short source or a corrupt GOP, don't pass a truncated video off as a full render
+        os.remove(temp_path)
+        if written == 0:
+            raise SourceVideoError(f"Could not read any frames from {source_video}")
+        raise SourceVideoError(f"Only {written} of {total} labeled frames could be read from {source_video}")
+    os.replace(temp_path, output_path)
+    if progress is not None:
+        progress(written, total)
+    return written
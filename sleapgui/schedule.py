@@ -0,0 +1,191 @@
+"""
+Ordering of per-video jobs when several of them run at once.
+
+Jobs are started in list order whenever a slot frees up, so a 3-hour video that
+happens to be last keeps one slot busy while all the others sit idle. Sorting
+the jobs longest-first (LPT) avoids that long tail; the makespan of greedy LPT
+is at most 4/3 of the optimum.
+
+Job durations are estimated from the frame count of the video and the frames
+per second measured on earlier runs of the same stage, which are kept in
+~/.sleapgui/throughput.json.
+
+    sleapgui schedule --jobs 4 --stage analyze video1.mp4 video2.mp4 ...
+
+prints the expected makespan of a batch in the given order and with LPT.
+"""
+import os
+import sys
+import json
+import heapq
+import argparse
+import threading
+
+THROUGHPUT_PATH = os.path.join(os.path.expanduser("~"), ".sleapgui", "throughput.json")
+# Guesses until a stage has been measured on this machine, frames per second per job
+DEFAULT_FPS = {"analyze": 40.0, "create_video": 80.0}
+# Weight of the newest measurement
+THROUGHPUT_SMOOTHING = 0.3
+
+JOB_ORDERS = ("longest_first", "user")
+
+_throughput_lock = threading.Lock()
+
+
+def load_throughput(path=THROUGHPUT_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_throughput(stage, frames, seconds, path=THROUGHPUT_PATH):
+    """Fold one finished job (frames processed in seconds, wall clock) into the stage's throughput"""
+    if not stage or not frames or seconds <= 0:
+        return
+    fps = frames / seconds
+    with _throughput_lock:
+        throughput = load_throughput(path)
+        entry = throughput.get(stage)
+        if entry:
+            entry["fps"] = THROUGHPUT_SMOOTHING * fps + (1 - THROUGHPUT_SMOOTHING) * entry["fps"]
+            entry["samples"] += 1
+        else:
+            throughput[stage] = {"fps": fps, "samples": 1}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(throughput, f)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+
+def stage_fps(stage, path=THROUGHPUT_PATH):
+    """Measured frames per second of a stage, or the default guess"""
+    entry = load_throughput(path).get(stage)
+    if entry and entry.get("fps"):
+        return entry["fps"]
+    return DEFAULT_FPS.get(stage, DEFAULT_FPS["analyze"])
+
+
+def estimate_durations(frame_counts, fps):
+    """
+    Seconds per job. Jobs with an unknown frame count get the average of the
+    known ones (or 1 if nothing is known), so they neither jump the queue nor
+    get starved.
+    """
+    known = [count for count in frame_counts if count]
+    fallback = sum(known) / len(known) if known else fps
+    return [(count or fallback) / fps for count in frame_counts]
+
+
+def order_jobs(jobs, durations, job_order="longest_first"):
+    """
+    Args:
+        jobs: Any list
+        durations: Estimated duration of every job
+        job_order: "longest_first" (LPT) or "user" (keep the list order)
+
+    Returns:
+        list: the jobs in the order they should be started. Sorting is stable,
+        equally long jobs keep their user order.
+    """
+    if job_order == "user":
+        return list(jobs)
+    if job_order != "longest_first":
+        raise ValueError(f"Unknown job order {job_order!r}, expected one of {', '.join(JOB_ORDERS)}")
+    indices = sorted(range(len(jobs)), key=lambda index: -durations[index])
+    return [jobs[index] for index in indices]
+
+
+def simulate_makespan(durations, slots):
+    """
+    Simulate a pool that starts the jobs in list order whenever one of `slots` is free.
+
+    Returns:
+        dict with makespan, lower_bound (no schedule can be faster), idle (slot
+        seconds spent waiting for the last job) and the assignment (job indices per slot)
+    """
+    slots = max(1, int(slots))
+    free_at = [(0.0, slot) for slot in range(slots)]
+    heapq.heapify(free_at)
+    assignment = [[] for _ in range(slots)]
+    for index, duration in enumerate(durations):
+        start, slot = heapq.heappop(free_at)
+        assignment[slot].append(index)
+        heapq.heappush(free_at, (start + duration, slot))
+
+    makespan = max(finish for finish, _ in free_at)
+    lower_bound = max([sum(durations) / slots] + list(durations)) if durations else 0.0
+    return {
+        "makespan": makespan,
+        "lower_bound": lower_bound,
+        "idle": makespan * slots - sum(durations),
+        "assignment": assignment,
+    }
+
+
+def main(argv=None):
+    """Entry point of `sleapgui schedule`, prints the expected makespan as JSON"""
+    try:
+        from sleapgui.probe import probe_videos
+    except ModuleNotFoundError:
+        from probe import probe_videos
+
+    parser = argparse.ArgumentParser(prog="sleapgui schedule",
+                                     description="Expected makespan of a batch in user order and longest-first")
+    parser.add_argument("videos", nargs="*", help="Videos of the batch")
+    parser.add_argument("--manifest", help="Take the videos from a batch manifest instead")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of jobs running at the same time")
+    parser.add_argument("--stage", default="analyze", choices=sorted(DEFAULT_FPS))
+    parser.add_argument("--fps", type=float, help="Frames per second per job (default: measured on earlier runs)")
+    parser.add_argument("--frames", type=int, nargs="*",
+                        help="Frame counts instead of videos, e.g. --frames 432000 36000 36000")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code or 0
+
+    if args.frames:
+        labels = [f"job{index}" for index in range(len(args.frames))]
+        frame_counts = args.frames
+    else:
+        video_paths = list(args.videos)
+        if args.manifest:
+            try:
+                from sleapgui.batch import load_manifest, ManifestError
+            except ModuleNotFoundError:
+                from batch import load_manifest, ManifestError
+            try:
+                video_paths += load_manifest(args.manifest)["video_paths"]
+            except ManifestError as e:
+                print(json.dumps({"event": "error", "message": str(e)}))
+                return 2
+        if not video_paths:
+            parser.print_usage()
+            return 2
+        metadata = probe_videos(video_paths)
+        labels = video_paths
+        frame_counts = [(metadata.get(path) or {}).get("frame_count") for path in video_paths]
+
+    fps = args.fps or stage_fps(args.stage)
+    durations = estimate_durations(frame_counts, fps)
+    result = {"event": "schedule", "stage": args.stage, "jobs": args.jobs, "fps": fps, "videos": len(labels),
+              "lower_bound": round(simulate_makespan(durations, args.jobs)["lower_bound"], 1)}
+    for job_order in JOB_ORDERS:
+        order = order_jobs(list(range(len(labels))), durations, job_order)
+        simulation = simulate_makespan([durations[index] for index in order], args.jobs)
+        result[job_order] = {
+            "makespan": round(simulation["makespan"], 1),
+            "idle": round(simulation["idle"], 1),
+            "order": [labels[index] for index in order],
+        }
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
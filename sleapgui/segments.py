@@ -0,0 +1,201 @@
+"""
+Segment-parallel tracking of long videos.
+
+A video is split into K overlapping frame ranges that are tracked by separate
+sleap-track processes. merge_segment_files() then stitches the per-segment
+predictions into one .slp: tracks of consecutive segments are matched on the
+frames both segments predicted, and each segment contributes the frames up to
+the middle of its overlap with the next one.
+
+merge_segment_files() imports sleap, so run it in a separate process (see
+export.create_export_pool) rather than in the GUI process.
+"""
+import os
+
+
+def plan_segments(frame_count, segment_count, overlap):
+    """
+    Split frames 0..frame_count-1 into overlapping ranges.
+
+    Returns:
+        list of (start, end) inclusive frame ranges, consecutive ranges share
+        `overlap` frames. Fewer ranges than asked for if the video is too short.
+    """
+    overlap = max(0, int(overlap))
+    # Every segment should be clearly longer than the overlap it shares
+    segment_count = max(1, min(int(segment_count), frame_count // max(1, 2 * overlap)))
+    if segment_count <= 1:
+        return [(0, frame_count - 1)]
+
+    core_length = frame_count / segment_count
+    segments = []
+    for index in range(segment_count):
+        start = int(round(index * core_length))
+        end = int(round((index + 1) * core_length)) - 1
+        if index > 0:
+            start = max(0, start - overlap // 2)
+        if index < segment_count - 1:
+            end = min(frame_count - 1, end + overlap - overlap // 2)
+        segments.append((start, end))
+    return segments
+
+
+def segment_path(slp_output, index):
+    directory, name = os.path.split(slp_output)
+    return os.path.join(directory, f".{os.path.splitext(name)[0]}.segment{index:03d}.slp")
+
+
+def _match_tracks(previous, current, frames, max_distance):
+    """
+    Map tracks of the current segment to merged tracks using the frames both predicted.
+
+    Args:
+        previous: frame_idx -> list of (merged track, points) already in the merged result
+        current: frame_idx -> list of (segment track, points) of the new segment
+        frames: frame indices of the overlap
+        max_distance: Mean distance (pixels) above which two tracks don't match
+
+    Returns:
+        dict: segment track -> merged track
+    """
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
+
+    distance_sums = {}
+    counts = {}
+    for frame_idx in frames:
+        for merged_track, merged_points in previous.get(frame_idx, []):
+            if merged_track is None:
+                continue
+            for track, points in current.get(frame_idx, []):
+                if track is None:
+                    continue
+                distances = np.linalg.norm(merged_points - points, axis=1)
+                if np.all(np.isnan(distances)):
+                    continue
+                pair = (merged_track, track)
+                distance_sums[pair] = distance_sums.get(pair, 0.0) + float(np.nanmean(distances))
+                counts[pair] = counts.get(pair, 0) + 1
+
+    if not counts:
+        return {}
+
+    merged_tracks = sorted({pair[0] for pair in counts}, key=id)
+    tracks = sorted({pair[1] for pair in counts}, key=id)
+    cost = np.full((len(merged_tracks), len(tracks)), 1e9)
+    for (merged_track, track), count in counts.items():
+        cost[merged_tracks.index(merged_track), tracks.index(track)] = distance_sums[(merged_track, track)] / count
+
+    mapping = {}
+    for row, column in zip(*linear_sum_assignment(cost)):
+        if cost[row, column] <= max_distance:
+            mapping[tracks[column]] = merged_tracks[row]
+    return mapping
+
+
+def merge_segment_files(segment_paths, segments, output_path, max_distance=50.0):
+    """
+    Stitch the predictions of overlapping segments into one .slp file.
+
+    Args:
+        segment_paths: .slp file of every segment, in order
+        segments: (start, end) inclusive frame range of every segment
+        output_path: Where to write the merged predictions
+        max_distance: Tracks whose instances are further apart than this (mean
+                      pixels over the overlap) are treated as different animals
+
+    Returns:
+        dict: number of frames and tracks in the merged file, and how many
+        tracks were stitched across segment boundaries
+    """
+    import numpy as np
+    import sleap
+
+    video = None
+    skeleton = None
+    merged_tracks = []
+    track_names = set()
+    # frame_idx -> list of (merged track, points (nodes, 2), point scores, instance score)
+    merged = {}
+    stitched = 0
+
+    def new_track(name, spawned_on):
+        number = len(merged_tracks)
+        candidate = name or f"track_{number}"
+        while candidate in track_names:
+            number += 1
+            candidate = f"track_{number}"
+        track = sleap.Track(spawned_on=spawned_on, name=candidate)
+        track_names.add(candidate)
+        merged_tracks.append(track)
+        return track
+
+    for index, (path, (start, end)) in enumerate(zip(segment_paths, segments)):
+        labels = sleap.load_file(path)
+        if video is None:
+            video = labels.videos[0]
+            skeleton = labels.skeletons[0]
+
+        current = {}
+        for labeled_frame in labels.labeled_frames:
+            if labeled_frame.frame_idx < start or labeled_frame.frame_idx > end:
+                continue
+            current[labeled_frame.frame_idx] = [
+                (instance.track, instance.numpy(), np.asarray(instance.scores), instance.score)
+                for instance in labeled_frame.instances
+                if isinstance(instance, sleap.PredictedInstance)
+            ]
+
+        mapping = {}
+        cut = start
+        if index > 0:
+            previous_end = segments[index - 1][1]
+            overlap_frames = range(start, previous_end + 1)
+            mapping = _match_tracks(
+                {frame_idx: [(entry[0], entry[1]) for entry in merged.get(frame_idx, [])] for frame_idx in overlap_frames},
+                {frame_idx: [(entry[0], entry[1]) for entry in current.get(frame_idx, [])] for frame_idx in overlap_frames},
+                overlap_frames,
+                max_distance
+            )
+            stitched += len(mapping)
+            # The previous segment keeps the first half of the overlap
+            cut = (start + previous_end + 1) // 2
+            for frame_idx in [frame_idx for frame_idx in merged if frame_idx >= cut]:
+                del merged[frame_idx]
+
+        for track in labels.tracks:
+            if track not in mapping:
+                mapping[track] = new_track(track.name if index == 0 else None, track.spawned_on)
+
+        for frame_idx, instances in current.items():
+            if frame_idx < cut:
+                continue
+            merged[frame_idx] = [
+                (mapping.get(track) if track is not None else None, points, scores, score)
+                for track, points, scores, score in instances
+            ]
+
+    labeled_frames = []
+    for frame_idx in sorted(merged):
+        instances = [
+            sleap.PredictedInstance.from_numpy(
+                points=points,
+                point_confidences=scores,
+                instance_score=score,
+                skeleton=skeleton,
+                track=track
+            )
+            for track, points, scores, score in merged[frame_idx]
+        ]
+        labeled_frames.append(sleap.LabeledFrame(video=video, frame_idx=frame_idx, instances=instances))
+
+    # Only keep tracks that ended up with instances
+    used_tracks = {instance.track for labeled_frame in labeled_frames for instance in labeled_frame.instances}
+    tracks = [track for track in merged_tracks if track in used_tracks]
+
+    result = sleap.Labels(labeled_frames=labeled_frames, videos=[video], skeletons=[skeleton], tracks=tracks)
+    temp_path = output_path + ".part.slp"
+    result.save(temp_path)
+    os.replace(temp_path, output_path)
+
+    return {"frames": len(labeled_frames), "tracks": len(tracks), "stitched": stitched}
@@ -0,0 +1,199 @@
+"""
+Read predictions straight from the .slp HDF5 file with h5py/NumPy.
+
+sleap.load_file builds Python objects for every frame, instance and point, which
+takes minutes and gigabytes for hour-long high frame rate recordings. The
+functions here read the datasets in chunks of frames instead, so memory use is
+bounded by the chunk size.
+
+Only the layout written by sleap-track is handled: one video, predicted and
+tracked instances only, frames sorted by frame index. Anything else raises
+UnsupportedSlpError so the caller can fall back to the sleap based path.
+"""
+import json
+
+
+class UnsupportedSlpError(Exception):
+    """The file is valid, but not in the layout this reader handles"""
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _node_name(node_ref, nodes):
+    # Nodes are stored as indices into the top level "nodes" list
+    if isinstance(node_ref, int):
+        return nodes[node_ref]["name"]
+    if isinstance(node_ref, dict) and "py/state" in node_ref:
+        return node_ref["py/state"]["py/tuple"][0]
+    raise UnsupportedSlpError(f"Unknown node reference: {node_ref!r}")
+
+
+def _node_index(node_ref, skeleton_node_refs):
+    for index, ref in enumerate(skeleton_node_refs):
+        if ref == node_ref:
+            return index
+    raise UnsupportedSlpError(f"Edge references unknown node: {node_ref!r}")
+
+
+def _edge_type(link):
+    # EdgeType is pickled as {"py/reduce": [{"py/type": ...}, {"py/tuple": [1]}]}
+    edge_type = link.get("type")
+    if isinstance(edge_type, dict) and "py/reduce" in edge_type:
+        try:
+            return int(edge_type["py/reduce"][1]["py/tuple"][0])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return 1
+    return 1
+
+
+def read_metadata(h5):
+    """
+    Skeleton, tracks and videos of an open .slp file.
+
+    Returns:
+        dict with format_id, node_names, edges (list of (src, dst) node indices,
+        body edges only), track_names and video_paths
+    """
+    if "metadata" not in h5 or "frames" not in h5 or "instances" not in h5:
+        raise UnsupportedSlpError("Missing metadata/frames/instances datasets")
+
+    attrs = h5["metadata"].attrs
+    format_id = float(attrs.get("format_id", 1.0))
+    if format_id < 1.1:
+        # Older files use a different pixel coordinate convention
+        raise UnsupportedSlpError(f"Unsupported format_id {format_id}")
+
+    metadata = json.loads(_decode(attrs["json"]))
+    if len(metadata.get("skeletons", [])) != 1:
+        raise UnsupportedSlpError("Expected exactly one skeleton")
+    skeleton = metadata["skeletons"][0]
+    nodes = metadata.get("nodes", [])
+
+    skeleton_node_refs = [node["id"] for node in skeleton["nodes"]]
+    node_names = [_node_name(ref, nodes) for ref in skeleton_node_refs]
+
+    edges = []
+    for link in skeleton.get("links", []):
+        if _edge_type(link) != 1:
+            continue
+        edges.append((_node_index(link["source"], skeleton_node_refs),
+                      _node_index(link["target"], skeleton_node_refs)))
+
+    track_names = []
+    if "tracks_json" in h5:
+        for track_json in h5["tracks_json"][:]:
+            track_names.append(json.loads(_decode(track_json))[1])
+
+    video_paths = []
+    if "videos_json" in h5:
+        for video_json in h5["videos_json"][:]:
+            video = json.loads(_decode(video_json))
+            video_paths.append(video.get("backend", {}).get("filename"))
+
+    return {
+        "format_id": format_id,
+        "node_names": node_names,
+        "edges": edges,
+        "track_names": track_names,
+        "video_paths": video_paths,
+    }
+
+
+def check_streamable(h5, metadata):
+    """Raise UnsupportedSlpError if the file isn't in the layout written by sleap-track"""
+    import numpy as np
+
+    frames = h5["frames"]
+    instances = h5["instances"]
+    if len(frames) == 0:
+        return
+
+    if np.any(frames["video"] != 0):
+        raise UnsupportedSlpError("More than one video")
+    if np.any(np.diff(frames["frame_idx"].astype(np.int64)) <= 0):
+        raise UnsupportedSlpError("Frames are not sorted by frame index")
+
+    starts = frames["instance_id_start"]
+    ends = frames["instance_id_end"]
+    if starts[0] != 0 or np.any(starts[1:] != ends[:-1]) or ends[-1] != len(instances):
+        raise UnsupportedSlpError("Instances are not stored contiguously")
+
+    if np.any(instances["instance_type"] != 1):
+        raise UnsupportedSlpError("File contains user-labeled instances")
+    tracks = instances["track"]
+    if len(tracks) and (tracks.min() < 0 or tracks.max() >= len(metadata["track_names"])):
+        raise UnsupportedSlpError("File contains untracked instances")
+
+    n_nodes = len(metadata["node_names"])
+    point_starts = instances["point_id_start"]
+    point_ends = instances["point_id_end"]
+    if np.any(point_ends - point_starts != n_nodes) or np.any(point_starts[1:] != point_ends[:-1]):
+        raise UnsupportedSlpError("Points are not stored contiguously")
+
+
+def iter_instance_chunks(h5, metadata, chunk_frames=20000):
+    """
+    Yield predicted instances in chunks of frames, sorted by (frame_idx, track).
+
+    If a frame has several instances with the same track, only the last one is
+    kept, like sleap's own analysis export does.
+
+    Yields:
+        dict with frame_idx (n,), track (n,), score (n,), points (n, nodes, 2)
+        and point_scores (n, nodes)
+    """
+    import numpy as np
+
+    frames = h5["frames"]
+    instances = h5["instances"]
+    pred_points = h5["pred_points"]
+    n_nodes = len(metadata["node_names"])
+
+    for frame_start in range(0, len(frames), chunk_frames):
+        frame_chunk = frames[frame_start:frame_start + chunk_frames]
+        instance_start = int(frame_chunk["instance_id_start"][0])
+        instance_end = int(frame_chunk["instance_id_end"][-1])
+        if instance_end <= instance_start:
+            continue
+
+        instance_chunk = instances[instance_start:instance_end]
+        counts = (frame_chunk["instance_id_end"] - frame_chunk["instance_id_start"]).astype(np.int64)
+        frame_idx = np.repeat(frame_chunk["frame_idx"].astype(np.int64), counts)
+        track = instance_chunk["track"].astype(np.int64)
+
+        point_start = int(instance_chunk["point_id_start"][0])
+        point_end = int(instance_chunk["point_id_end"][-1])
+        point_chunk = pred_points[point_start:point_end]
+
+        points = np.stack([point_chunk["x"], point_chunk["y"]], axis=-1).astype(np.float64)
+        points[~point_chunk["visible"].astype(bool)] = np.nan
+        points = points.reshape(-1, n_nodes, 2)
+        point_scores = point_chunk["score"].astype(np.float64).reshape(-1, n_nodes)
+        score = instance_chunk["score"].astype(np.float64)
+
+        # Sort by frame, then track, keeping the original order for duplicates
+        order = np.lexsort((np.arange(len(track)), track, frame_idx))
+        frame_idx, track = frame_idx[order], track[order]
+        last_of_group = np.ones(len(order), dtype=bool)
+        last_of_group[:-1] = (frame_idx[1:] != frame_idx[:-1]) | (track[1:] != track[:-1])
+        order = order[last_of_group]
+
+        yield {
+            "frame_idx": frame_idx[last_of_group],
+            "track": track[last_of_group],
+            "score": score[order],
+            "points": points[order],
+            "point_scores": point_scores[order],
+        }
+
+
+def labeled_frame_count(slp_path):
+    """Number of labeled frames in a .slp file without loading it, None if it can't be read"""
+    try:
+        import h5py
+        with h5py.File(slp_path, "r") as h5:
+            return len(h5["frames"]) if "frames" in h5 else None
+    except Exception:
+        return None
@@ -0,0 +1,1151 @@
+"""
+The analyze / save_csv / create_video tasks, without any Qt.
+
+TaskRunner reports through Emitter objects that mimic Qt signals (connect/emit),
+so the same code runs inside the GUI's Worker thread and in the headless batch
+runner. With a Tracer in params "tracer" (tracing.py) the child processes, exports
+and in-process renders of a task are added to the batch trace.
+"""
+import os
+import time
+import threading
+import traceback
+import contextlib
+import concurrent.futures
+
+try:
+    from sleapgui.export import export_slp, export_slp_traced, create_export_pool, default_export_jobs, EXPORT_FORMATS
+    from sleapgui.inference_server import get_inference_server
+    from sleapgui.utils import (build_track_args, build_track_command, get_video_frame_count,
+                                get_kf_node_indices, segment_thread_env)
+    from sleapgui.progress import ProgressTracker, format_eta
+    from sleapgui.procmon import ProcessMonitor
+    from sleapgui.cache import analysis_key, derived_key, manifest_for
+    from sleapgui.schedule import order_jobs, estimate_durations, record_throughput, stage_fps
+    from sleapgui.governor import ResourceGovernor, thread_job_rss
+    from sleapgui.render import (render_video, preview_frames, SourceVideoError, RenderCancelled,
+                                 DEFAULT_PRESET, DEFAULT_CRF, DEFAULT_PREVIEW, PREVIEW_SUFFIX)
+    from sleapgui.artifacts import ArtifactIndex
+except ModuleNotFoundError:
+    from export import export_slp, export_slp_traced, create_export_pool, default_export_jobs, EXPORT_FORMATS
+    from inference_server import get_inference_server
+    from utils import (build_track_args, build_track_command, get_video_frame_count,
+                       get_kf_node_indices, segment_thread_env)
+    from progress import ProgressTracker, format_eta
+    from procmon import ProcessMonitor
+    from cache import analysis_key, derived_key, manifest_for
+    from schedule import order_jobs, estimate_durations, record_throughput, stage_fps
+    from governor import ResourceGovernor, thread_job_rss
+    from render import (render_video, preview_frames, SourceVideoError, RenderCancelled,
+                        DEFAULT_PRESET, DEFAULT_CRF, DEFAULT_PREVIEW, PREVIEW_SUFFIX)
+    from artifacts import ArtifactIndex
+
+def default_render_jobs():
+    """Default number of sleap-render processes to run at once (half the cores)"""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+class Emitter:
+    """Minimal stand-in for a Qt Signal: callbacks run in the emitting thread"""
+
+    def __init__(self):
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def connect(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def emit(self, *args):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(*args)
+
+class TaskRunner:
+    """
+    Runs one task ("analyze", "save_csv" or "create_video") with the given params.
+
+    Emitters (same arguments as the Worker signals):
+        progress(int), message(str), finished(bool, str),
+        file_finished(str, bool, str), stats(dict)
+    """
+    
+    def __init__(self, task, params):
+        self.task = task
+        self.params = params
+        self.progress = Emitter()
+        self.message = Emitter()
+        self.finished = Emitter()
+        # Per-file result of a conversion: (source path, success, output path or error)
+        self.file_finished = Emitter()
+        # Frame-based progress snapshot: frames done/total, fps, ETA, ... (see progress.py)
+        self.stats = Emitter()
+        self._monitor = None  # ProcessMonitor of the running task, if any
+        self.cancel_requested = False
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested
+
+    @cancel_requested.setter
+    def cancel_requested(self, value):
+        self._cancel_requested = value
+        # Wake up the monitor loop so the cancel is handled right away
+        monitor = self._monitor
+        if value and monitor is not None:
+            monitor.wakeup()
+        
+    def run(self):
+        try:
+            if self.task == "analyze":
+                self.analyze_data()
+            elif self.task == "create_video":
+                self.create_video()
+            elif self.task == "save_csv":
+                self.save_csv()
+            else:
+                self.finished.emit(False, f"Unknown task: {self.task}")
+        except Exception as e:
+            import traceback
+            self.message.emit(f"Error: {str(e)}")
+            self.message.emit(traceback.format_exc())
+            self.finished.emit(False, str(e))
+   
+    def analyze_data(self):
+        try:
+            model_path = self.params["model_path"]
+            output_dirs = self.params["output_dirs"]  # Now a list of directories
+            base_name = self.params["base_name"]
+            video_paths = self.params["video_paths"]
+            mode = self.params["mode"]
+            warm_inference = self.params.get("warm_inference", False)
+            # Split every video into this many overlapping frame ranges tracked in parallel
+            segment_count = max(1, int(self.params.get("segments") or 1))
+            segment_overlap = int(self.params.get("segment_overlap", 200))
+            track_args = build_track_args(model_path, mode)
+            # Stitched segments aren't identical to a single run, keep them apart in the cache
+            key_args = list(track_args)
+            if segment_count > 1:
+                key_args += [f"segments={segment_count}", f"segment_overlap={segment_overlap}"]
+            
+            # Check if we have matching number of videos and output dirs
+            if len(output_dirs) != len(video_paths):
+                self.message.emit(f"Warning: Number of output directories ({len(output_dirs)}) doesn't match number of videos ({len(video_paths)})")
+                # Either use the first directory for all videos or repeat the last directory
+                if len(output_dirs) < len(video_paths):
+                    output_dirs = output_dirs + [output_dirs[-1]] * (len(video_paths) - len(output_dirs))
+                else:
+                    output_dirs = output_dirs[:len(video_paths)]
+            
+            # Frame counts turn the sleap-track progress output into percent and ETA
+            frame_counts = self.params.get("frame_counts") or [get_video_frame_count(path) for path in video_paths]
+            
+            # Process each video with its corresponding output directory
+            for i, (video_path, output_dir) in enumerate(zip(video_paths, output_dirs)):
+                base_progress = int((i / len(video_paths)) * 100)
+                video_weight = 100 / len(video_paths)
+                self.progress.emit(int(base_progress + 0.05 * video_weight))
+
+                # Check for cancellation request
+                if self.cancel_requested:
+                    self.message.emit("Analysis cancelled by user")
+                    self.finished.emit(False, "Operation cancelled")
+                    return
+                
+                self.message.emit(f"Processing video {i+1}/{len(video_paths)}: {os.path.basename(video_path)}")
+                self.message.emit(f"Output directory: {output_dir}")
+                
+                # Make sure output directory exists
+                os.makedirs(output_dir, exist_ok=True)
+                
+                slp_output = os.path.join(output_dir, f"{base_name}.slp")
+                process_description = f"Analyzing video {i+1}/{len(video_paths)}"
+
+                # Skip the video if its .slp was made from the same video, model and settings
+                cache_key = self.__cache_key(analysis_key, video_path, model_path, key_args, get_kf_node_indices(mode))
+                if self.__is_cached(slp_output, cache_key):
+                    self.message.emit(f"Skipping analysis, {os.path.basename(slp_output)} is up to date")
+                    self.__record_artifact("slp", slp_output, video_path=video_path)
+                    continue
+
+                handled = False
+                if segment_count > 1:
+                    handled, success, error = self.__analyze_segmented(
+                        model_path=model_path,
+                        mode=mode,
+                        video_path=video_path,
+                        slp_output=slp_output,
+                        frame_count=frame_counts[i],
+                        segment_count=segment_count,
+                        segment_overlap=segment_overlap,
+                        process_description=process_description,
+                        base_progress=base_progress,
+                        progress_weight=video_weight
+                    )
+
+                # Try the warm inference server first, it keeps the model loaded
+                if not handled and warm_inference:
+                    handled, success, error = self.__analyze_with_server(
+                        track_args=track_args,
+                        video_path=video_path,
+                        slp_output=slp_output,
+                        process_description=process_description,
+                        max_wait_time=86400,
+                        update_interval=5
+                    )
+
+                if not handled:
+                    cmd = build_track_command(model_path, mode, slp_output, video_path)
+                    
+                    def calc_progress(elapsed):
+                        return min(95, elapsed / 60)
+
+                    later_counts = frame_counts[i + 1:]
+                    stats_info = {
+                        "task": "analyze",
+                        "video_path": video_path,
+                        "video_index": i,
+                        "video_count": len(video_paths),
+                        "frames_after": None if None in later_counts else sum(later_counts),
+                    }
+
+                    success, error = self.__monitor_process(
+                        cmd=cmd,
+                        max_wait_time=86400,  # 2 hours
+                        update_interval=5,
+                        process_description=process_description,
+                        base_progress=base_progress,
+                        progress_weight=video_weight,
+                        progress_calc_func=calc_progress,
+                        progress_tracker=ProgressTracker(frame_counts[i]),
+                        stats_info=stats_info
+                    )
+
+                # Check for errors
+                if not success:
+                    self.finished.emit(False, f"Error processing video {i+1}: {os.path.basename(video_path)}\n{error}")
+                    return
+
+                self.__record_cache(slp_output, cache_key)
+                self.__record_artifact("slp", slp_output, video_path=video_path)
+            
+            self.progress.emit(100)
+            
+            if len(video_paths) == 1:
+                self.finished.emit(True, "Analysis completed successfully!")
+            else:
+                self.finished.emit(True, f"Analysis completed successfully for {len(video_paths)} videos!")
+
+        except Exception as e:
+            import traceback
+            self.message.emit(f"Error: {str(e)}")
+            self.message.emit(traceback.format_exc())
+            self.finished.emit(False, str(e))
+
+    def create_video(self):
+        # slpio and segments need numpy, they're imported by the tasks that use them
+        # so that opening the window doesn't load it (benchmarks/startup_time.py)
+        try:
+            from sleapgui.slpio import labeled_frame_count
+        except ModuleNotFoundError:
+            from slpio import labeled_frame_count
+        try:
+            output_dirs = self.params["output_dirs"]
+            slp_files = self.params.get("slp_files", [])
+            frame_rate = self.params["frame_rate"]
+            video_format = self.params.get("video_format", "mp4")
+            render_jobs = self.params.get("render_jobs") or default_render_jobs()
+            job_order = self.params.get("job_order", "longest_first")
+            # "native" draws the videos in this process (render.py), "sleap-render" always shells out
+            renderer = self.params.get("renderer", "native")
+            encoder = self.params.get("encoder", "auto")
+            preset = self.params.get("preset", DEFAULT_PRESET)
+            crf = self.params.get("crf", DEFAULT_CRF)
+            # Quick look: True or a dict with scale/stride/max_duration, written as <name>.preview.<format>
+            preview = self.params.get("preview")
+            if preview:
+                preview = dict(DEFAULT_PREVIEW, **(preview if isinstance(preview, dict) else {}))
+            
+            # If no specific slp files provided, take the ones of the videos, or all in the directories
+            if not slp_files:
+                slp_files = [slp_path for slp_path in self.__find_slp_files(output_dirs) if slp_path]
+            
+            self.message.emit(f"Creating videos for {len(slp_files)} .slp files across {len(output_dirs)} directories")
+
+            jobs = []
+            for slp_path in slp_files:
+                # Create video path by replacing .slp extension with chosen format
+                video_path = os.path.splitext(slp_path)[0] + f"{PREVIEW_SUFFIX if preview else ''}.{video_format}"
+
+                cache_key = self.__cache_key(derived_key, "create_video", slp_path,
+                                             frame_rate=frame_rate, video_format=video_format,
+                                             renderer=renderer, encoder=encoder, preset=preset, crf=crf,
+                                             preview=preview or None)
+                if self.__is_cached(video_path, cache_key):
+                    self.message.emit(f"Skipping {os.path.basename(video_path)}, it is up to date")
+                    self.__record_artifact("preview" if preview else "render", video_path, slp_path=slp_path)
+                    continue
+
+                cmd = [
+                    "sleap-render",
+                    "-o", video_path,
+                    "-f", str(frame_rate),
+                    slp_path
+                ]
+                total_frames = labeled_frame_count(slp_path)
+                if preview:
+                    # Only used if the built-in renderer can't handle the file
+                    frames = preview_frames(slp_path, preview["stride"], preview["max_duration"], frame_rate)
+                    cmd[-1:-1] = ["--scale", str(preview["scale"])]
+                    if frames:
+                        cmd[-1:-1] = ["--frames", ",".join(map(str, frames))]
+                        total_frames = len(frames)
+                jobs.append({
+                    "label": os.path.basename(video_path),
+                    "cmd": cmd,
+                    "slp_path": slp_path,
+                    "video_path": video_path,
+                    "total_frames": total_frames,
+                    "on_success": lambda path=video_path, key=cache_key, slp=slp_path: (
+                        self.__record_cache(path, key),
+                        self.__record_artifact("preview" if preview else "render", path, slp_path=slp)
+                    )
+                })
+
+            render_jobs = max(1, min(render_jobs, len(jobs)))
+            if render_jobs > 1:
+                self.message.emit(f"Rendering up to {render_jobs} videos in parallel")
+                # Start the longest renders first so no slot is left with a long tail at the end
+                durations = estimate_durations([job["total_frames"] for job in jobs], stage_fps("create_video"))
+                jobs = order_jobs(jobs, durations, job_order)
+
+            if renderer == "native":
+                jobs, success, error = self.__render_native(jobs, render_jobs, frame_rate, video_format,
+                                                            encoder, preset, crf, preview or {})
+                if not success:
+                    self.finished.emit(False, error)
+                    return
+                if jobs:
+                    self.message.emit(f"Rendering {len(jobs)} video(s) with sleap-render")
+
+            success, error = self.__run_process_pool(
+                jobs=jobs,
+                max_parallel=render_jobs,
+                max_wait_time=7200,  # 2 hours per video
+                update_interval=5,
+                process_description="Rendering video"
+            )
+
+            if not success:
+                self.finished.emit(False, error)
+                return
+                
+            self.progress.emit(100)
+            
+            if len(slp_files) == 1:
+                self.finished.emit(True, "Video created successfully!")
+            else:
+                self.finished.emit(True, f"All {len(slp_files)} videos created successfully!")
+                
+        except Exception as e:
+            self.message.emit(f"Error: {str(e)}")
+            self.message.emit(traceback.format_exc())
+            self.finished.emit(False, str(e))
+
+    def save_csv(self):
+        try:
+            output_dirs = self.params["output_dirs"]
+            slp_files = self.params.get("slp_files", [])
+            video_paths = self.params["video_paths"]
+            base_name = self.params["base_name"]
+            
+            # If no specific slp files provided, look up the .slp of every video. Zipping
+            # the videos with whatever .slp files a listing returned paired a video with
+            # another session's .slp as soon as a folder held more than one.
+            if slp_files:
+                pairs = list(zip(video_paths, slp_files))
+            else:
+                pairs = []
+                for video_path, slp_path in zip(video_paths, self.__find_slp_files(output_dirs)):
+                    if slp_path:
+                        pairs.append((video_path, slp_path))
+                    else:
+                        self.message.emit(f"Skipping {os.path.basename(video_path)}, it has no {base_name}.slp yet")
+                slp_files = [slp_path for _, slp_path in pairs]
+            
+            export_jobs = self.params.get("export_jobs") or default_export_jobs()
+            # "native" reads the HDF5 datasets directly, "sleap" always uses CSVAdaptor
+            exporter = self.params.get("csv_exporter", "native")
+            export_format = self.params.get("export_format", "csv")
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError(f"Unknown export format: {export_format}")
+            format_label = export_format.upper()
+            
+            self.message.emit(f"Converting {len(slp_files)} .slp files to {format_label}")
+            
+            conversions = []
+            cache_keys = {}
+            for video_path, slp_path in pairs:
+                slp_dir = os.path.dirname(slp_path)
+                video_base =  os.path.splitext(os.path.basename(video_path))[0]
+                
+                csv_name = f"{base_name}.000_{video_base}{EXPORT_FORMATS[export_format]}"
+                csv_name = csv_name.replace('__', '_').replace('_.', '.').replace('..', '.')
+                csv_path = os.path.join(slp_dir, csv_name)
+
+                cache_keys[csv_path] = self.__cache_key(derived_key, "save_csv", slp_path,
+                                                        exporter=exporter, export_format=export_format)
+                if self.__is_cached(csv_path, cache_keys[csv_path]):
+                    self.message.emit(f"Skipping {csv_name}, it is up to date")
+                    self.__record_artifact("export", csv_path, slp_path=slp_path)
+                    continue
+                conversions.append((slp_path, csv_path))
+            
+            if not conversions:
+                self.progress.emit(100)
+                self.finished.emit(True, f"All {format_label} files are up to date")
+                return
+            
+            # Conversions run in separate processes, this thread only waits for results
+            # so the GUI stays responsive and the work scales with the number of cores
+            export_jobs = max(1, min(export_jobs, len(conversions)))
+            pool = create_export_pool(export_jobs)
+            tracer = self.params.get("tracer")
+            try:
+                futures = {}
+                for slp_path, csv_path in conversions:
+                    self.message.emit(f"Converting {os.path.basename(slp_path)} to {format_label}...")
+                    export_func = export_slp if tracer is None else export_slp_traced
+                    futures[pool.submit(export_func, slp_path, csv_path, export_format, exporter)] = (slp_path, csv_path)
+                
+                done_count = 0
+                not_done = set(futures)
+                while not_done:
+                    if self.cancel_requested:
+                        for future in not_done:
+                            future.cancel()
+                        self.message.emit(f"{format_label} export cancelled by user")
+                        self.finished.emit(False, "Operation cancelled")
+                        return
+                    
+                    done, not_done = concurrent.futures.wait(
+                        not_done, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        slp_path, csv_path = futures[future]
+                        done_count += 1
+                        try:
+                            result = future.result()
+                            note = result[1]
+                            if tracer is not None:
+                                self.__trace_export(tracer, result[2], result[3], slp_path)
+                            if note:
+                                self.message.emit(f"{os.path.basename(slp_path)}: {note}, used sleap's CSV export")
+                            self.__record_cache(csv_path, cache_keys[csv_path])
+                            self.__record_artifact("export", csv_path, slp_path=slp_path)
+                            self.message.emit(f"Saved {format_label}: {os.path.basename(csv_path)}")
+                            self.file_finished.emit(slp_path, True, csv_path)
+                        except Exception as e:
+                            # Continue with other files
+                            self.message.emit(f"Error converting {slp_path}: {str(e)}")
+                            self.file_finished.emit(slp_path, False, str(e))
+                        self.progress.emit(int(done_count / len(conversions) * 100))
+            finally:
+                pool.shutdown(wait=not self.cancel_requested)
+            
+            self.progress.emit(100)
+            self.finished.emit(True, f"Converted {len(slp_files)} files to {format_label} format")
+            
+        except Exception as e:
+            import traceback
+            self.message.emit(f"Error: {str(e)}")
+            self.message.emit(traceback.format_exc())
+            self.finished.emit(False, str(e))
+    
+    def __span(self, name, **args):
+        """Context manager timing a part of the task for the batch trace, if there is one"""
+        tracer = self.params.get("tracer")
+        if tracer is None:
+            return contextlib.nullcontext()
+        return tracer.span(name, self.task, **args)
+
+    def __trace_export(self, tracer, spans, pid, slp_path):
+        """Add the spans an export pool process sent back, on that process' row"""
+        tracer.name_process(pid, "export pool")
+        for name, start, end in spans:
+            tracer.add(name, start, end, self.task, pid=pid, tid=0, args={"file": os.path.basename(slp_path)})
+
+    def __governor(self, max_parallel):
+        """
+        ResourceGovernor for a pool of max_parallel jobs (governor.py), None if it
+        doesn't apply. params "governor" is a dict of limits, or False to start up to
+        max_parallel jobs blindly.
+        """
+        governor_limits = self.params.get("governor")
+        if governor_limits is False or max_parallel <= 1:
+            return None
+        return ResourceGovernor(governor_limits or None)
+
+    def __render_native(self, jobs, max_parallel, frame_rate, video_format, encoder, preset, crf, preview):
+        """
+        Render the jobs with the built-in renderer, max_parallel at a time in threads
+        (OpenCV releases the GIL while decoding/encoding). preview holds the
+        scale/stride/max_duration of a preview render, {} for a full render.
+
+        Like the process pool, another render only starts while the governor sees
+        memory/CPU to spare, and the youngest one is stopped and retried later when
+        memory runs out.
+
+        Returns:
+            tuple: (jobs that need sleap-render instead, success, error_message)
+        """
+        try:
+            from sleapgui.slpio import UnsupportedSlpError
+        except ModuleNotFoundError:
+            from slpio import UnsupportedSlpError
+        trackers = {job["label"]: ProgressTracker(job["total_frames"]) for job in jobs}
+        frame_totals = [job["total_frames"] for job in jobs]
+        total_frames = sum(frame_totals) if frame_totals and None not in frame_totals else None
+        fallback = []
+        # Set when one render fails, the others stop too
+        failed = threading.Event()
+        # Set for a render that is stopped to free memory, label -> Event
+        backed_off = {job["label"]: threading.Event() for job in jobs}
+        governor = self.__governor(max_parallel)
+        next_admission_check = 0
+        waiting_reason = None
+
+        def render(job):
+            tracker = trackers[job["label"]]
+            started = time.time()
+
+            def on_progress(frames_done, frames_total):
+                tracker.update(frames_done, frames_total)
+                self.__emit_stats(tracker, {"task": "create_video", "label": job["label"]})
+                if total_frames:
+                    done = sum(min(t.frames_done, t.total_frames or 0) for t in trackers.values())
+                    self.progress.emit(int(min(done / total_frames, 1) * 100))
+
+            with self.__span("render", job=job["label"]):
+                frames = render_video(job["slp_path"], job["video_path"], frame_rate, video_format,
+                                      encoder=encoder, preset=preset, crf=crf, scale=preview.get("scale", 1.0),
+                                      stride=preview.get("stride", 1), max_duration=preview.get("max_duration"),
+                                      progress=on_progress,
+                                      cancelled=lambda: (self.cancel_requested or failed.is_set()
+                                                         or backed_off[job["label"]].is_set()))
+            if not preview:
+                record_throughput("create_video", frames, time.time() - started)
+            return frames
+
+        self.progress.emit(0)
+        pending = list(jobs)
+        running = {}  # future -> (job, start time)
+        error = ""
+        completed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            while pending or running:
+                # Keep the pool full, the renders share this process so they're measured together
+                while pending and len(running) < max_parallel and not failed.is_set() and not self.cancel_requested:
+                    if governor is not None and running:
+                        if time.time() < next_admission_check:
+                            break
+                        admitted, reason = governor.admit_thread_job(len(running), thread_job_rss(len(running)))
+                        if not admitted:
+                            next_admission_check = time.time() + 2
+                            if waiting_reason is None:
+                                self.message.emit(f"Waiting to start {pending[0]['label']}: {reason}")
+                            waiting_reason = reason
+                            break
+                        self.message.emit(f"Starting {pending[0]['label']} with {len(running)} running: {reason}")
+                        waiting_reason = None
+                    job = pending.pop(0)
+                    running[pool.submit(render, job)] = (job, time.time())
+
+                # Out of memory soon: stop the youngest render and run it again later
+                if (governor is not None and len(running) > 1 and not any(event.is_set() for event in backed_off.values())
+                        and governor.should_back_off(list(running))):
+                    youngest, _ = max(running.values(), key=lambda item: item[1])
+                    self.message.emit(f"Memory is running out, stopping {youngest['label']} and retrying it later")
+                    backed_off[youngest["label"]].set()
+
+                done, _ = concurrent.futures.wait(running, timeout=2, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    job, _ = running.pop(future)
+                    try:
+                        frames = future.result()
+                    except (UnsupportedSlpError, SourceVideoError) as e:
+                        self.message.emit(f"{job['label']}: built-in renderer not used ({str(e)})")
+                        fallback.append(job)
+                        continue
+                    except RenderCancelled:
+                        if backed_off[job["label"]].is_set() and not self.cancel_requested and not failed.is_set():
+                            backed_off[job["label"]].clear()
+                            trackers[job["label"]] = ProgressTracker(job["total_frames"])
+                            pending.insert(0, job)
+                        continue
+                    except Exception as e:
+                        if not error:
+                            error = f"Error rendering {job['label']}\n{str(e)}"
+                            failed.set()
+                        continue
+                    completed += 1
+                    trackers[job["label"]].frames_done = trackers[job["label"]].total_frames or frames
+                    job["on_success"]()
+                    self.message.emit(f"Successfully created video: {job['label']} ({frames} frames)")
+                    if not total_frames:
+                        self.progress.emit(int(completed / len(jobs) * 100))
+
+                # Nothing left to start once a render failed or the user cancelled
+                if (failed.is_set() or self.cancel_requested) and not running:
+                    break
+
+        if error:
+            self.message.emit(error)
+            return [], False, error
+        if self.cancel_requested:
+            self.message.emit("Rendering video cancelled by user")
+            return [], False, "Operation cancelled"
+        return fallback, True, ""
+
+    def __analyze_segmented(self, model_path, mode, video_path, slp_output, frame_count,
+                            segment_count, segment_overlap, process_description,
+                            base_progress, progress_weight):
+        """
+        Track overlapping frame ranges of one video in parallel sleap-track processes
+        and stitch them into slp_output.
+        
+        Args:
+            frame_count: Number of frames of the video, segmenting is skipped if unknown
+            segment_count: Number of segments (and parallel processes)
+            segment_overlap: Frames shared by consecutive segments, used to match tracks
+            
+        Returns:
+            tuple: (handled, success, error_message), handled is False if the video
+                   should be tracked in one piece instead
+        """
+        try:
+            from sleapgui.segments import plan_segments, segment_path, merge_segment_files
+        except ModuleNotFoundError:
+            from segments import plan_segments, segment_path, merge_segment_files
+        if not frame_count:
+            self.message.emit("Frame count unknown, tracking the video in one piece")
+            return False, False, ""
+        segments = plan_segments(frame_count, segment_count, segment_overlap)
+        if len(segments) < 2:
+            self.message.emit("Video is too short to split, tracking it in one piece")
+            return False, False, ""
+        
+        self.message.emit(f"Tracking {len(segments)} segments in parallel ({segment_overlap} frames overlap)")
+        segment_paths = [segment_path(slp_output, index) for index in range(len(segments))]
+        env = segment_thread_env(len(segments))
+        jobs = []
+        for index, (frames, path) in enumerate(zip(segments, segment_paths)):
+            jobs.append({
+                "label": f"segment {index+1}/{len(segments)} (frames {frames[0]}-{frames[1]})",
+                "cmd": build_track_command(model_path, mode, path, video_path, frames=frames),
+                "total_frames": frames[1] - frames[0] + 1,
+                "env": env,
+            })
+        
+        try:
+            success, error = self.__run_process_pool(
+                jobs=jobs,
+                max_parallel=len(jobs),
+                max_wait_time=86400,
+                update_interval=5,
+                process_description=process_description,
+                success_description="Finished",
+                stats_info={"task": "analyze", "video_path": video_path},
+                base_progress=base_progress,
+                progress_weight=progress_weight * 0.9,
+                # A segment is a short run that shares the machine with the other segments,
+                # its fps would skew the whole-video "analyze" throughput the job ordering uses
+                throughput_key="analyze_segment"
+            )
+            if not success:
+                return True, False, error
+            
+            # Merging loads the predictions with sleap, keep that out of this process
+            self.message.emit("Stitching segments...")
+            pool = create_export_pool(1)
+            try:
+                with self.__span("stitch", video=os.path.basename(video_path)):
+                    future = pool.submit(merge_segment_files, segment_paths, segments, slp_output)
+                    while True:
+                        if self.cancel_requested:
+                            future.cancel()
+                            self.message.emit(f"{process_description} cancelled by user")
+                            return True, False, "Operation cancelled"
+                        try:
+                            summary = future.result(timeout=0.5)
+                            break
+                        except concurrent.futures.TimeoutError:
+                            continue
+            finally:
+                pool.shutdown(wait=not self.cancel_requested)
+            
+            self.message.emit(f"Stitched {len(segments)} segments: {summary['frames']} frames, "
+                              f"{summary['tracks']} tracks ({summary['stitched']} matched across segments)")
+            self.progress.emit(int(base_progress + progress_weight))
+            return True, True, ""
+        except Exception as e:
+            return True, False, f"Could not stitch segments: {str(e)}"
+        finally:
+            for path in segment_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def __analyze_with_server(self, track_args, video_path, slp_output, process_description,
+                              max_wait_time, update_interval):
+        """
+        Run one video through the warm inference server.
+        
+        Args:
+            track_args: sleap-track model/tracker options, identifies the server to use
+            video_path: Video to analyze
+            slp_output: Where to write the predictions
+            process_description: Description for status messages
+            max_wait_time: Maximum seconds to wait for the video before timeout
+            update_interval: How often to update status (seconds)
+            
+        Returns:
+            tuple: (handled (bool), success (bool), error_message (str)). handled is False
+            if the server is unusable and the video should go through sleap-track instead.
+        """
+        server = get_inference_server(track_args)
+        if server.failed:
+            return False, False, ""
+
+        with server.lock:
+            try:
+                if not server.is_alive():
+                    self.message.emit("Starting inference server (the model is loaded once and reused)...")
+                    server.start()
+                server.submit(video_path, slp_output)
+            except Exception as e:
+                self.message.emit(f"Could not use inference server, falling back to sleap-track: {str(e)}")
+                server.stop()
+                return False, False, ""
+
+            start_time = time.time()
+            last_update = 0
+            last_progress_message = None
+
+            while True:
+                if self.cancel_requested:
+                    # predict() can't be interrupted, so the server has to go
+                    server.stop()
+                    self.message.emit(f"{process_description} cancelled by user")
+                    return True, False, "Operation cancelled"
+
+                try:
+                    reply = server.poll(0.5)
+                except (EOFError, OSError):
+                    reply = None
+                    server.stop()
+
+                if reply is None:
+                    if not server.is_alive():
+                        self.message.emit("Inference server stopped unexpectedly, falling back to sleap-track")
+                        server.stop()
+                        return False, False, ""
+
+                    current_time = time.time()
+                    elapsed = int(current_time - start_time)
+                    if elapsed > max_wait_time:
+                        server.stop()
+                        timeout_msg = f"{process_description} timed out"
+                        self.message.emit(timeout_msg)
+                        return True, False, timeout_msg
+
+                    if current_time - last_update >= update_interval:
+                        minutes, seconds = divmod(elapsed, 60)
+                        progress_message = f"{process_description} (inference server)... (Elapsed time: {minutes:02d}:{seconds:02d})"
+                        if last_progress_message is None:
+                            self.message.emit(progress_message)
+                        else:
+                            self.message.emit(f"UPDATE_LAST_LINE:{progress_message}")
+                        last_progress_message = progress_message
+                        last_update = current_time
+                    continue
+
+                status = reply.get("status")
+                tracer = self.params.get("tracer")
+                if status == "ready":
+                    server.ready = True
+                    self.message.emit("Inference server ready, model loaded")
+                    if tracer is not None:
+                        tracer.add("model_load", start_time, time.time(), self.task)
+                elif status == "done":
+                    if tracer is not None:
+                        tracer.add("inference_server", start_time, time.time(), self.task,
+                                   args={"video": os.path.basename(video_path)})
+                    return True, True, ""
+                elif status == "error":
+                    self.message.emit(f"[ERROR] {reply.get('error', '')}")
+                    if reply.get("fatal"):
+                        # Don't try to start it again for every video
+                        server.failed = True
+                        server.stop()
+                    self.message.emit("Inference server could not process the video, falling back to sleap-track")
+                    return False, False, ""
+
+    def __record_artifact(self, kind, path, video_path=None, slp_path=None):
+        """Add an output to the batch's artifact index (params "artifacts"), if there is one"""
+        artifacts = self.params.get("artifacts")
+        if artifacts is None:
+            return
+        if video_path is not None:
+            artifacts.record(video_path, kind, path)
+        else:
+            artifacts.record_for_slp(slp_path, kind, path)
+
+    def __find_slp_files(self, output_dirs):
+        """
+        .slp files to work on when the caller didn't list them: the expected
+        <base_name>.slp of every video if the videos are known, else every .slp
+        in the output directories. Each directory is listed once (artifacts.py).
+        """
+        video_paths = self.params.get("video_paths")
+        base_name = self.params.get("base_name")
+        artifacts = self.params.get("artifacts")
+        if video_paths and base_name and len(video_paths) == len(output_dirs):
+            if artifacts is None:
+                artifacts = ArtifactIndex()
+            positions = [artifacts.add_video(video_path, output_dir)
+                         for video_path, output_dir in zip(video_paths, output_dirs)]
+            artifacts.discover(base_name)
+            return [artifacts.get(position, "slp") for position in positions]
+
+        artifacts = artifacts or ArtifactIndex()
+        slp_files = []
+        for output_dir in output_dirs:
+            slp_files.extend(artifacts.directory_slp_files(output_dir))
+        return slp_files
+
+    def __cache_key(self, key_func, *args, **kwargs):
+        """Compute a skip cache key, None if the inputs can't be fingerprinted"""
+        try:
+            return key_func(*args, **kwargs)
+        except OSError as e:
+            self.message.emit(f"Warning: could not fingerprint inputs for the cache: {str(e)}")
+            return None
+
+    def __is_cached(self, output_path, cache_key):
+        """True if output_path is up to date and the user didn't ask to force a re-run"""
+        if cache_key is None or self.params.get("force", False):
+            return False
+        return manifest_for(output_path).is_up_to_date(output_path, cache_key)
+
+    def __record_cache(self, output_path, cache_key):
+        if cache_key is None or not os.path.exists(output_path):
+            return
+        try:
+            manifest_for(output_path).record(output_path, cache_key)
+        except OSError as e:
+            self.message.emit(f"Warning: could not update cache manifest: {str(e)}")
+
+    def __emit_stats(self, tracker, stats_info=None, min_interval=0.5):
+        """Emit a structured progress snapshot, at most every min_interval seconds"""
+        now = time.time()
+        if now - tracker.last_reported < min_interval:
+            return
+        tracker.last_reported = now
+
+        stats = dict(stats_info or {})
+        stats.update(tracker.snapshot())
+
+        # Frames of the videos after this one in the same task, None if unknown
+        frames_after = stats.get("frames_after")
+        remaining = tracker.frames_remaining()
+        if remaining is not None and frames_after is not None and tracker.fps_smoothed:
+            stats["batch_eta"] = (remaining + frames_after) / tracker.fps_smoothed
+        else:
+            stats["batch_eta"] = None
+        self.stats.emit(stats)
+
+    def __monitor_process(self, cmd, max_wait_time, update_interval, 
+                   process_description, start_time=None, base_progress=0, progress_weight=100,
+                   progress_calc_func=None, progress_tracker=None, stats_info=None):
+        """
+        Run a subprocess with output capture, progress updates, and timeout handling.
+        
+        Args:
+            cmd: Command line of the process to run
+            max_wait_time: Maximum seconds to allow process to run before timeout
+            update_interval: How often to update status (seconds)
+            process_description: Description for status messages (e.g., "Analyzing video")
+            start_time: Time the timeout and elapsed time are measured from (default: now)
+            base_progress: Starting progress percentage
+            progress_weight: Weight of this process in overall progress calculation
+            progress_calc_func: Function to calculate progress (takes elapsed time, returns percentage)
+            progress_tracker: Optional ProgressTracker fed with the process output. Once it
+                              knows frames done/total it replaces progress_calc_func.
+            stats_info: Extra fields (task, video, ...) for the structured stats signal
+            
+        Returns:
+            tuple: (success (bool), error_message (str))
+        """
+        if start_time is None:
+            start_time = time.time()
+
+        stderr_data = []
+        last_update = 0
+        last_progress_message = None
+
+        def handle_line(line, stream):
+            if progress_tracker is not None:
+                is_progress, updated = progress_tracker.parse_line(line)
+                if updated:
+                    percent = progress_tracker.percent()
+                    if percent is not None:
+                        self.progress.emit(int(base_progress + (min(percent, 99) / 100) * progress_weight))
+                    self.__emit_stats(progress_tracker, stats_info)
+                if is_progress:
+                    # JSON progress lines go to the stats signal, not the log
+                    return
+            if stream == "stderr":
+                stderr_data.append(line)
+                self.message.emit(f"[ERROR] {line}")
+            else:
+                self.message.emit(f"[OUTPUT] {line}")
+
+        self.progress.emit(base_progress)
+
+        monitor = ProcessMonitor(self.params.get("tracer"), self.task)
+        self._monitor = monitor
+        try:
+            process = monitor.spawn(process_description, cmd)
+            
+            while monitor.running():
+                if self.cancel_requested:
+                    monitor.terminate_all()
+                    self.message.emit(f"{process_description} cancelled by user")
+                    return False, "Operation cancelled"
+                
+                # Sleep until there's output, the process exits, or the next status update / timeout is due
+                current_time = time.time()
+                next_wakeup = min(last_update + update_interval, start_time + max_wait_time)
+                for event in monitor.wait(max(0, next_wakeup - current_time)):
+                    if event.kind == "line":
+                        handle_line(event.data, event.stream)
+                
+                current_time = time.time()
+                elapsed = int(current_time - start_time)
+                
+                # Check for timeout
+                if monitor.running() and elapsed > max_wait_time:
+                    monitor.terminate_all(grace_period=2)
+                    timeout_msg = f"{process_description} timed out"
+                    self.message.emit(timeout_msg)
+                    return False, timeout_msg
+                
+                # Update message and progress periodically
+                if monitor.running() and current_time - last_update >= update_interval:
+                    minutes, seconds = divmod(elapsed, 60)
+                    time_str = f"{minutes:02d}:{seconds:02d}"
+                    progress_message = f"{process_description}... (Elapsed time: {time_str})"
+                    if progress_tracker is not None and progress_tracker.percent() is not None:
+                        progress_message = (f"{process_description}... {progress_tracker.percent():.1f}% "
+                                            f"(Elapsed time: {time_str}, ETA: {format_eta(progress_tracker.eta())})")
+                    
+                    # If this is a new progress message, send it normally
+                    if last_progress_message is None:
+                        self.message.emit(progress_message)
+                    else:
+                        # For updates, send a special signal
+                        self.message.emit(f"UPDATE_LAST_LINE:{progress_message}")
+                    
+                    last_progress_message = progress_message
+                    
+                    # Calculate progress, unless real frame counts are coming in
+                    if progress_calc_func and (progress_tracker is None or progress_tracker.percent() is None):
+                        progress_pct = progress_calc_func(elapsed)
+                        scaled_progress = int(base_progress + (progress_pct / 100) * progress_weight)
+                        self.progress.emit(scaled_progress)
+                    
+                    last_update = current_time
+        finally:
+            self._monitor = None
+            monitor.close()
+        
+        # Check for errors
+        if process.returncode != 0:
+            error_message = "\n".join(stderr_data)
+            self.message.emit(f"Error during {process_description.lower()}: {error_message}")
+            return False, error_message
+        
+        # Measured throughput feeds the job ordering of later batches (schedule.py)
+        if progress_tracker is not None and stats_info:
+            record_throughput(stats_info.get("task"), progress_tracker.total_frames or progress_tracker.frames_done,
+                              time.time() - start_time)
+        return True, ""
+
+    def __run_process_pool(self, jobs, max_parallel, max_wait_time, update_interval,
+                           process_description, success_description="Successfully created video",
+                           stats_info=None, base_progress=0, progress_weight=100, throughput_key=None):
+        """
+        Run several commands with at most max_parallel of them in flight at once.
+        Output of every process is forwarded to the log, prefixed with the job label.
+        
+        Args:
+            jobs: List of dicts with "label" (log prefix), "cmd" (argument list) and
+                  optionally "total_frames" for frame-based stats/progress, "env"
+                  (extra environment variables) and an "on_success" callback
+            max_parallel: Maximum number of processes running at the same time
+            max_wait_time: Maximum seconds a single process may run before timeout
+            update_interval: How often to update status (seconds)
+            process_description: Description for status messages (e.g., "Rendering video")
+            success_description: Logged with the label when a job succeeds
+            stats_info: Extra fields for the stats signal (defaults to the create_video task)
+            base_progress: Progress value to start from (0-100)
+            progress_weight: How much of the total progress this pool represents
+            throughput_key: Name the jobs' throughput is recorded under (schedule.py),
+                            defaults to the stats task
+            
+        Returns:
+            tuple: (success (bool), error_message (str))
+        """
+        pending = list(jobs)
+        jobs_by_label = {job["label"]: job for job in jobs}
+        start_times = {}  # label -> start time of running jobs
+        stderr_data = {job["label"]: [] for job in jobs}
+        completed = 0
+        total = len(jobs)
+        last_update = 0
+        last_progress_message = None
+
+        # sleap-render/sleap-track report frames done and fps, one tracker per job
+        trackers = {job["label"]: ProgressTracker(job.get("total_frames")) for job in jobs}
+        stats_info = stats_info or {"task": "create_video"}
+        throughput_key = throughput_key or stats_info.get("task")
+        # With known frame counts, progress follows the frames instead of finished jobs
+        frame_totals = [job.get("total_frames") for job in jobs]
+        total_frames = sum(frame_totals) if frame_totals and None not in frame_totals else None
+
+        # Only start another process while the machine has memory/CPU to spare (governor.py)
+        governor = self.__governor(max_parallel)
+        next_admission_check = 0
+        waiting_reason = None
+        backed_off = set()
+
+        def running_pids():
+            return [monitor.children[label].process.pid for label in start_times]
+
+        def emit_progress():
+            if total_frames:
+                done = sum(min(tracker.frames_done, tracker.total_frames or 0) for tracker in trackers.values())
+                fraction = done / total_frames
+            else:
+                fraction = completed / total if total else 1
+            self.progress.emit(int(base_progress + min(fraction, 1) * progress_weight))
+
+        def handle_line(label, stream, line):
+            is_progress, updated = trackers[label].parse_line(line)
+            if updated:
+                self.__emit_stats(trackers[label], dict(stats_info, label=label))
+                if total_frames:
+                    emit_progress()
+            if is_progress:
+                return
+            if stream == "stderr":
+                stderr_data[label].append(line)
+                self.message.emit(f"[{label}] [ERROR] {line}")
+            else:
+                self.message.emit(f"[{label}] [OUTPUT] {line}")
+
+        self.progress.emit(base_progress)
+
+        monitor = ProcessMonitor(self.params.get("tracer"), self.task)
+        self._monitor = monitor
+        try:
+            while pending or start_times:
+                if self.cancel_requested:
+                    monitor.terminate_all()
+                    self.message.emit(f"{process_description} cancelled by user")
+                    return False, "Operation cancelled"
+
+                # Keep the pool full
+                while pending and len(start_times) < max_parallel:
+                    if governor is not None and start_times:
+                        if time.time() < next_admission_check:
+                            break
+                        admitted, reason = governor.admit(running_pids())
+                        if not admitted:
+                            next_admission_check = time.time() + 2
+                            if waiting_reason is None:
+                                self.message.emit(f"Waiting to start {pending[0]['label']}: {reason}")
+                            waiting_reason = reason
+                            break
+                        self.message.emit(f"Starting {pending[0]['label']} with {len(start_times)} running: {reason}")
+                        waiting_reason = None
+                    job = pending.pop(0)
+                    self.message.emit(f"{process_description} {completed + len(start_times) + 1}/{total}: {job['label']}")
+                    env = dict(os.environ, **job["env"]) if job.get("env") else None
+                    monitor.spawn(job["label"], job["cmd"], env=env)
+                    start_times[job["label"]] = time.time()
+
+                # Out of memory soon: stop the youngest process and run it again later
+                if governor is not None and len(start_times) > 1 and not backed_off and governor.should_back_off(running_pids()):
+                    youngest = max(start_times, key=start_times.get)
+                    self.message.emit(f"Memory is running out, stopping {youngest} and retrying it later")
+                    backed_off.add(youngest)
+                    monitor.terminate(youngest)
+
+                # Sleep until there's output, a process exits, or a status update / timeout is due
+                current_time = time.time()
+                next_wakeup = min([last_update + update_interval] +
+                                  [started + max_wait_time for started in start_times.values()] +
+                                  ([next_admission_check] if waiting_reason is not None else []))
+                for event in monitor.wait(max(0, next_wakeup - current_time)):
+                    if event.kind == "line":
+                        handle_line(event.key, event.stream, event.data)
+                        continue
+
+                    # A process exited
+                    label = event.key
+                    started = start_times.pop(label)
+                    if label in backed_off:
+                        backed_off.discard(label)
+                        pending.insert(0, jobs_by_label[label])
+                        trackers[label] = ProgressTracker(jobs_by_label[label].get("total_frames"))
+                        stderr_data[label] = []
+                        continue
+                    if event.data != 0:
+                        monitor.terminate_all()
+                        error_message = "\n".join(stderr_data[label])
+                        self.message.emit(f"Error during {process_description.lower()} {label}: {error_message}")
+                        return False, f"Error processing {label}\n{error_message}"
+
+                    completed += 1
+                    trackers[label].frames_done = trackers[label].total_frames or trackers[label].frames_done
+                    record_throughput(throughput_key, trackers[label].frames_done, time.time() - started)
+                    self.message.emit(f"{success_description}: {label}")
+                    if jobs_by_label[label].get("on_success"):
+                        jobs_by_label[label]["on_success"]()
+                    # Aggregate progress over all jobs
+                    emit_progress()
+
+                # Check for timeouts
+                current_time = time.time()
+                for label, started in start_times.items():
+                    if current_time - started > max_wait_time:
+                        monitor.terminate_all()
+                        timeout_msg = f"{process_description} timed out: {label}"
+                        self.message.emit(timeout_msg)
+                        return False, timeout_msg
+
+                # Update message periodically
+                if current_time - last_update >= update_interval:
+                    progress_message = (f"{process_description}... {completed}/{total} done, "
+                                        f"{len(start_times)} running, {len(pending)} queued")
+                    if last_progress_message is None:
+                        self.message.emit(progress_message)
+                    else:
+                        self.message.emit(f"UPDATE_LAST_LINE:{progress_message}")
+                    last_progress_message = progress_message
+                    last_update = current_time
+        finally:
+            self._monitor = None
+            monitor.close()
+
+        return True, ""
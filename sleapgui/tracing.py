@@ -0,0 +1,200 @@
+"""
+Timing spans of a batch, saved in Chrome's trace-event format.
+
+A Tracer collects complete ("X") events: the workflow steps of ModelGUI / the
+batch runner, the child processes of every step (spawn, startup until their
+first output, run until exit) and the load/write phases of the exports, which
+happen in the export pool and are sent back with the result. save() writes
+
+    batch_*.trace.json    open in chrome://tracing or https://ui.perfetto.dev
+    batch_*.summary.txt   time per stage, to find the bottleneck without a viewer
+
+Timestamps are wall clock (time.time()), so spans of different processes line
+up. Child processes get their own row, labelled with the job.
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+
+TRACE_DIR = os.path.join(os.path.expanduser("~"), ".sleapgui", "traces")
+
+
+def default_trace_path(directory=TRACE_DIR):
+    """A new trace file name in directory, for batches without a journal"""
+    return os.path.join(directory, time.strftime("batch_%Y%m%d_%H%M%S") + f"_{os.getpid()}.trace.json")
+
+
+def trace_path_for(journal_path):
+    """Where the trace of a journal's batch is kept"""
+    return os.path.splitext(journal_path)[0] + ".trace.json"
+
+
+def summary_path(trace_path):
+    """The summary table that is written next to a trace"""
+    if trace_path.endswith(".trace.json"):
+        return trace_path[:-len(".trace.json")] + ".summary.txt"
+    return os.path.splitext(trace_path)[0] + ".summary.txt"
+
+
+def _micros(seconds):
+    return int(round(seconds * 1e6))
+
+
+class Tracer:
+    """Thread-safe collection of spans, shared by the workers of one batch"""
+
+    # Row of the workflow steps in this process
+    WORKFLOW_TID = 0
+
+    def __init__(self, name="sleapgui"):
+        self.pid = os.getpid()
+        self.events = []
+        self._open = {}  # key -> (name, category, start, tid, args) of begin() spans
+        self._named = set()
+        self._rows = {}
+        self._lock = threading.Lock()
+        self.name_process(self.pid, name)
+        self.name_thread(self.pid, self.WORKFLOW_TID, "workflow")
+
+    def add(self, name, start, end, category="stage", pid=None, tid=None, args=None):
+        """A finished span from start to end (time.time() seconds)"""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": _micros(start),
+            "dur": max(0, _micros(end) - _micros(start)),
+            "pid": self.pid if pid is None else pid,
+            "tid": threading.get_ident() if tid is None else tid,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def instant(self, name, when=None, category="stage", pid=None, tid=None, args=None):
+        """A point in time, e.g. a process exit"""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": _micros(time.time() if when is None else when),
+            "pid": self.pid if pid is None else pid,
+            "tid": threading.get_ident() if tid is None else tid,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, category="stage", pid=None, tid=None, **args):
+        """Time the body of a with block"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time(), category, pid, tid, args)
+
+    def begin(self, key, name, category="stage", tid=None, **args):
+        """Start a span that is ended from somewhere else (e.g. a finished signal)"""
+        with self._lock:
+            self._open[key] = (name, category, time.time(), self.WORKFLOW_TID if tid is None else tid, args)
+
+    def end(self, key, **args):
+        """End a span started with begin(), unknown keys are ignored"""
+        with self._lock:
+            opened = self._open.pop(key, None)
+        if opened is None:
+            return
+        name, category, start, tid, begin_args = opened
+        self.add(name, start, time.time(), category, tid=tid, args=dict(begin_args, **args))
+
+    def row(self, name):
+        """tid of a named row in this process, e.g. one per workflow stage"""
+        with self._lock:
+            tid = self._rows.setdefault(name, len(self._rows) + 1)
+        self.name_thread(self.pid, tid, name)
+        return tid
+
+    def name_process(self, pid, name):
+        self._metadata("process_name", pid, 0, name)
+
+    def name_thread(self, pid, tid, name):
+        self._metadata("thread_name", pid, tid, name)
+
+    def _metadata(self, kind, pid, tid, name):
+        with self._lock:
+            if (kind, pid, tid) in self._named:
+                return
+            self._named.add((kind, pid, tid))
+            self.events.append({"name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+
+    def summary(self):
+        """
+        Time per (category, span name).
+
+        Returns:
+            list: dicts with category, name, count, total, mean and max (seconds) and
+            share (total / wall time of the batch, can exceed 1 for parallel spans),
+            largest total first
+        """
+        with self._lock:
+            spans = [event for event in self.events if event["ph"] == "X"]
+        if not spans:
+            return []
+        wall = (max(event["ts"] + event["dur"] for event in spans) - min(event["ts"] for event in spans)) / 1e6
+
+        rows = {}
+        for event in spans:
+            row = rows.setdefault((event["cat"], event["name"]), {
+                "category": event["cat"], "name": event["name"], "count": 0, "total": 0.0, "max": 0.0
+            })
+            seconds = event["dur"] / 1e6
+            row["count"] += 1
+            row["total"] += seconds
+            row["max"] = max(row["max"], seconds)
+        for row in rows.values():
+            row["mean"] = row["total"] / row["count"]
+            row["share"] = row["total"] / wall if wall else 0.0
+        return sorted(rows.values(), key=lambda row: row["total"], reverse=True)
+
+    def format_summary(self):
+        """The summary as a plain text table"""
+        rows = self.summary()
+        if not rows:
+            return "No spans recorded"
+        lines = [f"{'stage':<14} {'span':<16} {'count':>6} {'total s':>10} {'mean s':>9} {'max s':>9} {'% wall':>7}"]
+        for row in rows:
+            lines.append(f"{row['category']:<14} {row['name']:<16} {row['count']:>6} {row['total']:>10.3f} "
+                         f"{row['mean']:>9.3f} {row['max']:>9.3f} {row['share'] * 100:>6.1f}%")
+        return "\n".join(lines)
+
+    def save(self, path):
+        """
+        Write the trace and the summary table next to it. Spans that are still
+        open end now, marked unfinished.
+
+        Returns:
+            str: the summary table
+        """
+        with self._lock:
+            keys = list(self._open)
+        for key in keys:
+            self.end(key, unfinished=True)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            document = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        temp_path = path + ".part"
+        with open(temp_path, 'w') as f:
+            json.dump(document, f)
+        os.replace(temp_path, path)
+
+        table = self.format_summary()
+        with open(summary_path(path), 'w') as f:
+            f.write(table + "\n")
+        return table
@@ -1,48 +1,78 @@
 # look ik this file violates SDLC principles but it's just a bunch of utility functions
-import cv2, os
+# cv2 is imported inside the functions that need it, it's slow to import and not needed at startup
+import os
+
+try:
+    from sleapgui.probe import video_metadata
+except ModuleNotFoundError:
+    from probe import video_metadata
 
 def get_video_framerate(log, video_path):
-    """Get the frame rate of a video file using OpenCV"""
+    """Get the frame rate of a video file (cached, see probe.py)"""
     try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return 30  # Default value if can't open
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-        
-        if fps <= 0 or fps > 1000:  # Sanity check
-            return 30
-        
+        fps = video_metadata(video_path)["fps"]
+        if not fps:
+            return 30  # Default value if can't open or insane
         return int(round(fps))
     except Exception as e:
         log(f"Warning: Could not get frame rate from video, using default. Error: {str(e)}")
         return 30  # Default value if something goes wrong
 
+def get_video_frame_count(video_path):
+    """Get the number of frames in a video file (cached, see probe.py), None if unknown"""
+    try:
+        return video_metadata(video_path)["frame_count"]
+    except Exception:
+        return None
+
 def set_app_icon(window):
+    """Set the window icon from the copy bundled with the package (no download at startup)"""
     try:
         from qtpy.QtGui import QIcon
-        icon_url = "https://raw.githubusercontent.com/khicken/sleapGUI/main/assets/sleapgui.ico"
-        icon_path = os.path.join(os.path.expanduser("~"), ".sleapgui", "icon.ico")
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(icon_path), exist_ok=True)
-        
-        # Download icon if needed
+        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "sleapgui.ico")
         if not os.path.exists(icon_path):
-            try:
-                # Try requests first
-                import requests
-                response = requests.get(icon_url)
-                with open(icon_path, 'wb') as f:
-                    f.write(response.content)
-            except:
-                # Fall back to urllib
-                import urllib.request
-                urllib.request.urlretrieve(icon_url, icon_path)
+            # Older installs downloaded the icon here
+            icon_path = os.path.join(os.path.expanduser("~"), ".sleapgui", "icon.ico")
         
-        # Set the icon
         if os.path.exists(icon_path):
             window.setWindowIcon(QIcon(icon_path))
     except Exception as e:
-        window.log(f"Could not set application icon: {str(e)}")
\ No newline at end of file
+        # Called before the log widget exists
+        print(f"Could not set application icon: {str(e)}")
+
+def get_kf_node_indices(mode):
+    """Node indices used by the Kalman filter for the given analysis mode"""
+    if mode == "face":
+        return "0,1,2,3,4,5,6,7,8,9,10,11"
+    elif mode == "face_social":
+        return "0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17"
+    else:  # pupil
+        return "0,1,2,3"
+
+def build_track_args(model_path, mode):
+    """sleap-track options shared by every video (model and tracker settings)"""
+    return [
+        "-m", model_path,
+        "--tracking.tracker", "flow",
+        "--tracking.similarity", "centroid",
+        "--tracking.match", "greedy",
+        "--tracking.kf_node_indices", get_kf_node_indices(mode),
+        # One JSON object per progress update, parsed by the worker for frame-based progress
+        "--verbosity", "json",
+    ]
+
+def build_track_command(model_path, mode, slp_output, video_path, frames=None):
+    """Full sleap-track command line for one video, frames is an optional inclusive (start, end) range"""
+    cmd = ["sleap-track"] + build_track_args(model_path, mode) + ["-o", slp_output]
+    if frames is not None:
+        cmd += ["--frames", f"{frames[0]}-{frames[1]}"]
+    return cmd + [video_path]
+
+def segment_thread_env(segment_count):
+    """Environment that splits the CPU cores between segment_count parallel sleap-track processes"""
+    threads = str(max(1, (os.cpu_count() or 1) // max(1, segment_count)))
+    return {
+        "OMP_NUM_THREADS": threads,
+        "TF_NUM_INTRAOP_THREADS": threads,
+        "TF_NUM_INTEROP_THREADS": "1",
+    }
@@ -0,0 +1,339 @@
+"""
+Watch a drop folder and process new recordings as they arrive.
+
+Acquisition rigs write videos into a folder all day. FolderWatcher notices new
+files (inotify on Linux, a directory scan every few seconds elsewhere or when
+inotify isn't available, e.g. on some network mounts) and hands a video on
+only once its size and mtime haven't changed for `settle` seconds, so a
+recording that is still being written is never analyzed half-way.
+
+    sleapgui watch /data/rig1 --manifest settings.json [--output-dir DIR] [--settle 30]
+
+runs the analyze -> save_csv -> create_video workflow of `sleapgui batch` on
+every video that shows up. The manifest holds the batch settings (model, mode,
+base_name, ...), its "videos" are optional. Each video gets its own output
+directory, <output dir>/<video name>/, because the .slp is always called
+<base_name>.slp. Progress is written as JSON lines like `sleapgui batch`, and
+--metrics-listen / --metrics-textfile export Prometheus metrics over all the
+batches of the session (metrics.py).
+
+The GUI has the same thing behind "Watch Folder...".
+"""
+import os
+import sys
+import time
+import queue
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import threading
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+# Seconds a file's size must stay the same before it counts as complete
+DEFAULT_SETTLE = 10.0
+# Seconds between directory scans without inotify
+DEFAULT_POLL_INTERVAL = 5.0
+# Seconds between the safety-net scans when inotify is used
+RESCAN_INTERVAL = 60.0
+
+# From <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_EVENT = struct.Struct("iIII")
+
+
+def watch_output_dir(video_path, output_root):
+    """Output directory of a watched video: <output_root>/<video name without extension>"""
+    return os.path.join(output_root, os.path.splitext(os.path.basename(video_path))[0])
+
+
+class Inotify:
+    """Minimal inotify binding (ctypes), raises OSError where it isn't available"""
+
+    def __init__(self, directory):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not supported by this libc")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Could not watch {directory} with inotify")
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            list of file names that changed, or None if the kernel dropped events
+            (queue overflow) and the directory has to be scanned again
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _IN_EVENT.size <= len(data):
+            _, mask, _, length = _IN_EVENT.unpack_from(data, offset)
+            offset += _IN_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return None
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FolderWatcher:
+    """Calls on_ready(path) once for every video in a folder whose size has settled"""
+
+    def __init__(self, directory, on_ready, settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 include_existing=True, ignore=None, use_inotify=True, on_message=None):
+        """
+        Args:
+            directory: Folder to watch (not recursive, outputs in subfolders aren't picked up)
+            on_ready: Called from the watching thread with the path of each complete video
+            settle: Seconds the size/mtime must stay the same
+            poll_interval: Seconds between directory scans
+            include_existing: Also hand on the videos that are there when watching starts
+            ignore: Optional callable(name), True for files that aren't recordings,
+                    e.g. rendered videos written into the same folder
+            use_inotify: False always polls
+            on_message: Optional callable(str) for status messages
+        """
+        self.directory = directory
+        self.on_ready = on_ready
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.include_existing = include_existing
+        self.ignore = ignore
+        self.use_inotify = use_inotify
+        self.on_message = on_message or (lambda message: None)
+        # name -> (size, mtime, time the size was first seen like this)
+        self.pending = {}
+        # Names that were handed on (or existed at start and aren't wanted)
+        self.seen = set()
+        self.stop_event = threading.Event()
+        self.inotify = None
+        self.backend = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def start(self):
+        """Set up inotify (or polling) and take stock of the folder, run() does this if needed"""
+        if not os.path.isdir(self.directory):
+            raise OSError(f"Not a directory: {self.directory}")
+        if self.use_inotify:
+            try:
+                self.inotify = Inotify(self.directory)
+            except OSError as e:
+                self.on_message(f"inotify not available ({str(e)}), checking the folder every {self.poll_interval:g} s")
+        self.backend = "inotify" if self.inotify is not None else "polling"
+
+        names = self.scan()
+        if not self.include_existing:
+            self.seen.update(names)
+        self.add_candidates(names)
+
+    def run(self):
+        """Watch until stop() is called"""
+        if self.backend is None:
+            self.start()
+        inotify = self.inotify
+        # With inotify the scan is only a safety net for what it can't see (writes from
+        # other machines to a network mount)
+        rescan_interval = self.poll_interval if inotify is None else max(self.poll_interval, RESCAN_INTERVAL)
+        last_scan = time.time()
+
+        try:
+            while not self.stop_event.is_set():
+                # Wake up often while something is settling, it should be handed on promptly
+                timeout = min(1.0, self.settle / 4) if self.pending else self.poll_interval
+                if inotify is not None:
+                    names = inotify.read(timeout)
+                    if names is None:
+                        names = self.scan()
+                    self.add_candidates(names)
+                else:
+                    self.stop_event.wait(timeout)
+
+                if time.time() - last_scan >= rescan_interval:
+                    self.add_candidates(self.scan())
+                    last_scan = time.time()
+                self.check_pending()
+        finally:
+            if inotify is not None:
+                inotify.close()
+                self.inotify = None
+
+    def scan(self):
+        """Names of the candidate videos in the folder, one os.scandir"""
+        names = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.is_file() and self.is_candidate(entry.name):
+                        names.append(entry.name)
+        except OSError as e:
+            self.on_message(f"Could not read {self.directory}: {str(e)}")
+        return names
+
+    def is_candidate(self, name):
+        if name.startswith(".") or os.path.splitext(name)[1].lower() not in VIDEO_EXTENSIONS:
+            return False
+        return not (self.ignore is not None and self.ignore(name))
+
+    def add_candidates(self, names):
+        for name in names:
+            if name not in self.seen and name not in self.pending and self.is_candidate(name):
+                self.pending[name] = None
+
+    def check_pending(self):
+        """Hand on the pending videos whose size and mtime have been stable for `settle` seconds"""
+        now = time.time()
+        for name in list(self.pending):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or renamed before it was complete
+                del self.pending[name]
+                continue
+            state = self.pending[name]
+            if state is None or state[:2] != (stat.st_size, stat.st_mtime):
+                self.pending[name] = (stat.st_size, stat.st_mtime, now)
+                continue
+            if stat.st_size > 0 and now - state[2] >= self.settle:
+                del self.pending[name]
+                self.seen.add(name)
+                self.on_ready(path)
+
+
+def main(argv=None):
+    """Entry point of `sleapgui watch`, returns the exit code"""
+    try:
+        from sleapgui.batch import load_manifest, ManifestError, BatchRunner, JsonLinesReporter, EXIT_INTERRUPTED
+        from sleapgui.metrics import BatchMetrics, add_metrics_arguments, start_exporters
+    except ModuleNotFoundError:
+        from batch import load_manifest, ManifestError, BatchRunner, JsonLinesReporter, EXIT_INTERRUPTED
+        from metrics import BatchMetrics, add_metrics_arguments, start_exporters
+
+    parser = argparse.ArgumentParser(prog="sleapgui watch",
+                                     description="Run the analyze/CSV/render workflow on every video dropped into a folder")
+    parser.add_argument("folder", help="Folder the rig writes its recordings to")
+    parser.add_argument("--manifest", required=True, help="Batch settings (see `sleapgui batch`), videos are optional")
+    parser.add_argument("--output-dir", help="Where the per-video output folders go (default: the watched folder)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help=f"Seconds a file must stop growing before it is processed (default {DEFAULT_SETTLE:g})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between folder scans")
+    parser.add_argument("--poll", action="store_true", help="Don't use inotify, only scan the folder")
+    parser.add_argument("--new-only", action="store_true", help="Ignore the videos that are already there")
+    parser.add_argument("--quiet", action="store_true", help="Only report results, not log messages")
+    add_metrics_arguments(parser)
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code or 0
+
+    report = JsonLinesReporter(verbose=not args.quiet)
+    try:
+        settings = load_manifest(args.manifest, require_videos=False)
+    except ManifestError as e:
+        report("error", message=str(e))
+        return 2
+
+    folder = os.path.abspath(args.folder)
+    output_root = os.path.abspath(args.output_dir) if args.output_dir else folder
+    # Rendered videos end up next to the .slp, don't take them for new recordings
+    output_prefix = f"{settings['base_name']}."
+    ready = queue.Queue()
+    # One set of metrics for every batch, the counters keep going up while the rig records
+    metrics = BatchMetrics() if args.metrics_listen or args.metrics_textfile else None
+
+    def on_ready(path):
+        ready.put(path)
+        if metrics is not None:
+            metrics.set_queues({"watch": ready.qsize()})
+
+    watcher = FolderWatcher(
+        folder, on_ready, settle=args.settle, poll_interval=args.poll_interval,
+        include_existing=not args.new_only, ignore=lambda name: name.startswith(output_prefix),
+        use_inotify=not args.poll, on_message=lambda message: report("message", message=message)
+    )
+    try:
+        watcher.start()
+    except OSError as e:
+        report("error", message=str(e))
+        return 2
+    exporters = []
+    if metrics is not None:
+        try:
+            exporters = start_exporters(metrics, args.metrics_listen, args.metrics_textfile, args.metrics_interval)
+        except (OSError, ValueError) as e:
+            watcher.stop()
+            report("error", message=f"Could not export metrics: {str(e)}")
+            return 2
+        for exporter in exporters:
+            report("metrics", address=exporter.address)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    report("watching", folder=folder, output_dir=output_root, backend=watcher.backend, settle=args.settle)
+
+    try:
+        while thread.is_alive():
+            try:
+                video_paths = [ready.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Everything that settled while the last batch ran goes into one batch
+            while not ready.empty():
+                video_paths.append(ready.get())
+            if metrics is not None:
+                metrics.set_queues({"watch": 0})
+            for video_path in video_paths:
+                report("video_ready", video=video_path)
+
+            batch_settings = dict(settings, video_paths=video_paths,
+                                  output_dirs=[watch_output_dir(path, output_root) for path in video_paths])
+            for output_dir in batch_settings["output_dirs"]:
+                os.makedirs(output_dir, exist_ok=True)
+            # A failed video is reported and skipped, the rig keeps recording either way
+            if BatchRunner(batch_settings, report, metrics=metrics).run() == EXIT_INTERRUPTED:
+                raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        watcher.stop()
+        thread.join(timeout=2)
+        report("stopped", interrupted=True)
+        return EXIT_INTERRUPTED
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+
+    report("error", message=f"Stopped watching {folder}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+The lease protocol of the shared job queue (coordinator.py) with real worker
+processes, running the benchmarks' stub sleap-track / sleap-render.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+pytest.importorskip("h5py")
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from stubs import install_stub_tools, stub_environment
+from fixtures import make_slp, make_videos
+
+from sleapgui.coordinator import JobQueue
+from sleapgui.batch import load_manifest
+
+WORKER_SCRIPT = "import sys; from sleapgui.coordinator import worker_main; sys.exit(worker_main(sys.argv[1:]))"
+
+
+@pytest.fixture
+def queue_dir(tmp_path):
+    """Queue directory with 4 pending jobs, the manifest options as in benchmarks/test_orchestration.py"""
+    video_paths = make_videos(str(tmp_path / "videos"), 4)
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    manifest = {
+        "model": str(model_dir),
+        "base_name": "labels.v001",
+        "frame_rate": 30,
+        "renderer": "sleap-render",
+        "job_order": "user",
+        "videos": [{"video": path, "output_dir": str(tmp_path / "out" / os.path.basename(path))}
+                   for path in video_paths],
+    }
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest))
+    directory = str(tmp_path / "queue")
+    JobQueue.create(directory, load_manifest(str(manifest_path)))
+    return directory
+
+
+@pytest.fixture
+def worker_env(tmp_path):
+    """Environment of a worker process: stubs first on PATH, its own HOME"""
+    bin_dir = install_stub_tools(str(tmp_path / "bin"))
+    slp_path = make_slp(str(tmp_path / "template.slp"), n_frames=100)
+    home = tmp_path / "home"
+    home.mkdir()
+
+    def env(**stub_options):
+        environment = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""), HOME=str(home),
+                           PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+        environment.update(stub_environment(slp_path=slp_path, **stub_options))
+        return environment
+    return env
+
+
+def start_worker(queue_dir, env, worker_id, *args):
+    # Own session, so the worker and its sleap-track can be killed together
+    return subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, "--queue", queue_dir, "--id", worker_id,
+                             "--quiet", *args],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                            start_new_session=True)
+
+
+def events(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_workers_share_the_queue(queue_dir, worker_env):
+    """Three workers race for four jobs, every job is done exactly once"""
+    env = worker_env(runtime=0.2)
+    workers = [start_worker(queue_dir, env, f"worker{index}", "--heartbeat", "0.2") for index in range(3)]
+    started = []
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr
+        started += [event["job"] for event in events(stdout) if event["event"] == "job_started"]
+
+    queue = JobQueue(queue_dir)
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 4, "failed": 0}
+    done = queue.results("done")
+    assert sorted(started) == sorted(job["id"] for job in done)
+    assert all(job["success"] and job["attempts"] == 1 for job in done)
+
+
+def test_killed_worker_job_is_requeued(queue_dir, worker_env):
+    """A worker that dies stops its heartbeat, the job goes back to pending and is done by another worker"""
+    queue = JobQueue(queue_dir)
+    worker = start_worker(queue_dir, worker_env(runtime=30), "doomed", "--heartbeat", "0.2")
+    wait_for(lambda: queue.counts()["leased"] == 1)
+    os.killpg(worker.pid, signal.SIGKILL)
+    worker.wait()
+
+    # Still heartbeating a moment ago, not expired yet
+    assert queue.requeue_expired(lease_timeout=5) == []
+    time.sleep(1.5)
+    expired = queue.requeue_expired(lease_timeout=1)
+    assert len(expired) == 1
+    job = json.loads(open(os.path.join(queue_dir, "pending", f"{expired[0]}.json")).read())
+    assert job["attempts"] == 1 and "worker" not in job
+
+    survivor = start_worker(queue_dir, worker_env(runtime=0), "survivor")
+    stdout, stderr = survivor.communicate(timeout=120)
+    assert survivor.returncode == 0, stderr
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 4, "failed": 0}
+    done = {job["id"]: job for job in queue.results("done")}
+    assert done[expired[0]]["attempts"] == 2
+    assert done[expired[0]]["worker"] == "survivor"
+
+
+def test_worker_stops_when_its_lease_is_taken(queue_dir, worker_env):
+    """The lease expires while the worker still runs, the job's result belongs to the new holder"""
+    queue = JobQueue(queue_dir)
+    worker = start_worker(queue_dir, worker_env(runtime=30), "slow", "--heartbeat", "0.2")
+    wait_for(lambda: queue.counts()["leased"] == 1)
+    job_id = queue.results("leased")[0]["id"]
+
+    # The coordinator gave up on it and another worker took it over
+    assert queue.requeue_expired(lease_timeout=-1) == [job_id]
+    job = queue.lease("other")
+    assert job["id"] == job_id
+
+    # The slow worker notices at its next heartbeat, gives up on the job and leases the next one
+    wait_for(lambda: any(leased["worker"] == "slow" for leased in queue.results("leased")))
+    os.killpg(worker.pid, signal.SIGKILL)
+    worker.wait()
+    leased = {leased["id"]: leased for leased in queue.results("leased")}
+    assert leased[job_id]["worker"] == "other"
+    assert queue.heartbeat(job)
+    queue.complete(job, True, "")
+    assert [done["id"] for done in queue.results("done")] == [job_id]
+
+
+def test_jobs_fail_after_max_attempts(queue_dir):
+    """Every expired lease counts as an attempt, the last one moves the job to failed/"""
+    queue = JobQueue(queue_dir)
+    job = queue.lease("w1")
+    assert queue.requeue_expired(lease_timeout=-1, max_attempts=2) == [job["id"]]
+    assert queue.counts()["pending"] == 4
+
+    job = queue.lease("w2")
+    assert queue.requeue_expired(lease_timeout=-1, max_attempts=2) == [job["id"]]
+    assert queue.counts() == {"pending": 3, "leased": 0, "done": 0, "failed": 1}
+    failed = queue.results("failed")[0]
+    assert failed["attempts"] == 2 and failed["message"] == "Lease of w2 expired"
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sleapgui.pipeline import WorkflowPipeline
+
+
+def test_resume_keeps_shared_output_in_flight():
+    # Videos 3 and 4 write the same out/labels.slp, video 3 was analyzed before the
+    # crash but not exported yet. Three videos waiting for create_video keep the
+    # save_csv slot back, so video 3 doesn't start right away.
+    pipeline = WorkflowPipeline(5, overlap=True, queue_size=2, video_keys=["a", "b", "c", "out", "out"])
+    pipeline.resume({("analyze", 0), ("save_csv", 0), ("analyze", 1), ("save_csv", 1),
+                     ("analyze", 2), ("save_csv", 2), ("analyze", 3)})
+
+    # Analyzing video 4 now would overwrite the .slp video 3 still has to export
+    assert pipeline.next_jobs() == [("create_video", 0)]
+
+    # Run the rest, video 4 may only start once video 3 is rendered
+    finished = []
+    while not pipeline.is_done():
+        jobs = pipeline.active_jobs() + pipeline.next_jobs()
+        if ("analyze", 4) in jobs:
+            assert ("create_video", 3) in finished
+        stage, video_index = jobs[0]
+        pipeline.stage_finished(stage, video_index)
+        finished.append((stage, video_index))
+    assert ("analyze", 4) in finished